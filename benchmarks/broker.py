@@ -0,0 +1,172 @@
+# benchmarks/broker.py - Broker MQTT 3.1.1 minimal in-process untuk benchmark
+import asyncio
+import struct
+import threading
+from mqtt.router import TopicRouter
+
+# Jenis paket MQTT 3.1.1 (4 bit atas byte header)
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK = 8, 9, 10, 11
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+
+def encode_packet(header, body):
+    """Header + remaining length (varint) + body"""
+    out = bytearray([header])
+    length = len(body)
+    while True:
+        byte = length % 128
+        length //= 128
+        out.append(byte | (128 if length else 0))
+        if not length:
+            break
+    return bytes(out) + body
+
+
+class BenchmarkBroker:
+    """Pengganti mosquitto untuk benchmark lokal
+
+    Mendukung CONNECT, PUBLISH QoS 0/1 (PUBACK ke publisher), SUBSCRIBE /
+    UNSUBSCRIBE dengan wildcard (via TopicRouter), PINGREQ dan DISCONNECT.
+    Message diteruskan ke subscriber dengan QoS 0. Tidak ada retained
+    message, session, atau autentikasi. Berjalan di event loop asyncio
+    pada thread sendiri; `port=0` memilih port bebas.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.host = host
+        self.port = port
+        self.router = TopicRouter()
+        self.messages_in = 0
+        self.messages_out = 0
+
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def start(self):
+        """Jalankan broker di thread background, kembalikan port"""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        if not self._ready.wait(5):
+            raise RuntimeError("Benchmark broker failed to start")
+        return self.port
+
+    def stop(self):
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            # Tutup server dan koneksi client yang masih terbuka
+            self._server.close()
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+    @staticmethod
+    async def _read_packet(reader):
+        header = (await reader.readexactly(1))[0]
+        multiplier, length = 1, 0
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length += (byte & 127) * multiplier
+            multiplier *= 128
+            if not byte & 128:
+                break
+        body = await reader.readexactly(length) if length else b''
+        return header, body
+
+    def _publish(self, body, header):
+        qos = (header >> 1) & 3
+        length = struct.unpack_from('!H', body)[0]
+        topic = body[2:2 + length].decode()
+        position = 2 + length
+        packet_id = None
+        if qos:
+            packet_id = body[position:position + 2]
+            position += 2
+
+        # Diteruskan sebagai QoS 0: topic + payload tanpa packet id
+        out = encode_packet(PUBLISH << 4, body[:2 + length] + body[position:])
+        self.messages_in += 1
+        delivered = set()
+        for writer, _ in self.router.match(topic):
+            if writer not in delivered:
+                delivered.add(writer)
+                writer.write(out)
+        self.messages_out += len(delivered)
+        return packet_id
+
+    def _subscribe(self, body, writer, subscribe=True):
+        packet_id = body[:2]
+        position = 2
+        codes = bytearray()
+        while position < len(body):
+            length = struct.unpack_from('!H', body, position)[0]
+            topic_filter = body[position + 2:position + 2 + length].decode()
+            position += 2 + length
+            if subscribe:
+                position += 1  # requested QoS
+                try:
+                    self.router.add(topic_filter, writer)
+                    codes.append(0)
+                except ValueError:
+                    codes.append(0x80)
+            else:
+                self.router.remove(topic_filter, writer)
+        if subscribe:
+            return encode_packet(SUBACK << 4, packet_id + bytes(codes))
+        return encode_packet(UNSUBACK << 4, packet_id)
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                header, body = await self._read_packet(reader)
+                kind = header >> 4
+                if kind == PUBLISH:
+                    packet_id = self._publish(body, header)
+                    if packet_id is not None:
+                        writer.write(encode_packet(PUBACK << 4, packet_id))
+                elif kind == CONNECT:
+                    writer.write(encode_packet(CONNACK << 4, b'\x00\x00'))
+                elif kind == SUBSCRIBE:
+                    writer.write(self._subscribe(body, writer))
+                elif kind == UNSUBSCRIBE:
+                    writer.write(self._subscribe(body, writer, subscribe=False))
+                elif kind == PINGREQ:
+                    writer.write(encode_packet(PINGRESP << 4, b''))
+                elif kind == DISCONNECT:
+                    break
+                # Tunggu hanya jika buffer kirim menumpuk
+                if writer.transport.get_write_buffer_size() > 256 * 1024:
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            for topic_filter in self.router.filters():
+                self.router.remove(topic_filter, writer)
+            writer.close()
@@ -0,0 +1,277 @@
+# benchmarks/ingest.py - Benchmark end-to-end MqttClient -> queue -> MessageLogger -> exporter
+#
+# Jalankan dari root repo:
+#   python -m benchmarks.ingest --rates 1000,5000,20000 --payload-sizes 64,1024 --output bench.json
+#
+# Setiap run memakai broker in-process (benchmarks/broker.py), konfigurasi
+# queue/decoding dari config.json, dan direktori log sementara. Hasil berupa
+# JSON: throughput, latency publish -> dequeue (p50/p99), CPU dan RSS.
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from array import array
+
+import numpy as np
+import paho.mqtt.client as mqtt
+
+from benchmarks.broker import BenchmarkBroker
+from mqtt.client import MqttClient
+from utils.exporter import DataExporter
+from utils.logger import MessageLogger
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    # Windows: tidak ada getrusage, peak RSS dilewati
+    resource = None
+
+TOPIC_TEMPLATE = 'bench/{device}/data'
+SUBSCRIPTION = 'bench/+device_id/data'
+
+
+def rss_bytes():
+    """RSS proses saat ini (psutil, fallback /proc/self/statm)"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss_bytes():
+    """Peak RSS proses (getrusage), None jika tidak tersedia"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KiB, macOS: byte
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def percentiles(samples):
+    """p50/p95/p99/max latency (ms) dari array detik"""
+    if not len(samples):
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'max_ms': None}
+    values = np.frombuffer(samples, dtype=np.float64) * 1000.0
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99), 'max_ms': float(values.max())}
+
+
+def make_payload(device, seq, size):
+    """Payload JSON sensor, di-padding sampai kira-kira `size` byte"""
+    body = (f'{{"device_id": "{device}", "seq": {seq}, "sent": {time.time():.6f}, '
+            f'"temperature": {20 + seq % 10}.5, "humidity": {40 + seq % 30}.0')
+    padding = size - len(body) - 12
+    if padding > 0:
+        body += f', "pad": "{"x" * padding}"'
+    return body + '}'
+
+
+def write_config(base_config, directory, port, debug=False):
+    """Salin config.json dengan broker benchmark dan subscription wildcard"""
+    with open(base_config, 'r') as f:
+        config = json.load(f)
+    config['debug'] = debug
+    config['broker'] = {'host': '127.0.0.1', 'port': port, 'username': None, 'password': None, 'keepalive': 60}
+    config['topics'] = {}
+    config['subscriptions'] = [SUBSCRIPTION]
+    path = os.path.join(directory, 'config.json')
+    with open(path, 'w') as f:
+        json.dump(config, f)
+    return path
+
+
+class Consumer(threading.Thread):
+    """Thread consumer seperti dashboard: ambil batch dari queue lalu log"""
+
+    def __init__(self, client, logger, batch_size=500):
+        super().__init__(daemon=True)
+        self.client = client
+        self.logger = logger
+        self.batch_size = batch_size
+        self.latencies = array('d')
+        self.received = 0
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            messages = self.client.get_messages(self.batch_size, 0.05)
+            now = time.time()
+            for message in messages:
+                data = message['data']
+                try:
+                    self.latencies.append(now - data['sent'])
+                except (KeyError, TypeError):
+                    pass
+                self.logger.log_message(message['topic'], data, device_id=message.get('device_id'))
+            self.received += len(messages)
+
+
+def run_case(broker, base_config, rate, payload_size, duration, devices, qos, drain_timeout=10.0, debug=False):
+    """Satu run benchmark pada laju dan ukuran payload tertentu"""
+    with tempfile.TemporaryDirectory(prefix='mqtt-bench-') as directory:
+        config_path = write_config(base_config, directory, broker.port, debug)
+        client = MqttClient(config_path)
+        if not client.connect():
+            raise RuntimeError("MqttClient could not connect to the benchmark broker")
+        logger = MessageLogger(os.path.join(directory, 'logs'), background=True)
+        consumer = Consumer(client, logger)
+        consumer.start()
+
+        publisher = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id=f"bench-pub-{rate}-{payload_size}")
+        publisher.max_queued_messages_set(0)
+        publisher.connect('127.0.0.1', broker.port)
+        publisher.loop_start()
+
+        device_ids = [f"dev{i:04d}" for i in range(devices)]
+        topics = [TOPIC_TEMPLATE.format(device=device) for device in device_ids]
+
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        deadline = start + duration
+        sent = 0
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            due = int((now - start) * rate) - sent
+            if due <= 0:
+                time.sleep(min(0.002, deadline - now))
+                continue
+            for _ in range(min(due, 1000)):
+                index = sent % devices
+                publisher.publish(topics[index], make_payload(device_ids[index], sent, payload_size), qos=qos)
+                sent += 1
+        publish_elapsed = time.perf_counter() - start
+
+        # Tunggu sampai semua message diproses (atau timeout)
+        drain_deadline = time.perf_counter() + drain_timeout
+        dropped = 0
+        while time.perf_counter() < drain_deadline:
+            dropped = client.get_queue_stats().get('dropped', 0)
+            if consumer.received + dropped >= sent:
+                break
+            time.sleep(0.01)
+        ingest_elapsed = time.perf_counter() - start
+        consumer.stop_event.set()
+        consumer.join(timeout=5)
+
+        flush_start = time.perf_counter()
+        logger.flush()
+        flush_seconds = time.perf_counter() - flush_start
+        cpu_seconds = time.process_time() - cpu_start
+
+        log_topics = sorted({TOPIC_TEMPLATE.format(device=device) for device in device_ids[:min(devices, sent)]})
+        export_start = time.perf_counter()
+        exported_rows = DataExporter.export_stream(
+            DataExporter.logger_source(logger, log_topics),
+            os.path.join(directory, 'export.csv')
+        )
+        csv_seconds = time.perf_counter() - export_start
+        export_start = time.perf_counter()
+        DataExporter.export_logs_columnar(logger, log_topics, os.path.join(directory, 'export.npz'))
+        npz_seconds = time.perf_counter() - export_start
+
+        result = {
+            'rate_target': rate,
+            'payload_bytes': payload_size,
+            'devices': devices,
+            'qos': qos,
+            'duration': duration,
+            'sent': sent,
+            'received': consumer.received,
+            'dropped': dropped,
+            'publish_rate': sent / publish_elapsed if publish_elapsed else 0.0,
+            'throughput': consumer.received / ingest_elapsed if ingest_elapsed else 0.0,
+            'latency': percentiles(consumer.latencies),
+            'cpu_seconds': cpu_seconds,
+            'cpu_percent': 100.0 * cpu_seconds / ingest_elapsed if ingest_elapsed else 0.0,
+            'rss_bytes': rss_bytes(),
+            'peak_rss_bytes': peak_rss_bytes(),
+            'logger_bytes_written': logger.bytes_written,
+            'logger_flush_seconds': flush_seconds,
+            'export': {
+                'rows': exported_rows,
+                'csv_seconds': csv_seconds,
+                'csv_rows_per_second': exported_rows / csv_seconds if csv_seconds else None,
+                'npz_seconds': npz_seconds,
+            },
+            'queue': client.get_queue_stats(),
+        }
+
+        publisher.loop_stop()
+        publisher.disconnect()
+        client.disconnect()
+        logger.close()
+        return result
+
+
+def environment():
+    info = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+    }
+    try:
+        from importlib.metadata import version
+        info['paho_mqtt'] = version('paho-mqtt')
+    except Exception:
+        pass
+    return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end ingest benchmark with an in-process MQTT broker")
+    parser.add_argument('--config', default='config.json', help="base config (queue/decoding settings)")
+    parser.add_argument('--rates', default='1000,5000,20000', help="comma-separated target msg/s")
+    parser.add_argument('--payload-sizes', default='128,1024', help="comma-separated payload bytes")
+    parser.add_argument('--duration', type=float, default=5.0, help="seconds per run")
+    parser.add_argument('--devices', type=int, default=100)
+    parser.add_argument('--qos', type=int, default=0, choices=(0, 1))
+    parser.add_argument('--output', help="write JSON results to this file (default: stdout)")
+    parser.add_argument('--verbose', action='store_true', help="print every received message (config `debug`)")
+    args = parser.parse_args()
+
+    rates = [float(rate) for rate in args.rates.split(',')]
+    sizes = [int(size) for size in args.payload_sizes.split(',')]
+    results = {'environment': environment(), 'runs': []}
+
+    with BenchmarkBroker() as broker:
+        for size in sizes:
+            for rate in rates:
+                print(f"[Bench] rate={rate:.0f} msg/s payload={size} B ...", file=sys.stderr)
+                # Output client/logger tetap ditulis (ikut terukur), tetapi ke stderr
+                # agar stdout hanya berisi hasil JSON
+                with contextlib.redirect_stdout(sys.stderr):
+                    run = run_case(broker, args.config, rate, size, args.duration, args.devices, args.qos,
+                                   debug=args.verbose)
+                results['runs'].append(run)
+                latency = run['latency']
+                print(f"[Bench]   throughput {run['throughput']:.0f} msg/s, "
+                      f"p50 {latency['p50_ms'] or 0:.2f} ms, p99 {latency['p99_ms'] or 0:.2f} ms, "
+                      f"dropped {run['dropped']}, CPU {run['cpu_percent']:.0f}%", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"[Bench] Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
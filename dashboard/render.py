@@ -0,0 +1,169 @@
+# dashboard/render.py - Render model widget sensor dengan deteksi perubahan
+#
+# Setiap fungsi *_view menghitung tampilan widget dari satu nilai sensor
+# sebagai dict {nama widget: opsi config}. Nama 'style:<nama>' berarti
+# ttk.Style.configure. RenderModel membandingkan dengan tampilan terakhir
+# sehingga hanya widget yang berubah yang dikirim ke Tk.
+
+_MISSING = object()
+
+
+def _band(value, bands):
+    """Ambil entry band pertama yang cocok (predicate, ...)"""
+    for band in bands:
+        if band[0](value):
+            return band[1:]
+    return bands[-1][1:]
+
+
+# (predicate, warna progress bar)
+TEMP_PROGRESS_BANDS = (
+    (lambda t: t > 30, '#ff3b3f'),
+    (lambda t: 25 <= t <= 30, '#ffc107'),
+    (lambda t: True, '#43a047'),
+)
+
+# (predicate, teks indikator LED, warna)
+TEMP_LED_BANDS = (
+    (lambda t: t > 30, "Indikator: Merah", '#ff3b3f'),
+    (lambda t: t >= 25, "Indikator: Kuning", '#ffc107'),
+    (lambda t: True, "Indikator: Hijau", '#43a047'),
+)
+
+# (predicate, teks status, warna)
+TEMP_STATUS_BANDS = (
+    (lambda t: t < 18, "🥶 Sangat Dingin — Risiko embun/kerusakan; isolasi atau hangatkan area", '#0d47a1'),
+    (lambda t: 18 <= t < 25, "❄️ Dingin — nyaman untuk penyimpanan, tapi perhatikan kenyamanan manusia", '#2196f3'),
+    (lambda t: 25 <= t <= 30, "🙂 Ideal — Suhu optimal untuk kenyamanan dan perangkat", '#43a047'),
+    (lambda t: 30 < t <= 33, "🌤️ Hangat — Pastikan ventilasi dan sirkulasi udara", '#ffb300'),
+    (lambda t: True, "🔥 Panas — Risiko overheat, aktifkan pendingin/kipas segera", '#d32f2f'),
+)
+
+# Untuk kelembaban dan tekanan, warna status juga dipakai progress bar
+HUMIDITY_BANDS = (
+    (lambda h: h < 30, "Kelembapan: Kering — jaga kelembapan tanaman/udara", '#2196f3'),
+    (lambda h: 30 <= h < 60, "Kelembapan: Normal — kondisi nyaman", '#43a047'),
+    (lambda h: 60 <= h < 80, "Kelembapan: Lembap — waspadai kondensasi", '#ff9800'),
+    (lambda h: True, "Kelembapan: Sangat Lembap — risiko jamur/korosi", '#d32f2f'),
+)
+
+PRESSURE_BANDS = (
+    (lambda p: p < 1000, "Tekanan: Rendah — kemungkinan cuaca buruk/berawan", '#1976d2'),
+    (lambda p: 1000 <= p < 1020, "Tekanan: Sedikit Rendah — awan/berubah-ubah", '#4caf50'),
+    (lambda p: 1020 <= p < 1040, "Tekanan: Normal/Tinggi — cenderung cerah", '#ffb300'),
+    (lambda p: True, "Tekanan: Sangat Tinggi — kondisi sangat stabil/cerah", '#d32f2f'),
+)
+
+
+def temperature_view(temp):
+    # Progress dibulatkan sama dengan teks agar nilai identik tidak di-repaint
+    status, color = _band(temp, TEMP_STATUS_BANDS)
+    led_text, led_color = _band(temp, TEMP_LED_BANDS)
+    return {
+        'temp_value': {'text': f"{temp:.1f}°C", 'foreground': color},
+        'temp_status': {'text': status, 'foreground': color},
+        'temp_progress': {'value': round(temp, 1)},
+        'style:Temp.Horizontal.TProgressbar': {'background': _band(temp, TEMP_PROGRESS_BANDS)[0]},
+        'led_indicator': {'text': led_text, 'foreground': led_color},
+    }
+
+
+def humidity_view(humidity):
+    status, color = _band(humidity, HUMIDITY_BANDS)
+    return {
+        'humidity_value': {'text': f"{humidity:.0f}%"},
+        'humidity_status': {'text': status, 'foreground': color},
+        'humidity_progress': {'value': round(humidity)},
+        'style:Hum.Horizontal.TProgressbar': {'background': color},
+    }
+
+
+def pressure_view(pressure):
+    status, color = _band(pressure, PRESSURE_BANDS)
+    return {
+        'pressure_value': {'text': f"{pressure:.1f} hPa"},
+        'pressure_status': {'text': status, 'foreground': color},
+        'pressure_progress': {'value': round(pressure, 1)},
+        'style:Pres.Horizontal.TProgressbar': {'background': color},
+    }
+
+
+def led_view(led_status):
+    if led_status == 'ON':
+        return {
+            'led_status': {'text': "ON", 'foreground': '#43a047'},
+            'led_toggle': {'text': "Disable LED Indikator", 'style': 'Led.TButton'},
+        }
+    return {
+        'led_status': {'text': "OFF", 'foreground': '#ff3b3f'},
+        'led_toggle': {'text': "Enable LED Indikator", 'style': 'Led.TButton'},
+    }
+
+
+# Label singkat tahap latency di status bar
+LATENCY_LABELS = (
+    ('network', 'net'),
+    ('queue', 'queue'),
+    ('ui_queue', 'ui'),
+    ('render', 'render'),
+    ('total', 'total'),
+)
+
+
+def _ms(value):
+    if value is None:
+        return '-'
+    return f"{value:.0f}" if value >= 10 else f"{value:.1f}"
+
+
+def latency_view(snapshot):
+    """Teks status bar: p50/p95/p99 (ms) per tahap pipeline"""
+    parts = []
+    for stage, label in LATENCY_LABELS:
+        stats = snapshot.get(stage)
+        if not stats or not stats['count']:
+            continue
+        parts.append(f"{label} {_ms(stats['p50'])}/{_ms(stats['p95'])}/{_ms(stats['p99'])}")
+    text = "Latency p50/p95/p99 ms: " + (" · ".join(parts) if parts else "--")
+    return {'latency': {'text': text}}
+
+
+SENSOR_VIEWS = {
+    'temperature': temperature_view,
+    'humidity': humidity_view,
+    'pressure': pressure_view,
+}
+
+
+class RenderModel:
+    """Simpan opsi widget yang sedang tampil, kembalikan hanya perubahan"""
+
+    def __init__(self):
+        self.shown = {}
+        self.applied = 0
+        self.skipped = 0
+
+    def diff(self, view):
+        """Dict {widget: opsi yang berubah} dari view baru"""
+        changes = {}
+        for key, options in view.items():
+            current = self.shown.setdefault(key, {})
+            changed = {
+                name: value for name, value in options.items()
+                if current.get(name, _MISSING) != value
+            }
+            if changed:
+                current.update(changed)
+                changes[key] = changed
+                self.applied += 1
+            else:
+                self.skipped += 1
+        return changes
+
+    def forget(self, key=None):
+        """Lupakan state widget (mis. setelah diubah di luar model)"""
+        if key is None:
+            self.shown.clear()
+        else:
+            self.shown.pop(key, None)
+
@@ -3,19 +3,23 @@ from tkinter import ttk
 import json
 from datetime import datetime
 import threading
-from collections import deque
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
+import time
+from collections.abc import Mapping
+import numpy as np
+from mqtt.ingest_queue import BoundedMessageQueue
+from dashboard.render import RenderModel, SENSOR_VIEWS, latency_view, led_view
+from utils.history import HistoryStore
 
 class DashboardUI:
     """
     Dashboard UI untuk monitoring data real-time
     """
 
-    def __init__(self, mqtt_client, config_file='config.json'):
+    def __init__(self, mqtt_client, config_file='config.json', startup=None):
         """
         Inisialisasi dashboard
+
+        startup: StartupTimer opsional untuk mencatat fase startup
         """
         # Load konfigurasi
         with open(config_file, 'r') as f:
@@ -23,6 +27,7 @@ class DashboardUI:
 
         self.config = config
         self.mqtt_client = mqtt_client
+        self.startup = startup
 
         # Root window
         self.root = tk.Tk()
@@ -30,18 +35,44 @@ class DashboardUI:
         self.root.geometry(f"{config['dashboard']['width']}x{config['dashboard']['height']}")
         self.root.resizable(True, True)
 
-        # Data storage (untuk grafik)
-        self.data_history = {
-            'temperature': deque(maxlen=60),
-            'humidity': deque(maxlen=60),
-            'pressure': deque(maxlen=60)
-        }
+        # Data storage (untuk grafik): ring buffer per device & metric
+        self.metrics = ('temperature', 'humidity', 'pressure')
+        self.history = HistoryStore(config['dashboard'].get('history_capacity', 60))
+        # Device yang ditampilkan; None = ikuti device dari message terakhir
+        self.device_filter = config['dashboard'].get('device_id')
+        self.active_device = self.device_filter or 'default'
         self.graph_update_interval = 1000  # ms
+        # Frame limiter: update_ui hanya dijadwalkan saat ada data atau status
+        # koneksi berubah, paling cepat sekali per `refresh_rate` ms
+        self.refresh_interval = config['dashboard'].get('refresh_rate', 500) / 1000.0
+        self.frame_interval = self.refresh_interval
+        self._last_frame = 0.0
+        self._last_graph = 0.0
+        self._wake_pending = False
+        self.frame_count = 0
+        # Device mode deadband: nilai terakhir berlaku maks `max_hold` detik
+        self.max_hold = config.get('reporting', {}).get('max_hold', 0)
+        # device -> waktu laporan terakhir (data basi dicek per device)
+        self._last_report = {}
+        self._hold_after_id = None
         # Queue and counters for thread-safe communication
-        self.msg_queue = deque()
+        self.msg_queue = BoundedMessageQueue(
+            capacity=config['dashboard'].get('queue_capacity', 0),
+            policy=config['dashboard'].get('queue_policy', 'drop_oldest')
+        )
         self.message_count = 0
-        self.time_history = deque(maxlen=60)
+        # Jumlah maksimal message yang diambil per batch dari MqttClient
+        self.batch_size = config['dashboard'].get('batch_size', 200)
         self._connection_flag = False
+        self._connected_once = False
+        # Histogram latency dipakai bersama dengan MqttClient (tahap ui_queue/render/total)
+        self.latency = getattr(mqtt_client, 'latency', None)
+        self._latency_shown_at = 0.0
+        # Statistik redraw grafik (untuk metrics)
+        self.redraw_count = 0
+        self.redraw_seconds = 0.0
+        self.redraw_max_seconds = 0.0
+        self.full_redraws = 0
 
         # Current values
         self.current_values = {
@@ -62,8 +93,12 @@ class DashboardUI:
         # Setup UI
         self.setup_ui()
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        # Thread message membangunkan main loop lewat virtual event
+        self.root.bind('<<MessagesReady>>', self._on_wake)
         self.start_message_processor()
-        self._ui_after_id = self.root.after(500, self.update_ui)
+        self.request_frame()
+        # Grafik dibuat setelah window pertama kali tampil
+        self.root.after(0, self._on_first_frame)
 
     # UI initialized
 
@@ -118,9 +153,9 @@ class DashboardUI:
         status_bar.pack(fill=tk.X, padx=10, pady=(0,10))
         self.status_label = ttk.Label(
             status_bar,
-            text="● Disconnected",
+            text="● Connecting...",
             font=("Segoe UI", 11),
-            foreground="#ff3b3f",
+            foreground="#ffa000",
             background="#ffffff"
         )
         self.status_label.pack(side=tk.LEFT)
@@ -132,6 +167,14 @@ class DashboardUI:
             background="#ffffff"
         )
         self.header_last_update_label.pack(side=tk.LEFT, padx=20)
+        self.latency_label = ttk.Label(
+            status_bar,
+            text="Latency p50/p95/p99 ms: --",
+            font=("Segoe UI", 10),
+            foreground="#555555",
+            background="#ffffff"
+        )
+        self.latency_label.pack(side=tk.RIGHT)
 
         # Main content frame
         self.main_frame = ttk.Frame(self.root, padding=0)
@@ -146,29 +189,19 @@ class DashboardUI:
         self.graph_frame.columnconfigure(0, weight=1)
         self.graph_frame.rowconfigure(0, weight=1)
 
-        self.fig = Figure(figsize=(8, 5), dpi=100)
-        self.ax_temp = self.fig.add_subplot(211)
-        self.ax_hum = self.fig.add_subplot(212)
-        self.fig.subplots_adjust(hspace=0.6) 
-        self.ax_temp.set_title("Grafik Suhu Real-time", fontsize=16, color="#ffffff", backgroundcolor="#1976d2", pad=20)
-        self.ax_hum.set_title("Grafik Kelembaban Real-time", fontsize=16, color="#ffffff", backgroundcolor="#1976d2")
-        self.ax_temp.set_facecolor('#f7f7f7')
-        self.ax_hum.set_facecolor('#f7f7f7')
-        self.ax_temp.tick_params(axis='x', colors='#1976d2')
-        self.ax_temp.tick_params(axis='y', colors='#1976d2')
-        self.ax_hum.tick_params(axis='x', colors='#1976d2')
-        self.ax_hum.tick_params(axis='y', colors='#1976d2')
-        self.ax_temp.set_ylabel("Suhu (°C)", fontsize=12, color="#1976d2")
-        self.ax_hum.set_ylabel("Kelembaban (%)", fontsize=12, color="#1976d2")
-        self.ax_temp.set_xlabel("Data Point", fontsize=12, color="#1976d2")
-        self.ax_hum.set_xlabel("Time", fontsize=12, color="#1976d2")
-
-        self.temp_line, = self.ax_temp.plot([], [], color="#ffa000", linewidth=2)
-        self.temp_scatter = self.ax_temp.scatter([], [], c=[], cmap="RdYlGn", s=60)
-        self.hum_line, = self.ax_hum.plot([], [], color="#1976d2", linewidth=2, marker='o')
-
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.graph_frame)
-        self.canvas.get_tk_widget().grid(row=0, column=0, sticky="nsew")
+        # Grafik (matplotlib) dimuat setelah frame pertama tampil, lihat setup_graphs
+        self.fig = None
+        self.canvas = None
+        self._graph_backgrounds = None
+        self._graph_versions = {}
+        self.graph_placeholder = ttk.Label(
+            self.graph_frame,
+            text="Memuat grafik...",
+            font=("Segoe UI", 12),
+            foreground="#888888",
+            background="#ffffff"
+        )
+        self.graph_placeholder.grid(row=0, column=0)
 
         # Panel kanan: sensor, kontrol, status
         right_panel = ttk.Frame(self.main_frame, style='Card.TFrame', padding=20)
@@ -263,6 +296,12 @@ class DashboardUI:
             font=("Segoe UI", 11)
         )
         self.message_count_label.pack(anchor=tk.W, padx=5)
+        self.queue_stats_label = ttk.Label(
+            status_frame,
+            text="Dropped: 0 | Coalesced: 0",
+            font=("Segoe UI", 11)
+        )
+        self.queue_stats_label.pack(anchor=tk.W, padx=5)
         self.broker_info_label = ttk.Label(
             status_frame,
             text=f"Broker: {self.config['broker']['host']}:{self.config['broker']['port']}",
@@ -270,262 +309,369 @@ class DashboardUI:
         )
         self.broker_info_label.pack(anchor=tk.W, padx=5)
 
-        # Mulai update grafik (store id so we can cancel on close)
-        self._graph_after_id = self.root.after(self.graph_update_interval, self.update_graph)
-        # ensure matplotlib uses a non-interactive backend appropriate for embedding
-        plt.tight_layout()
+        # Widget yang di-update lewat RenderModel (lihat apply_view)
+        self.render_model = RenderModel()
+        self.widgets = {
+            'temp_value': self.temp_value_label,
+            'temp_status': self.temp_status_label,
+            'temp_progress': self.temp_progress,
+            'led_indicator': self.led_indicator_status,
+            'humidity_value': self.humidity_value_label,
+            'humidity_status': self.humidity_status_label,
+            'humidity_progress': self.humidity_progress,
+            'pressure_value': self.pressure_value_label,
+            'pressure_status': self.pressure_status_label,
+            'pressure_progress': self.pressure_progress,
+            'led_status': self.led_status_label,
+            'led_toggle': self.led_toggle_button,
+            'last_update': self.last_update_label,
+            'message_count': self.message_count_label,
+            'queue_stats': self.queue_stats_label,
+            'latency': self.latency_label,
+        }
+
+
+    def _on_first_frame(self):
+        """Dipanggil di iterasi mainloop pertama: window sudah tampil"""
+        self.root.update_idletasks()
+        if self.startup is not None:
+            self.startup.mark("window shown")
+        if self.is_running:
+            self.root.after(10, self.setup_graphs)
+
+    def setup_graphs(self):
+        """
+        Import matplotlib dan buat grafik (dipanggil setelah window tampil)
+        """
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.colors import to_rgba_array
+        from matplotlib.figure import Figure
+        from matplotlib.ticker import FuncFormatter
+
+        self.fig = Figure(figsize=(8, 5), dpi=100)
+        self.ax_temp = self.fig.add_subplot(211)
+        self.ax_hum = self.fig.add_subplot(212)
+        self.fig.subplots_adjust(hspace=0.6) 
+        self.ax_temp.set_title("Grafik Suhu Real-time", fontsize=16, color="#ffffff", backgroundcolor="#1976d2", pad=20)
+        self.ax_hum.set_title("Grafik Kelembaban Real-time", fontsize=16, color="#ffffff", backgroundcolor="#1976d2")
+        self.ax_temp.set_facecolor('#f7f7f7')
+        self.ax_hum.set_facecolor('#f7f7f7')
+        self.ax_temp.tick_params(axis='x', colors='#1976d2')
+        self.ax_temp.tick_params(axis='y', colors='#1976d2')
+        self.ax_hum.tick_params(axis='x', colors='#1976d2')
+        self.ax_hum.tick_params(axis='y', colors='#1976d2')
+        self.ax_temp.set_ylabel("Suhu (°C)", fontsize=12, color="#1976d2")
+        self.ax_hum.set_ylabel("Kelembaban (%)", fontsize=12, color="#1976d2")
+        self.ax_temp.set_xlabel("Data Point", fontsize=12, color="#1976d2")
+        self.ax_hum.set_xlabel("Time", fontsize=12, color="#1976d2")
+
+        # Kelembaban: sumbu X = waktu (epoch), label HH:MM:SS
+        self.ax_hum.xaxis.set_major_formatter(
+            FuncFormatter(lambda x, pos: datetime.fromtimestamp(x).strftime("%H:%M:%S"))
+        )
+        self.ax_hum.tick_params(axis='x', labelrotation=45, labelsize=8)
+        self.ax_temp.set_xlim(0, max(10, self.history.capacity))
+        self.ax_temp.set_ylim(15, 45)
+        self.ax_hum.set_xlim(0, 1)
+        self.ax_hum.set_ylim(40, 100)
+
+        # Artist dibuat sekali dan di-update in place (animated = digambar via blit).
+        # Mode hold: garis bertangga, nilai tetap sampai laporan berikutnya
+        drawstyle = 'steps-post' if self.max_hold else 'default'
+        self.temp_line, = self.ax_temp.plot([], [], color="#ffa000", linewidth=2, drawstyle=drawstyle, animated=True)
+        self.temp_scatter = self.ax_temp.scatter(np.empty(0), np.empty(0), s=60, zorder=3, animated=True)
+        self.hum_line, = self.ax_hum.plot([], [], color="#1976d2", linewidth=2, marker='o',
+                                          drawstyle=drawstyle, animated=True)
+        # Warna scatter suhu: hijau (< 25), kuning (25-30), merah (> 30)
+        self.temp_palette = to_rgba_array(['#43a047', '#ffc107', '#ff3b3f'])
+
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.graph_frame)
+        self.canvas.get_tk_widget().grid(row=0, column=0, sticky="nsew")
+        self.canvas.mpl_connect('draw_event', self._on_canvas_draw)
+        self.graph_placeholder.destroy()
+        if not self.is_running:
+            return
+
+        # Gambar data yang sudah ada di history
+        self.request_graph()
+        if self.startup is not None:
+            self.startup.mark("graphs loaded")
 
     def toggle_led_indicator(self):
         """
         Toggle LED indikator (enable/disable)
         """
         if self.current_values['led_status'] == 'OFF':
-            self.mqtt_client.publish('led_indicator', {'action': 'enable'})
+            self.mqtt_client.publish('led_indicator', {'action': 'enable'}, block=False)
             self.current_values['led_status'] = 'ON'
-            self.led_status_label.config(text="ON", foreground="#43a047")
-            self.led_toggle_button.config(text="Disable LED Indikator", style='Led.TButton')
         else:
-            self.mqtt_client.publish('led_indicator', {'action': 'disable'})
+            self.mqtt_client.publish('led_indicator', {'action': 'disable'}, block=False)
             self.current_values['led_status'] = 'OFF'
-            self.led_status_label.config(text="OFF", foreground="#ff3b3f")
-            self.led_toggle_button.config(text="Enable LED Indikator", style='Led.TButton')
+        self.apply_view(led_view(self.current_values['led_status']))
 
     # Hapus tombol ON/OFF LED
 
-    def update_sensor_display(self, topic, data):
+    def update_sensor_display_batch(self, messages):
+        """
+        Update display sekali untuk satu batch message
+        """
+        # Semua nilai tetap masuk ke history, tapi widget hanya di-update
+        # dengan nilai terakhir dari batch
+        latest = {}
+        for msg in messages:
+            data = msg.get('data', {})
+            if not isinstance(data, Mapping):
+                continue
+            device = msg.get('device_id', 'default')
+            shown = self.device_filter is None or device == self.device_filter
+            if shown:
+                self.active_device = device
+            timestamp = msg.get('timestamp')
+            if self.max_hold:
+                self._last_report[device] = timestamp or time.time()
+            for key in self.metrics:
+                if key in data:
+                    try:
+                        value = float(data[key])
+                    except (TypeError, ValueError):
+                        continue
+                    self.history.append(device, key, value, timestamp)
+                    if shown:
+                        latest[key] = value
+            if shown and 'led_status' in data:
+                latest['led_status'] = data['led_status']
+
+        topic = messages[-1].get('topic', '') if messages else ''
+        self.update_sensor_display(topic, latest, record_history=False)
+
+    def update_sensor_display(self, topic, data, record_history=True):
         """
         Update display sensor data
         """
         try:
-            # Temperature
-            if 'temperature' in data:
-                temp = float(data['temperature'])
-                self.current_values['temperature'] = temp
-                self.data_history['temperature'].append(temp)
-                self.temp_value_label.config(text=f"{temp:.1f}°C")
-                try:
-                    self.temp_progress['value'] = temp
-                    try:
-                        if temp > 30:
-                            self.style.configure('Temp.Horizontal.TProgressbar', background='#ff3b3f')
-                        elif 25 <= temp <= 30:
-                            self.style.configure('Temp.Horizontal.TProgressbar', background='#ffc107')
-                        else:
-                            self.style.configure('Temp.Horizontal.TProgressbar', background='#43a047')
-                    except Exception:
-                        pass
-                except Exception:
-                    pass
-
-                # LED indicator based on temperature
-                if temp > 30:
-                    self.led_indicator_status.config(text="Indikator: Merah", foreground="#ff3b3f")
-                elif temp >= 25:
-                    self.led_indicator_status.config(text="Indikator: Kuning", foreground="#ffc107")
-                else:
-                    self.led_indicator_status.config(text="Indikator: Hijau", foreground="#43a047")
-
-                # Enhanced interactive temperature message
-                try:
-                    if temp < 18:
-                        self.temp_status_label.config(text="🥶 Sangat Dingin — Risiko embun/kerusakan; isolasi atau hangatkan area", foreground="#0d47a1")
-                        self.temp_value_label.config(foreground="#0d47a1")
-                    elif 18 <= temp < 25:
-                        self.temp_status_label.config(text="❄️ Dingin — nyaman untuk penyimpanan, tapi perhatikan kenyamanan manusia", foreground="#2196f3")
-                        self.temp_value_label.config(foreground="#2196f3")
-                    elif 25 <= temp <= 30:
-                        self.temp_status_label.config(text="🙂 Ideal — Suhu optimal untuk kenyamanan dan perangkat", foreground="#43a047")
-                        self.temp_value_label.config(foreground="#43a047")
-                    elif 30 < temp <= 33:
-                        self.temp_status_label.config(text="🌤️ Hangat — Pastikan ventilasi dan sirkulasi udara", foreground="#ffb300")
-                        self.temp_value_label.config(foreground="#ffb300")
-                    else:
-                        self.temp_status_label.config(text="🔥 Panas — Risiko overheat, aktifkan pendingin/kipas segera", foreground="#d32f2f")
-                        self.temp_value_label.config(foreground="#d32f2f")
-                except Exception:
-                    pass
-
-            # Humidity
-            if 'humidity' in data:
-                humidity = float(data['humidity'])
-                self.current_values['humidity'] = humidity
-                self.data_history['humidity'].append(humidity)
-                self.humidity_value_label.config(text=f"{humidity:.0f}%")
-                try:
-                    self.humidity_progress['value'] = humidity
-                    try:
-                        if humidity < 30:
-                            self.style.configure('Hum.Horizontal.TProgressbar', background='#2196f3')
-                        elif 30 <= humidity < 60:
-                            self.style.configure('Hum.Horizontal.TProgressbar', background='#43a047')
-                        elif 60 <= humidity < 80:
-                            self.style.configure('Hum.Horizontal.TProgressbar', background='#ff9800')
-                        else:
-                            self.style.configure('Hum.Horizontal.TProgressbar', background='#d32f2f')
-                    except Exception:
-                        pass
-                except Exception:
-                    pass
-
-                try:
-                    if humidity < 30:
-                        self.humidity_status_label.config(text="Kelembapan: Kering — jaga kelembapan tanaman/udara", foreground="#2196f3")
-                    elif 30 <= humidity < 60:
-                        self.humidity_status_label.config(text="Kelembapan: Normal — kondisi nyaman", foreground="#43a047")
-                    elif 60 <= humidity < 80:
-                        self.humidity_status_label.config(text="Kelembapan: Lembap — waspadai kondensasi", foreground="#ff9800")
-                    else:
-                        self.humidity_status_label.config(text="Kelembapan: Sangat Lembap — risiko jamur/korosi", foreground="#d32f2f")
-                except Exception:
-                    pass
-
-            # Pressure
-            if 'pressure' in data:
-                pressure = float(data['pressure'])
-                self.current_values['pressure'] = pressure
-                self.data_history['pressure'].append(pressure)
-                self.pressure_value_label.config(text=f"{pressure:.1f} hPa")
-                try:
-                    self.pressure_progress['value'] = pressure
-                    try:
-                        if pressure < 1000:
-                            self.style.configure('Pres.Horizontal.TProgressbar', background='#1976d2')
-                        elif 1000 <= pressure < 1020:
-                            self.style.configure('Pres.Horizontal.TProgressbar', background='#4caf50')
-                        elif 1020 <= pressure < 1040:
-                            self.style.configure('Pres.Horizontal.TProgressbar', background='#ffb300')
-                        else:
-                            self.style.configure('Pres.Horizontal.TProgressbar', background='#d32f2f')
-                    except Exception:
-                        pass
-                except Exception:
-                    pass
-
-                try:
-                    if pressure < 1000:
-                        self.pressure_status_label.config(text="Tekanan: Rendah — kemungkinan cuaca buruk/berawan", foreground="#1976d2")
-                    elif 1000 <= pressure < 1020:
-                        self.pressure_status_label.config(text="Tekanan: Sedikit Rendah — awan/berubah-ubah", foreground="#4caf50")
-                    elif 1020 <= pressure < 1040:
-                        self.pressure_status_label.config(text="Tekanan: Normal/Tinggi — cenderung cerah", foreground="#ffb300")
-                    else:
-                        self.pressure_status_label.config(text="Tekanan: Sangat Tinggi — kondisi sangat stabil/cerah", foreground="#d32f2f")
-                except Exception:
-                    pass
+            view = {}
+            for metric in self.metrics:
+                if metric in data:
+                    value = float(data[metric])
+                    self.current_values[metric] = value
+                    if record_history:
+                        self.history.append(self.active_device, metric, value)
+                    view.update(SENSOR_VIEWS[metric](value))
 
             # Update last update time
             now = datetime.now().strftime("%H:%M:%S")
             self.current_values['last_update'] = now
-            self.last_update_label.config(text=f"Last update: {now}")
-            # append timestamp for plotting
-            self.time_history.append(now)
+            view['last_update'] = {'text': f"Last update: {now}", 'foreground': ""}
 
             # Update LED button and status
             if 'led_status' in data:
                 self.current_values['led_status'] = data['led_status']
-                if data['led_status'] == 'ON':
-                    self.led_status_label.config(text="ON", foreground="#43a047")
-                    self.led_toggle_button.config(text="Disable LED Indikator", style='Led.TButton')
-                else:
-                    self.led_status_label.config(text="OFF", foreground="#ff3b3f")
-                    self.led_toggle_button.config(text="Enable LED Indikator", style='Led.TButton')
+                view.update(led_view(data['led_status']))
+
+            self.apply_view(view)
 
         except Exception as e:
             print(f"[Dashboard] Error updating display: {e}")
 
-    def update_graph(self):
+    def apply_view(self, view):
         """
-        Update grafik suhu dan kelembapan secara realtime
+        Kirim ke Tk hanya opsi widget yang benar-benar berubah
         """
-        temp_data = list(self.data_history['temperature'])
-        hum_data = list(self.data_history['humidity'])
-        times = list(self.time_history)
-        x = list(range(len(temp_data)))
-
-        # Suhu: scatter warna
-        colors = []
-        for t in temp_data:
-            if t > 30:
-                colors.append('#ff3b3f') # merah
-            elif t >= 25:
-                colors.append('#ffc107') # kuning
+        for key, options in self.render_model.diff(view).items():
+            if key.startswith('style:'):
+                self.style.configure(key[len('style:'):], **options)
             else:
-                colors.append('#43a047') # hijau
+                self.widgets[key].config(**options)
+
+    def _on_canvas_draw(self, event):
+        """Setelah full redraw: simpan background tiap axes lalu gambar artist"""
+        self._graph_backgrounds = {
+            self.ax_temp: self.canvas.copy_from_bbox(self.ax_temp.bbox),
+            self.ax_hum: self.canvas.copy_from_bbox(self.ax_hum.bbox),
+        }
+        for artist in (self.temp_line, self.temp_scatter, self.hum_line):
+            self.fig.draw_artist(artist)
 
+    def _update_temp_artists(self, temp_data):
+        """Update artist suhu, return True jika batas sumbu berubah"""
+        x = np.arange(len(temp_data))
         self.temp_line.set_data(x, temp_data)
+        self.temp_scatter.set_offsets(np.column_stack((x, temp_data)))
+        levels = (temp_data >= 25).astype(np.intp) + (temp_data > 30)
+        self.temp_scatter.set_facecolors(self.temp_palette[levels])
+
+        if not len(temp_data):
+            return False
+        # Skala Y hanya berubah jika data keluar batas atau rentang terlalu lebar
+        low, high = self.ax_temp.get_ylim()
+        need_low, need_high = temp_data.min() - 0.5, temp_data.max() + 0.5
+        if need_low < low or need_high > high or (high - low) > 4 * (need_high - need_low + 2):
+            self.ax_temp.set_ylim(temp_data.min() - 2, temp_data.max() + 2)
+            return True
+        return False
+
+    def _update_hum_artists(self, hum_data, hum_times):
+        """Update artist kelembaban, return True jika batas sumbu berubah"""
+        markevery = None
+        if self.max_hold and len(hum_data):
+            # Nilai yang masih ditahan digambar sampai sekarang (tanpa marker)
+            held_until = min(time.time(), hum_times[-1] + self.max_hold)
+            if held_until > hum_times[-1]:
+                markevery = slice(0, len(hum_data))
+                hum_times = np.append(hum_times, held_until)
+                hum_data = np.append(hum_data, hum_data[-1])
+        self.hum_line.set_markevery(markevery)
+        self.hum_line.set_data(hum_times, hum_data)
+        if not len(hum_data):
+            return False
+        # Jendela waktu digeser bertahap (25%) agar tidak perlu full redraw tiap sampel
+        first, last = hum_times[0], hum_times[-1]
+        span = max(last - first, 10.0)
+        low, high = self.ax_hum.get_xlim()
+        if last > high or first < low or first > low + 0.5 * span:
+            self.ax_hum.set_xlim(first, last + 0.25 * span)
+            return True
+        return False
+
+    def update_graph(self):
+        """
+        Update grafik suhu dan kelembapan secara realtime
+        """
+        self._graph_after_id = None
+        self._last_graph = time.monotonic()
+        started = time.perf_counter()
         try:
-            self.temp_scatter.remove()
-        except Exception:
-            pass
-        self.temp_scatter = self.ax_temp.scatter(x, temp_data, c=colors, s=60, zorder=3)
-
-        self.ax_temp.set_xlim(0, max(10, len(temp_data)))
-        # autoscale y slightly around data
-        if temp_data:
-            ymin = min(temp_data) - 2
-            ymax = max(temp_data) + 2
-            self.ax_temp.set_ylim(ymin, ymax)
-        else:
-            self.ax_temp.set_ylim(15, 45)
-        self.ax_temp.set_title("Grafik Suhu Real-time", fontsize=16, color="#ffffff", backgroundcolor="#1976d2")
-
-        # Kelembaban: sumbu X berupa waktu
-        if len(hum_data) > 0:
-            # Ambil waktu dari last_update untuk setiap data
-            time_labels = []
-            # use available time_history labels (may be shorter than hum_data)
-            for i in range(len(hum_data)):
-                if i < len(times):
-                    time_labels.append(times[i])
+            device = self.active_device
+            versions = {
+                self.ax_temp: (device, self.history.version(device, 'temperature')),
+                self.ax_hum: (device, self.history.version(device, 'humidity')),
+            }
+            # Axes yang datanya berubah sejak frame terakhir; kosong = skip frame
+            changed = [ax for ax, version in versions.items() if self._graph_versions.get(ax) != version]
+            if changed:
+                self._graph_versions = versions
+                full_redraw = self._graph_backgrounds is None
+
+                # View langsung ke ring buffer (tanpa copy ke list)
+                if self.ax_temp in changed:
+                    full_redraw |= self._update_temp_artists(self.history.values(device, 'temperature'))
+                if self.ax_hum in changed:
+                    full_redraw |= self._update_hum_artists(
+                        self.history.values(device, 'humidity'),
+                        self.history.times(device, 'humidity')
+                    )
+
+                if full_redraw:
+                    # draw_event akan menyimpan background baru
+                    self.full_redraws += 1
+                    self.canvas.draw_idle()
                 else:
-                    time_labels.append(str(i))
-            self.hum_line.set_data(range(len(hum_data)), hum_data)
-            self.ax_hum.set_xlim(-0.5, len(hum_data)-0.5)
-            # reduce number of x-ticks for readability
-            step = max(1, len(time_labels)//6)
-            ticks = list(range(0, len(time_labels), step))
-            if (len(time_labels)-1) not in ticks:
-                ticks.append(len(time_labels)-1)
-            self.ax_hum.set_xticks(ticks)
-            self.ax_hum.set_xticklabels([time_labels[i] for i in ticks], rotation=45, fontsize=8)
-        else:
-            self.hum_line.set_data([], [])
-            self.ax_hum.set_xlim(0, 1)
-        self.ax_hum.set_ylim(40, 100)
-        self.ax_hum.set_title("Grafik Kelembaban Real-time", fontsize=16, color="#ffffff", backgroundcolor="#1976d2")
+                    # Blit: pulihkan background axes yang berubah dan gambar ulang artist-nya
+                    for ax in changed:
+                        self.canvas.restore_region(self._graph_backgrounds[ax])
+                        for artist in (ax.lines + ax.collections):
+                            self.fig.draw_artist(artist)
+                        self.canvas.blit(ax.bbox)
+
+                elapsed = time.perf_counter() - started
+                self.redraw_count += 1
+                self.redraw_seconds += elapsed
+                self.redraw_max_seconds = max(self.redraw_max_seconds, elapsed)
+        except Exception as e:
+            print(f"[Dashboard] Error updating graph: {e}")
 
-        self.canvas.draw_idle()
-        # keep updating graphs periodically (only if still running)
-        if self.is_running and hasattr(self, 'root'):
-            try:
-                self._graph_after_id = self.root.after(self.graph_update_interval, self.update_graph)
-            except Exception:
-                # If scheduling fails because root was destroyed, just stop
-                self._graph_after_id = None
+    def schedule_hold_tick(self):
+        """Selama nilai masih ditahan: perpanjang grafik dan cek data basi secara berkala"""
+        if self._hold_after_id is not None or not self.is_running:
+            return
+        interval = min(self.max_hold, 10.0)
+        try:
+            self._hold_after_id = self.root.after(int(interval * 1000), self._hold_tick)
+        except Exception:
+            self._hold_after_id = None
+
+    def _hold_tick(self):
+        self._hold_after_id = None
+        last_report = self._last_report.get(self.active_device)
+        if last_report is None:
+            return
+        age = time.time() - last_report
+        if age > self.max_hold:
+            # Device yang tampil tidak melapor/heartbeat dalam max_hold: nilai tidak lagi berlaku
+            last = datetime.fromtimestamp(last_report).strftime("%H:%M:%S")
+            self.apply_view({'last_update': {'text': f"Last update: {last} (stale)", 'foreground': "#ff3b3f"}})
+            return
+        # Paksa grafik kelembaban digambar ulang agar nilai yang ditahan sampai ke "sekarang"
+        if self.fig is not None:
+            self._graph_versions.pop(self.ax_hum, None)
+            self.request_graph()
+        self.schedule_hold_tick()
+
+    def request_graph(self):
+        """Jadwalkan update_graph sekali, maks sekali per graph_update_interval"""
+        if self._graph_after_id is not None or self.fig is None or not self.is_running:
+            return
+        delay = self._last_graph + self.graph_update_interval / 1000.0 - time.monotonic()
+        try:
+            self._graph_after_id = self.root.after(max(0, int(delay * 1000)), self.update_graph)
+        except Exception:
+            # root sudah di-destroy
+            self._graph_after_id = None
 
     def process_messages(self):
         """
         Process incoming MQTT messages
         """
         # Background thread: read messages and put them into a thread-safe queue.
+        # get_messages tidur di condition variable sampai ada message (atau 1 detik
+        # untuk cek status koneksi); main loop hanya dibangunkan jika ada perubahan.
         while self.is_running:
             try:
+                batch = self.mqtt_client.get_messages(max_items=self.batch_size, timeout=1.0)
+                if batch:
+                    # enqueue the whole batch (single lock) for main thread to process
+                    self.msg_queue.put_many(batch)
+
                 # check connection but don't touch GUI here
                 try:
                     conn = self.mqtt_client.check_connection()
                 except Exception:
                     conn = False
+                changed = conn != self._connection_flag
                 self._connection_flag = conn
 
-                msg = self.mqtt_client.get_message(timeout=0.5)
-                if msg:
-                    # enqueue for main thread to process
-                    self.msg_queue.append(msg)
+                if batch or changed:
+                    self.wake()
             except Exception as e:
                 print(f"[Dashboard] Error reading messages: {e}")
 
         # end while
 
+    def wake(self):
+        """Bangunkan main loop dari thread lain (maks satu event tertunda)"""
+        if self._wake_pending or not self.is_running:
+            return
+        self._wake_pending = True
+        try:
+            self.root.event_generate('<<MessagesReady>>', when='tail')
+        except (tk.TclError, RuntimeError):
+            # mainloop belum/tidak berjalan; frame berikutnya tetap menguras queue
+            self._wake_pending = False
+
+    def _on_wake(self, event=None):
+        self._wake_pending = False
+        self.request_frame()
+
+    def request_frame(self):
+        """Jadwalkan update_ui sekali, tidak lebih cepat dari frame_interval"""
+        if self._ui_after_id is not None or not self.is_running:
+            return
+        delay = self._last_frame + self.frame_interval - time.monotonic()
+        try:
+            self._ui_after_id = self.root.after(max(0, int(delay * 1000)), self.update_ui)
+        except Exception:
+            self._ui_after_id = None
+
     def start_message_processor(self):
         """
         Mulai thread untuk process MQTT messages
@@ -535,36 +681,85 @@ class DashboardUI:
 
     def update_ui(self):
         """Main-thread UI updater: process queued messages and refresh status/labels."""
+        self._ui_after_id = None
+        self._last_frame = started = time.monotonic()
+        self.frame_count += 1
         try:
             # Connection status
             if self._connection_flag and not self.connection_status:
                 self.connection_status = True
                 self.status_label.config(text="● Connected", foreground="green")
+                # Hanya koneksi pertama yang dicatat sebagai fase startup
+                if self.startup is not None and not self._connected_once:
+                    self.startup.mark("connected")
+                self._connected_once = True
             elif not self._connection_flag and self.connection_status:
                 self.connection_status = False
                 self.status_label.config(text="● Disconnected", foreground="#ff3b3f")
 
-            # Process all queued messages
-            while self.msg_queue:
-                msg = self.msg_queue.popleft()
-                self.message_count += 1
-                topic = msg.get('topic', '')
-                data = msg.get('data', {})
-                # Update sensor display (this will append data_history and timestamps)
-                self.update_sensor_display(topic, data)
-
-            # Update message count label
-            self.message_count_label.config(text=f"Messages received: {self.message_count}")
+            # Process all queued messages as one batch
+            batch = self.msg_queue.drain()
+            if batch:
+                picked = time.time()
+                self.message_count += len(batch)
+                # Update sensor display once per batch (history gets every sample)
+                self.update_sensor_display_batch(batch)
+                self.record_latency(batch, picked)
+                self.request_graph()
+                if self.max_hold:
+                    self.schedule_hold_tick()
+
+            # Update message count label (hanya jika berubah)
+            self.apply_view({'message_count': {'text': f"Messages received: {self.message_count}"}})
+            self.update_queue_stats()
+            self.update_latency_stats()
 
         except Exception as e:
             print(f"[Dashboard] Error in update_ui: {e}")
         finally:
-            # Reschedule only if still running and root exists
-            if self.is_running and hasattr(self, 'root'):
-                try:
-                    self._ui_after_id = self.root.after(500, self.update_ui)
-                except Exception:
-                    self._ui_after_id = None
+            # Frame mahal (banyak message) -> jarak frame diperlebar agar UI
+            # memakai maks ~25% waktu main loop; kembali ke refresh_rate saat ringan
+            cost = time.monotonic() - started
+            self.frame_interval = max(self.refresh_interval, 4 * cost)
+
+    def get_queue_stats(self):
+        """Counter dropped/coalesced untuk queue MqttClient dan queue dashboard"""
+        stats = {'dashboard': self.msg_queue.stats()}
+        try:
+            stats['mqtt'] = self.mqtt_client.get_queue_stats()
+        except Exception:
+            pass
+        return stats
+
+    def update_queue_stats(self):
+        """Tampilkan total message yang dibuang/digabung"""
+        stats = self.get_queue_stats()
+        dropped = sum(s['dropped'] for s in stats.values())
+        coalesced = sum(s['coalesced'] for s in stats.values())
+        self.apply_view({'queue_stats': {'text': f"Dropped: {dropped} | Coalesced: {coalesced}"}})
+
+    def record_latency(self, batch, picked):
+        """Catat latency tahap ui_queue (dequeue -> update_ui), render dan total"""
+        if self.latency is None:
+            return
+        rendered = time.time()
+        self.latency.record('render', rendered - picked)
+        self.latency.record_many('ui_queue', [picked - m['dequeued'] for m in batch if 'dequeued' in m])
+        self.latency.record_many('total', [rendered - m['timestamp'] for m in batch if 'timestamp' in m])
+
+    def get_latency_stats(self):
+        """p50/p95/p99/max (ms) per tahap: network, queue, ui_queue, render, total"""
+        if self.latency is None:
+            return {}
+        return self.latency.snapshot()
+
+    def update_latency_stats(self):
+        """Tampilkan persentil latency di status bar (maks sekali per detik)"""
+        now = time.monotonic()
+        if self.latency is None or now - self._latency_shown_at < 1.0:
+            return
+        self._latency_shown_at = now
+        self.apply_view(latency_view(self.get_latency_stats()))
 
     def on_close(self):
         """
@@ -584,6 +779,11 @@ class DashboardUI:
                 self.root.after_cancel(self._graph_after_id)
         except Exception:
             pass
+        try:
+            if getattr(self, '_hold_after_id', None):
+                self.root.after_cancel(self._hold_after_id)
+        except Exception:
+            pass
 
         # Try to disconnect mqtt client gracefully
         try:
@@ -597,9 +797,10 @@ class DashboardUI:
         except Exception:
             pass
 
-    def get_data_history(self):
+    def get_data_history(self, device=None):
         """Return a copy of buffered data history for tests or external access."""
-        return {k: list(v) for k, v in self.data_history.items()}
+        device = device or self.active_device
+        return {k: self.history.values(device, k).tolist() for k in self.metrics}
 
     def run(self):
         """Run the Tk main loop (blocking)."""
@@ -1,17 +1,85 @@
 import network
+import struct
 import utime
 import ujson
 from umqtt.simple import MQTTClient
 import machine
 import dht
 
+# Frame biner satu siklus (13 byte), layout sama dengan mqtt/frames.py:
+# versi, flags, timestamp, suhu x100, kelembapan x100, tekanan x10, kode LED
+FRAME_FORMAT = "<BBIhHHB"
+FRAME_VERSION = 1
+LED_CODES = {"OFF": 0, "GREEN": 1, "YELLOW": 2, "RED": 3}
+
+
+def encode_frame(timestamp, temperature=None, humidity=None, pressure=None, led=None):
+    """Gabungkan semua pembacaan ke satu frame bytes (None = tidak ada)"""
+    return struct.pack(
+        FRAME_FORMAT, FRAME_VERSION, 0, timestamp,
+        -32768 if temperature is None else int(round(temperature * 100)),
+        0xFFFF if humidity is None else int(round(humidity * 100)),
+        0xFFFF if pressure is None else int(round(pressure * 10)),
+        0xFF if led is None else LED_CODES[led]
+    )
+
+
+class DeadbandReporter:
+    """Mode lapor hemat: rata-rata per jendela, kirim hanya jika berubah
+
+    Setiap `window` pembacaan dirata-rata. Hasilnya dikirim jika salah satu
+    metric bergeser >= deadband dari nilai terakhir yang DIKIRIM, atau jika
+    sudah `heartbeat` detik tanpa publish. Di antara laporan, penerima
+    menganggap nilai terakhir masih berlaku (sample-and-hold).
+    """
+
+    def __init__(self, deadband, window=1, heartbeat=300):
+        self.deadband = deadband      # dict metric -> perubahan minimal
+        self.window = window
+        self.heartbeat = heartbeat
+        self._sums = {}
+        self._count = 0
+        self.last_sent = None
+        self.last_time = None
+
+    def add(self, values, now, force=False):
+        """Tambah satu pembacaan; kembalikan nilai rata-rata jika harus dikirim, atau None"""
+        for key, value in values.items():
+            self._sums[key] = self._sums.get(key, 0.0) + value
+        self._count += 1
+        if self._count < self.window and not force:
+            return None
+
+        average = {key: total / self._count for key, total in self._sums.items()}
+        self._sums = {}
+        self._count = 0
+
+        send = force or self.last_sent is None or now - self.last_time >= self.heartbeat
+        if not send:
+            for key, value in average.items():
+                previous = self.last_sent.get(key)
+                if previous is None or abs(value - previous) >= self.deadband.get(key, 0):
+                    send = True
+                    break
+        if not send:
+            return None
+        self.last_sent = average
+        self.last_time = now
+        return average
+
+
 class ESP32DHTMqtt:
     """ESP32 dengan sensor DHT dan MQTT publish"""
 
-    def __init__(self, broker_host, client_id, topics_config):
+    def __init__(self, broker_host, client_id, topics_config, payload_format="json", reporter=None):
         self.broker_host = broker_host
         self.client_id = client_id
         self.topics = topics_config
+        # "json": tiga message JSON per siklus, "frame": satu frame biner
+        self.payload_format = payload_format
+        # DeadbandReporter opsional; None = kirim setiap pembacaan
+        self.reporter = reporter
+        self.last_led = None
 
         self.wifi = network.WLAN(network.STA_IF)
         self.mqtt = None
@@ -43,6 +111,23 @@ class ESP32DHTMqtt:
         print(f"\nWiFi Connected. IP: {self.wifi.ifconfig()[0]}")
         return True
 
+    def sync_time(self, retries=3):
+        """Set RTC dari NTP agar timestamp payload sejalan dengan jam server"""
+        try:
+            import ntptime
+        except ImportError:
+            print("[Time] ntptime tidak tersedia, timestamp memakai RTC lokal")
+            return False
+        for _ in range(retries):
+            try:
+                ntptime.settime()
+                print(f"[Time] RTC synced via NTP: {utime.time()}")
+                return True
+            except Exception as e:
+                print(f"[Time] NTP sync failed: {e}")
+                utime.sleep(1)
+        return False
+
     def on_message(self, topic, msg):
         """Terima pesan dari GUI untuk kontrol LED"""
         topic = topic.decode()
@@ -111,6 +196,21 @@ class ESP32DHTMqtt:
 
         led_status = self.update_led_status(temperature)
 
+        if self.reporter is not None:
+            # Perubahan LED selalu dikirim langsung
+            values = self.reporter.add({"temperature": temperature, "humidity": humidity},
+                                       utime.time(), force=led_status != self.last_led)
+            if values is None:
+                return
+            temperature, humidity = values["temperature"], values["humidity"]
+        self.last_led = led_status
+
+        if self.payload_format == "frame":
+            frame = encode_frame(int(utime.time()), temperature, humidity, led=led_status)
+            self.mqtt.publish(self.topics["sensor_frame"], frame)
+            print(f"[Publish] Frame Temp={temperature:.2f}C, Hum={humidity:.2f}%, LED={led_status}")
+            return
+
         payload_temp = ujson.dumps({"temperature": temperature, "timestamp": int(utime.time())})
         payload_hum = ujson.dumps({"humidity": humidity, "timestamp": int(utime.time())})
         payload_led = ujson.dumps({"led": led_status, "timestamp": int(utime.time())})
@@ -142,15 +242,25 @@ def run_esp32_dht():
     TOPICS = {
         "sensor_temp": "sensor/esp32/2/temperature",
         "sensor_humidity": "sensor/esp32/2/humidity",
+        "sensor_frame": "sensor/esp32/2/frame",
         "sensor_led": "sensor/esp32/2/led"
     }
 
-    esp = ESP32DHTMqtt(BROKER, CLIENT_ID, TOPICS)
+    # Default: kirim setiap pembacaan (cocok dengan `reporting.max_hold` = 0 di config.json).
+    # Mode deadband: lapor jika suhu berubah >= 0.5°C atau kelembapan >= 2%, rata-rata
+    # 3 pembacaan, heartbeat tiap 5 menit. Jika diaktifkan, set juga `reporting.max_hold`
+    # >= heartbeat (mis. 900) agar server menahan nilai terakhir di antara laporan.
+    reporter = None
+    # reporter = DeadbandReporter({"temperature": 0.5, "humidity": 2.0}, window=3, heartbeat=300)
+    esp = ESP32DHTMqtt(BROKER, CLIENT_ID, TOPICS, payload_format="frame", reporter=reporter)
 
     if not esp.connect_wifi(SSID, PASSWORD):
         print("[System] WiFi connection failed!")
         return
 
+    # Tanpa NTP, RTC mulai dari 2000-01-01 setiap boot dan latency jaringan tidak bisa diukur
+    esp.sync_time()
+
     if not esp.connect_mqtt():
         print("[System] MQTT connection failed!")
         return
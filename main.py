@@ -1,11 +1,27 @@
 # main.py - Main application launcher
-import sys
 import time
+
+# Waktu mulai diambil sebelum import berat agar ikut terukur
+_STARTED = time.perf_counter()
+
+import argparse
+import json
+import signal
+import sys
 from mqtt.client import MqttClient
-from dashboard.ui import DashboardUI
+from utils.metrics import start_metrics_server
+from utils.startup import StartupTimer
 
-def main():
+def main(config_file='config.json'):
     """Main application function"""
+    startup = StartupTimer(_STARTED)
+    # DashboardUI (tkinter; matplotlib dimuat setelah window tampil) hanya di-import di mode GUI
+    from dashboard.ui import DashboardUI
+    startup.mark("imports")
+
+    metrics_server = None
+    mqtt_client = None
+
     print("="*50)
     print("IoT MQTT Dashboard - Startup")
     print("="*50)
@@ -13,24 +29,22 @@ def main():
     try:
         # Step 1: Initialize MQTT Client
         print("\n[STARTUP] Initializing MQTT Client...")
-        mqtt_client = MqttClient('config.json')
+        mqtt_client = MqttClient(config_file)
+
+        # Step 2: Initialize Dashboard (window tampil dengan status "Connecting...")
+        print("[STARTUP] Initializing Dashboard UI...")
+        dashboard = DashboardUI(mqtt_client, config_file, startup=startup)
+        startup.mark("dashboard created")
 
-        # Step 2: Connect to MQTT Broker
+        # Step 3: Connect to MQTT Broker di background (paho retry sampai broker siap)
         print("[STARTUP] Connecting to MQTT Broker...")
-        if not mqtt_client.connect():
-            print("[ERROR] Failed to connect to MQTT broker!")
-            print("Make sure mosquitto broker is running on the configured host")
-            print(f"Check config.json for broker settings")
+        if not mqtt_client.connect(wait=False):
+            print("[ERROR] Failed to start MQTT connection!")
+            print(f"Check {config_file} for broker settings")
             return False
 
-        print("[SUCCESS] Connected to MQTT Broker")
-        time.sleep(1)
-
-        # Step 3: Initialize Dashboard
-        print("[STARTUP] Initializing Dashboard UI...")
-        dashboard = DashboardUI(mqtt_client, 'config.json')
-
-        print("[SUCCESS] Dashboard initialized")
+        # Optional: endpoint /metrics (Prometheus)
+        metrics_server = start_metrics_server(dashboard.config, mqtt_client, dashboard)
         print("\n" + "="*50)
         print("Dashboard running - waiting for sensor data...")
         print("="*50 + "\n")
@@ -48,11 +62,73 @@ def main():
 
     finally:
         print("[SHUTDOWN] Cleaning up resources...")
+        if metrics_server is not None:
+            metrics_server.stop()
         try:
-            mqtt_client.disconnect()
+            if mqtt_client is not None:
+                mqtt_client.disconnect()
         except:
             pass
         print("[SHUTDOWN] Application stopped")
 
+def main_headless(config_file='config.json', workers=None):
+    """Ingest tanpa GUI: MqttClient + logger + rollup + metrics, berhenti bersih saat SIGTERM/SIGINT
+
+    workers > 1 (atau `ingest.workers` di config) memakai ShardedIngestService:
+    decode, validasi dan penulisan dibagi ke beberapa proses.
+    """
+    from utils.ingest import IngestService, ShardedIngestService
+
+    print("="*50)
+    print("IoT MQTT Ingest - Headless Startup")
+    print("="*50)
+
+    if workers is None:
+        with open(config_file, 'r') as f:
+            workers = json.load(f).get('ingest', {}).get('workers', 1)
+    if workers > 1:
+        service = ShardedIngestService(config_file, workers)
+    else:
+        service = IngestService(config_file)
+
+    def request_stop(signum, frame):
+        print(f"\n[SHUTDOWN] Received signal {signum}, stopping...")
+        service.stop()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    try:
+        print("\n[STARTUP] Starting ingest pipeline...")
+        if not service.start():
+            print("[ERROR] Failed to connect to MQTT broker!")
+            print(f"Check {config_file} for broker settings")
+            return False
+        print("[SUCCESS] Ingest running - waiting for sensor data...")
+        service.run()
+        return True
+
+    except Exception as e:
+        print(f"\n[ERROR] Application error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+    finally:
+        print("[SHUTDOWN] Cleaning up resources...")
+        service.close()
+        print("[SHUTDOWN] Application stopped")
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="IoT MQTT Dashboard")
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--headless', action='store_true',
+                        help="run ingest (logger, rollups, metrics) without the Tk dashboard")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="headless ingest worker processes (default: ingest.workers in config)")
+    args = parser.parse_args()
+
+    if args.headless:
+        sys.exit(0 if main_headless(args.config, args.workers) else 1)
+    main(args.config)
\ No newline at end of file
@@ -1,4 +1,9 @@
 # mqtt/__init__.py
 from mqtt.client import MqttClient
+from mqtt.async_client import AsyncMqttClient
+from mqtt.decoders import DecoderRegistry, LazyPayload
+from mqtt.ingest_queue import BoundedMessageQueue
+from mqtt.router import TopicRouter
 
-__all__ = ['MqttClient']
\ No newline at end of file
+__all__ = ['MqttClient', 'AsyncMqttClient', 'DecoderRegistry', 'LazyPayload', 'TopicRouter',
+           'BoundedMessageQueue']
\ No newline at end of file
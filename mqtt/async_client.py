@@ -0,0 +1,353 @@
+# mqtt/async_client.py - MQTT Client berbasis asyncio
+import asyncio
+import paho.mqtt.client as mqtt
+from mqtt.client import MqttClient
+from mqtt.router import TopicRouter
+
+
+class AsyncMqttClient(MqttClient):
+    """MQTT Client yang berjalan di event loop asyncio
+
+    API sama dengan MqttClient, tetapi `connect`, `disconnect`, `publish`,
+    `publish_many`, `get_message` dan `get_messages` adalah coroutine
+    (`publish_async` dan `wait_for_publish` versi thread tidak dipakai). Socket paho didaftarkan
+    langsung ke event loop (tanpa thread `loop_start()`), sehingga satu event
+    loop bisa menjalankan banyak koneksi sekaligus.
+
+    Message bisa dibaca dengan `async for msg in client.messages('sensor/#')`.
+    Message yang tidak cocok dengan stream mana pun masuk ke queue biasa.
+    """
+
+    def __init__(self, config_file='config.json'):
+        super().__init__(config_file)
+
+        self.loop = None
+        self._misc_task = None
+        self._closing = False
+        self._connected_event = asyncio.Event()
+        self._data_ready = asyncio.Event()
+        # Di-set saat paho menutup socket (setelah paket DISCONNECT terkirim)
+        self._socket_gone = asyncio.Event()
+        # mid -> (MQTTMessageInfo, future) untuk publish dengan wait=True
+        self._pending_publish = {}
+        # Slot in-flight versi asyncio (dilepas di on_publish, di thread event loop)
+        self.publish_slots = asyncio.Semaphore(self.max_inflight) if self.max_inflight else None
+        # Stream aktif untuk messages(): list (router filter, asyncio.Queue)
+        self._streams = []
+
+        self.client.on_socket_open = self._on_socket_open
+        self.client.on_socket_close = self._on_socket_close
+        self.client.on_socket_register_write = self._on_socket_register_write
+        self.client.on_socket_unregister_write = self._on_socket_unregister_write
+
+    # --- Integrasi socket paho dengan event loop ---
+
+    def _in_loop(self, callback, *args):
+        """Jalankan di thread event loop
+
+        connect()/reconnect() paho dijalankan di executor, sehingga callback
+        socket bisa datang dari thread lain.
+        """
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            callback(*args)
+        else:
+            self.loop.call_soon_threadsafe(callback, *args)
+
+    def _on_socket_open(self, client, userdata, sock):
+        self._in_loop(self._socket_opened, client, sock)
+
+    def _socket_opened(self, client, sock):
+        self._socket_gone.clear()
+        self.loop.add_reader(sock, client.loop_read)
+        if self._misc_task is None or self._misc_task.done():
+            self._misc_task = self.loop.create_task(self._misc_loop())
+
+    def _on_socket_close(self, client, userdata, sock):
+        self._in_loop(self._socket_closed, sock)
+
+    def _socket_closed(self, sock):
+        self.loop.remove_reader(sock)
+        self.loop.remove_writer(sock)
+        self._socket_gone.set()
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self._in_loop(self.loop.add_writer, sock, client.loop_write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self._in_loop(self.loop.remove_writer, sock)
+
+    async def _misc_loop(self):
+        """Keepalive/retry paho, dan reconnect jika koneksi putus"""
+        while not self._closing:
+            rc = self.client.loop_misc()
+            if rc == mqtt.MQTT_ERR_NO_CONN and not self._closing:
+                await asyncio.sleep(2)
+                try:
+                    print("[MQTT] Reconnecting...")
+                    # Connect TCP memblok (DNS, timeout): jangan di thread event loop
+                    await self.loop.run_in_executor(None, self.client.reconnect)
+                except Exception as e:
+                    print(f"[MQTT] Reconnect failed: {e}")
+                continue
+            await asyncio.sleep(1)
+
+    # --- Callback paho ---
+
+    def on_connect(self, client, userdata, flags, rc):
+        super().on_connect(client, userdata, flags, rc)
+        if self.is_connected:
+            self._connected_event.set()
+
+    def on_disconnect(self, client, userdata, rc):
+        super().on_disconnect(client, userdata, rc)
+        self._connected_event.clear()
+
+    def on_publish(self, client, userdata, mid):
+        super().on_publish(client, userdata, mid)
+        pending = self._pending_publish.pop(mid, None)
+        if pending is not None and not pending[1].done():
+            pending[1].set_result(True)
+
+    def _reclaim_lost_slots(self):
+        super()._reclaim_lost_slots()
+        # Message QoS 0 yang dibuang paho saat reconnect tidak pernah dapat on_publish
+        for mid, (info, future) in list(self._pending_publish.items()):
+            if info.rc not in (mqtt.MQTT_ERR_SUCCESS, mqtt.MQTT_ERR_NO_CONN):
+                del self._pending_publish[mid]
+                if not future.done():
+                    future.set_result(False)
+
+    def _deliver(self, message):
+        """Kirim ke stream yang cocok, sisanya ke queue biasa"""
+        delivered = False
+        for stream_filter, stream in self._streams:
+            if stream_filter is None or stream_filter.match(message['topic']):
+                if stream.full():
+                    stream.get_nowait()
+                    self.message_queue.dropped += 1
+                stream.put_nowait(message)
+                delivered = True
+
+        if not delivered:
+            self.message_queue.put(message)
+            self._data_ready.set()
+
+    # --- API ---
+
+    async def connect(self, timeout=10):
+        """Hubungkan ke broker MQTT (awaitable)"""
+        self.loop = asyncio.get_running_loop()
+        self._closing = False
+        try:
+            print(f"[MQTT] Connecting to {self.broker_config['host']}:{self.broker_config['port']}")
+
+            if self.broker_config['username']:
+                self.client.username_pw_set(
+                    self.broker_config['username'],
+                    self.broker_config['password']
+                )
+
+            await asyncio.wait_for(self.loop.run_in_executor(
+                None,
+                self.client.connect,
+                self.broker_config['host'],
+                self.broker_config['port'],
+                self.broker_config['keepalive']
+            ), timeout)
+
+            await asyncio.wait_for(self._connected_event.wait(), timeout)
+            return True
+
+        except asyncio.TimeoutError:
+            print("[MQTT] Connection timeout!")
+            return False
+        except Exception as e:
+            print(f"[MQTT] Connection error: {e}")
+            return False
+
+    async def disconnect(self, timeout=5):
+        """Disconnect dari broker
+
+        Menunggu paho mengirim DISCONNECT dan menutup socket (maks `timeout`),
+        sehingga tidak ada reader/writer yang tertinggal saat event loop ditutup.
+        """
+        self._closing = True
+        sock = self.client.socket()
+        self.client.disconnect()
+        if sock is not None:
+            try:
+                await asyncio.wait_for(self._socket_gone.wait(), timeout)
+            except asyncio.TimeoutError:
+                # DISCONNECT tidak terkirim: lepas socket dari event loop sekarang
+                self._socket_closed(sock)
+        if self._misc_task is not None:
+            self._misc_task.cancel()
+            self._misc_task = None
+        for _, future in self._pending_publish.values():
+            if not future.done():
+                future.set_result(False)
+        self._pending_publish.clear()
+        print("[MQTT] Disconnected from broker")
+
+    async def publish(self, topic_key, data, wait=True, qos=None):
+        """Publish data ke topik, tunggu PUBACK jika `wait` (maks `publish_timeout`)"""
+        if not self.is_connected:
+            print("[MQTT] Not connected to broker")
+            return False
+
+        try:
+            prepared = self._prepare_publish(topic_key, data)
+            if prepared is None:
+                return False
+            result = await self._publish_prepared_async(prepared[0], prepared[1], qos)
+            if result is None:
+                return False
+
+            if wait:
+                return await self._wait_published([result]) == 1
+            return True
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.publish_errors += 1
+            print(f"[MQTT] Publish error: {e}")
+            return False
+
+    async def publish_many(self, messages, qos=None, wait=False):
+        """Publish batch (topic_key, data) tanpa menunggu ACK per message
+
+        Menunggu hanya jika in-flight mencapai `max_inflight`. Kembalikan
+        jumlah message yang berhasil diserahkan ke paho; dengan `wait=True`
+        jumlah message yang terkirim/di-ACK dalam `publish_timeout`.
+        """
+        if not self.is_connected:
+            print("[MQTT] Not connected to broker")
+            return 0
+
+        sent = 0
+        infos = []
+        for topic_key, data in messages:
+            try:
+                prepared = self._prepare_publish(topic_key, data)
+                if prepared is None:
+                    continue
+                result = await self._publish_prepared_async(prepared[0], prepared[1], qos)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.publish_errors += 1
+                print(f"[MQTT] Publish error: {e}")
+                continue
+            if result is None:
+                continue
+            sent += 1
+            infos.append(result)
+
+        if wait:
+            return await self._wait_published(infos)
+        return sent
+
+    def _watch_publish(self, info):
+        """Future: True saat message terkirim/di-ACK, False jika dibuang paho"""
+        future = self.loop.create_future()
+        if info.rc not in (mqtt.MQTT_ERR_SUCCESS, mqtt.MQTT_ERR_NO_CONN):
+            future.set_result(False)
+        elif info.rc == mqtt.MQTT_ERR_SUCCESS and info.is_published():
+            future.set_result(True)
+        else:
+            # NO_CONN QoS 1/2: dikirim ulang paho setelah reconnect
+            self._pending_publish[info.mid] = (info, future)
+        return future
+
+    async def _wait_published(self, infos):
+        """Tunggu message (maks `publish_timeout`), kembalikan jumlah yang terkirim"""
+        if not infos:
+            return 0
+        futures = [self._watch_publish(info) for info in infos]
+        await asyncio.wait(futures, timeout=self.publish_timeout)
+        delivered = 0
+        waiting = 0
+        for info, future in zip(infos, futures):
+            if future.done():
+                delivered += future.result()
+            else:
+                waiting += 1
+                future.cancel()
+                self._pending_publish.pop(info.mid, None)
+        if waiting:
+            print(f"[MQTT] Publish timeout: {waiting} messages not acknowledged")
+        return delivered
+
+    async def _publish_prepared_async(self, topic_path, payload, qos=None):
+        """Seperti `_publish_prepared`, tetapi menunggu slot tanpa memblok event loop"""
+        if self.publish_slots is not None:
+            self._reclaim_lost_slots()
+            try:
+                await asyncio.wait_for(self.publish_slots.acquire(), self.publish_timeout)
+            except asyncio.TimeoutError:
+                self.publish_errors += 1
+                print(f"[MQTT] Publish timeout: {self.max_inflight} messages in flight")
+                return None
+
+        qos = self.qos_for(topic_path) if qos is None else qos
+        return self._track_publish(self.client.publish(topic_path, payload, qos=qos), qos)
+
+    async def get_message(self, timeout=1.0):
+        """Ambil satu message dari queue, None jika timeout"""
+        batch = await self.get_messages(max_items=1, timeout=timeout)
+        return batch[0] if batch else None
+
+    async def get_messages(self, max_items=100, timeout=1.0):
+        """Ambil beberapa message sekaligus dari queue (batch)"""
+        deadline = self.loop.time() + timeout if timeout is not None else None
+        while True:
+            batch = self.message_queue.get_batch(max_items, timeout=0)
+            if batch:
+                self._record_dequeue(batch)
+                return batch
+
+            self._data_ready.clear()
+            remaining = None if deadline is None else deadline - self.loop.time()
+            if remaining is not None and remaining <= 0:
+                return []
+            try:
+                await asyncio.wait_for(self._data_ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                return []
+
+    async def messages(self, topic_filter=None, maxsize=None):
+        """Async iterator message; `topic_filter` boleh memakai wildcard MQTT
+
+        Filter hanya menyaring message dari topic yang sudah di-subscribe;
+        gunakan `subscribe()` untuk menambah langganan baru.
+        """
+        stream_filter = None
+        if topic_filter is not None:
+            stream_filter = TopicRouter()
+            stream_filter.add(topic_filter)
+
+        if maxsize is None:
+            maxsize = self.message_queue.capacity
+        stream = asyncio.Queue(maxsize)
+        entry = (stream_filter, stream)
+        self._streams.append(entry)
+        try:
+            while True:
+                message = await stream.get()
+                self._record_dequeue([message])
+                yield message
+        finally:
+            self._streams.remove(entry)
+
+    async def __aenter__(self):
+        if not await self.connect():
+            raise ConnectionError("Failed to connect to MQTT broker")
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.disconnect()
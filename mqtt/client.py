@@ -1,9 +1,14 @@
 # mqtt/client.py - MQTT Client untuk komunikasi
 import json
 import paho.mqtt.client as mqtt
-from queue import Queue
-from threading import Thread
+from collections import deque
+from threading import Event, Lock, Semaphore, Thread
 import time
+from mqtt.decoders import DecoderRegistry
+from mqtt.ingest_queue import BoundedMessageQueue
+from mqtt.publish import PayloadTemplate
+from mqtt.router import TopicRouter, device_id_from_params
+from utils.latency import LatencyTracker, device_epoch, network_latency
 
 class MqttClient:
     """MQTT Client untuk komunikasi dengan broker"""
@@ -16,19 +21,72 @@ class MqttClient:
 
         self.broker_config = config['broker']
         self.topics = config['topics']
+        # debug: cetak setiap message yang diterima (mahal pada laju tinggi)
+        self.debug = config.get('debug', False)
+
+        # Decoder payload per topic (json / lazy / raw / text / frame)
+        decoding = config.get('decoding', {})
+        self.decoders = DecoderRegistry.from_config(config)
+        self.keep_raw_payload = decoding.get('keep_raw_payload', False)
+
+        # Router wildcard untuk armada device (sensor/+/+/temperature, ...)
+        self.router = TopicRouter()
+        for pattern in config.get('subscriptions', []):
+            self.router.add(pattern)
 
         # Setup client
         self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1)
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
         self.client.on_disconnect = self.on_disconnect
+        self.client.on_publish = self.on_publish
+
+        # Publish: QoS default/per topic, batas message in-flight, template payload
+        publish_config = config.get('publish', {})
+        self.publish_qos = publish_config.get('qos', 1)
+        self.topic_qos = {
+            self.topics.get(topic, topic): qos
+            for topic, qos in publish_config.get('topics', {}).items()
+        }
+        self.publish_timeout = publish_config.get('block_timeout', 5.0)
+        self.max_inflight = publish_config.get('max_inflight', 1000)
+        # Slot dilepas di on_publish; 0 = tanpa batas
+        self.publish_slots = Semaphore(self.max_inflight) if self.max_inflight else None
+        # MQTTMessageInfo QoS 0 yang belum terkirim: paho membuangnya saat reconnect
+        # tanpa memanggil on_publish, slotnya diambil kembali di _reclaim_lost_slots
+        self._qos0_pending = deque()
+        self._qos0_lock = Lock()
+        if self.max_inflight:
+            self.client.max_inflight_messages_set(self.max_inflight)
+        self.templates = {}
+        for topic, template in publish_config.get('templates', {}).items():
+            self.add_template(topic, template)
+
+        # Message queue (terbatas) untuk handling di thread terpisah
+        queue_config = config.get('queue', {})
+        self.message_queue = BoundedMessageQueue(
+            capacity=queue_config.get('capacity', 0),
+            policy=queue_config.get('policy', 'drop_oldest'),
+            block_timeout=queue_config.get('block_timeout')
+        )
 
-        # Message queue untuk handling di thread terpisah
-        self.message_queue = Queue()
+        # Histogram latency per tahap (device -> on_message -> dequeue -> ...)
+        self.latency = LatencyTracker()
 
         # Status tracking
         self.is_connected = False
         self.subscribed_topics = []
+        # Di-set oleh on_connect; connect() menunggu event ini, bukan polling
+        self._connected = Event()
+
+        # Counter untuk metrics (di-update di thread network paho)
+        self.messages_received = {}
+        self.connect_count = 0
+        self.disconnect_count = 0
+        self.published_count = 0
+        self.publish_errors = 0
+        # Timestamp device yang dibuang dari tahap 'network' (jam device tidak sinkron)
+        self.clock_skew_samples = 0
 
         print("[MQTT] Client initialized")
 
@@ -37,54 +95,82 @@ class MqttClient:
         if rc == 0:
             print("[MQTT] Connected to broker successfully")
             self.is_connected = True
+            self.connect_count += 1
+            self._connected.set()
+            self._reclaim_lost_slots()
 
             # Subscribe ke semua topik sensor
-            for topic_name, topic_path in self.topics.items():
-                if topic_name.startswith('sensor_') or topic_name.startswith('button_'):
-                    self.client.subscribe(topic_path)
-                    self.subscribed_topics.append(topic_path)
-                    print(f"[MQTT] Subscribed to: {topic_path}")
+            for topic_path in self.sensor_topics():
+                self._subscribe_filter(topic_path)
+
+            # Subscribe ke filter wildcard dari router
+            for topic_filter in self.router.filters():
+                self._subscribe_filter(topic_filter)
         else:
             print(f"[MQTT] Connection failed with code {rc}")
             self.is_connected = False
 
+    def sensor_topics(self):
+        """Path topik sensor/button dari config yang di-subscribe otomatis"""
+        return [
+            topic_path for topic_name, topic_path in self.topics.items()
+            if topic_name.startswith('sensor_') or topic_name.startswith('button_')
+        ]
+
     def on_message(self, client, userdata, msg):
         """Callback saat menerima message"""
         topic = msg.topic
-        payload = msg.payload.decode()
+        self.messages_received[topic] = self.messages_received.get(topic, 0) + 1
 
-        try:
-            # Coba parse sebagai JSON
-            data = json.loads(payload)
-            message = {
-                'topic': topic,
-                'data': data,
-                'timestamp': time.time(),
-                'raw_payload': payload
-            }
-        except json.JSONDecodeError:
-            # Jika bukan JSON, simpan sebagai string
-            message = {
-                'topic': topic,
-                'data': payload,
-                'timestamp': time.time(),
-                'raw_payload': payload
-            }
+        # Decode sesuai decoder topic (JSON non-valid jadi string)
+        message = {
+            'topic': topic,
+            'data': self.decoders.decode(topic, msg.payload),
+            'timestamp': time.time()
+        }
+        if self.keep_raw_payload:
+            message['raw_payload'] = msg.payload.decode(errors='replace')
 
+        # Routing via trie: ambil device id dan panggil handler terdaftar
+        for handler, params in self.router.match(topic):
+            if 'device_id' not in message:
+                device_id = device_id_from_params(params)
+                if device_id is not None:
+                    message['device_id'] = device_id
+            if handler is not None:
+                try:
+                    handler(message, params)
+                except Exception as e:
+                    print(f"[MQTT] Handler error on {topic}: {e}")
+
+        self._deliver(message)
+        if self.debug:
+            print(f"[MQTT] Message received - Topic: {topic}, {len(msg.payload)} bytes")
+
+    def _deliver(self, message):
+        """Serahkan message ke consumer (queue ingest)"""
         self.message_queue.put(message)
-        print(f"[MQTT] Message received - Topic: {topic}, Payload: {payload}")
 
     def on_disconnect(self, client, userdata, rc):
         """Callback saat client disconnect"""
         if rc != 0:
+            self.disconnect_count += 1
             print(f"[MQTT] Unexpected disconnection: {rc}")
         else:
             print("[MQTT] Disconnected from broker")
 
         self.is_connected = False
+        self._connected.clear()
+        # Clean session: langganan hilang di broker, di-subscribe ulang di on_connect
+        self.subscribed_topics = []
+
+    def connect(self, timeout=10, wait=True):
+        """Hubungkan ke broker MQTT
 
-    def connect(self):
-        """Hubungkan ke broker MQTT"""
+        wait=False: kembali langsung; koneksi (dan retry jika broker belum
+        siap) ditangani thread network paho, cek `is_connected` atau
+        `wait_connected()`.
+        """
         try:
             print(f"[MQTT] Connecting to {self.broker_config['host']}:{self.broker_config['port']}")
 
@@ -95,6 +181,15 @@ class MqttClient:
                     self.broker_config['password']
                 )
 
+            if not wait:
+                self.client.connect_async(
+                    self.broker_config['host'],
+                    self.broker_config['port'],
+                    self.broker_config['keepalive']
+                )
+                self.client.loop_start()
+                return True
+
             # Connect ke broker
             self.client.connect(
                 self.broker_config['host'],
@@ -105,14 +200,10 @@ class MqttClient:
             # Start network loop di thread terpisah
             self.client.loop_start()
 
-            # Tunggu sampai connected
-            timeout = 10
-            start_time = time.time()
-            while not self.is_connected:
-                if time.time() - start_time > timeout:
-                    print("[MQTT] Connection timeout!")
-                    return False
-                time.sleep(0.1)
+            # Tunggu sampai connected (on_connect men-set event)
+            if not self.wait_connected(timeout):
+                print("[MQTT] Connection timeout!")
+                return False
 
             return True
 
@@ -120,44 +211,170 @@ class MqttClient:
             print(f"[MQTT] Connection error: {e}")
             return False
 
+    def wait_connected(self, timeout=None):
+        """Blok sampai terhubung ke broker, False jika timeout"""
+        return self._connected.wait(timeout)
+
     def disconnect(self):
         """Disconnect dari broker"""
         self.client.loop_stop()
         self.client.disconnect()
         print("[MQTT] Disconnected from broker")
 
-    def publish(self, topic_key, data):
-        """Publish data ke topik tertentu"""
+    def on_publish(self, client, userdata, mid):
+        """Callback saat message selesai dikirim (QoS 0) atau di-ACK broker (QoS 1/2)"""
+        self.published_count += 1
+        if self.publish_slots is not None:
+            self.publish_slots.release()
+
+    def add_template(self, topic_key, template):
+        """Pakai template untuk payload dict pada topic ini (tanpa json.dumps)"""
+        if not isinstance(template, PayloadTemplate):
+            template = PayloadTemplate(template)
+        self.templates[self.topics.get(topic_key, topic_key)] = template
+        return template
+
+    def qos_for(self, topic_path):
+        """QoS untuk topic: override per topic di config, atau default"""
+        return self.topic_qos.get(topic_path, self.publish_qos)
+
+    def publish(self, topic_key, data, qos=None, wait=False, timeout=None, block=True):
+        """Publish data ke topik tertentu
+
+        wait=True menunggu sampai message terkirim/di-ACK (maks `timeout`).
+        block=False gagal langsung jika slot in-flight penuh (untuk thread UI).
+        """
+        info = self.publish_async(topic_key, data, qos, block)
+        if info is None:
+            return False
+        if wait:
+            return self.wait_for_publish([info], timeout)
+        return True
+
+    def publish_async(self, topic_key, data, qos=None, block=True):
+        """Publish tanpa menunggu; kembalikan MQTTMessageInfo, None jika gagal
+
+        Status pengiriman bisa dicek dengan `info.is_published()` atau
+        ditunggu dengan `wait_for_publish()`.
+        """
         if not self.is_connected:
             print("[MQTT] Not connected to broker")
-            return False
+            return None
 
         try:
-            # Get topic path dari konfigurasi
-            topic_path = self.topics.get(topic_key)
-            if not topic_path:
-                print(f"[MQTT] Topic key '{topic_key}' not found in config")
-                return False
+            prepared = self._prepare_publish(topic_key, data)
+            if prepared is None:
+                return None
+            return self._publish_prepared(prepared[0], prepared[1], qos, block)
 
-            # Convert data ke JSON jika dictionary
-            if isinstance(data, dict):
-                payload = json.dumps(data)
-            else:
-                payload = str(data)
+        except Exception as e:
+            self.publish_errors += 1
+            print(f"[MQTT] Publish error: {e}")
+            return None
 
-            # Publish message
-            result = self.client.publish(topic_path, payload, qos=1)
+    def publish_many(self, messages, qos=None):
+        """Publish batch (topic_key, data) secara pipeline
 
-            if result.rc == mqtt.MQTT_ERR_SUCCESS:
-                print(f"[MQTT] Published to {topic_path}: {payload}")
-                return True
-            else:
-                print(f"[MQTT] Publish failed: {result.rc}")
+        Message dikirim tanpa menunggu ACK satu per satu; jika jumlah
+        in-flight mencapai `max_inflight`, pemanggil menunggu slot kosong.
+        Kembalikan list MQTTMessageInfo (None untuk message yang gagal).
+        """
+        if not self.is_connected:
+            print("[MQTT] Not connected to broker")
+            return []
+
+        infos = []
+        for topic_key, data in messages:
+            try:
+                prepared = self._prepare_publish(topic_key, data)
+                infos.append(None if prepared is None else self._publish_prepared(prepared[0], prepared[1], qos))
+            except Exception as e:
+                self.publish_errors += 1
+                print(f"[MQTT] Publish error: {e}")
+                infos.append(None)
+        return infos
+
+    def wait_for_publish(self, infos, timeout=None):
+        """Tunggu semua MQTTMessageInfo terkirim, False jika timeout/gagal"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for info in infos:
+            if info is None:
+                return False
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                info.wait_for_publish(remaining)
+            except (ValueError, RuntimeError):
                 return False
+            if not info.is_published():
+                return False
+        return True
 
-        except Exception as e:
-            print(f"[MQTT] Publish error: {e}")
-            return False
+    def _publish_prepared(self, topic_path, payload, qos=None, block=True):
+        """Ambil slot in-flight lalu serahkan ke paho, None jika gagal"""
+        if self.publish_slots is not None:
+            self._reclaim_lost_slots()
+            acquired = (self.publish_slots.acquire(timeout=self.publish_timeout) if block
+                        else self.publish_slots.acquire(blocking=False))
+            if not acquired:
+                self.publish_errors += 1
+                print(f"[MQTT] Publish timeout: {self.max_inflight} messages in flight")
+                return None
+
+        qos = self.qos_for(topic_path) if qos is None else qos
+        info = self.client.publish(topic_path, payload, qos=qos)
+        return self._track_publish(info, qos)
+
+    def _track_publish(self, info, qos):
+        """Cek hasil client.publish; lepas slot jika message tidak akan di-ACK"""
+        # NO_CONN QoS 1/2: message tetap di antrean paho dan dikirim setelah reconnect.
+        # QoS 0 tanpa koneksi langsung dibuang paho (on_publish tidak pernah dipanggil).
+        if info.rc == mqtt.MQTT_ERR_SUCCESS or (info.rc == mqtt.MQTT_ERR_NO_CONN and qos > 0):
+            if qos == 0 and self.publish_slots is not None:
+                self._qos0_pending.append(info)
+            return info
+        if self.publish_slots is not None:
+            self.publish_slots.release()
+        self.publish_errors += 1
+        print(f"[MQTT] Publish failed: {info.rc}")
+        return None
+
+    def _reclaim_lost_slots(self):
+        """Lepas slot message QoS 0 yang dibuang paho saat koneksi putus"""
+        with self._qos0_lock:
+            pending = self._qos0_pending
+            while pending:
+                info = pending[0]
+                if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                    if not info.is_published():
+                        break
+                    # Terkirim normal: slot sudah dilepas on_publish
+                    pending.popleft()
+                    continue
+                pending.popleft()
+                self.publish_errors += 1
+                self.publish_slots.release()
+
+    def _prepare_publish(self, topic_key, data):
+        """Resolve topic path dan encode payload, None jika topic tidak ada
+
+        bytes/bytearray dikirim apa adanya (payload yang sudah di-encode),
+        dict memakai template topic jika ada, selain itu json.dumps.
+        """
+        # Get topic path dari konfigurasi
+        topic_path = self.topics.get(topic_key)
+        if not topic_path:
+            print(f"[MQTT] Topic key '{topic_key}' not found in config")
+            return None
+
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            payload = data
+        elif isinstance(data, dict):
+            template = self.templates.get(topic_path)
+            payload = template.render(data) if template is not None else json.dumps(data)
+        else:
+            payload = str(data)
+
+        return topic_path, payload
 
     def get_message(self, timeout=1.0):
         """Ambil message dari queue"""
@@ -166,6 +383,75 @@ class MqttClient:
         except:
             return None
 
+    def get_messages(self, max_items=100, timeout=1.0):
+        """Ambil beberapa message sekaligus dari queue (batch)
+
+        Menunggu maksimal `timeout` detik untuk message pertama, lalu
+        menguras sisa queue (maks `max_items`) dalam satu kali lock.
+        Mengembalikan list kosong jika tidak ada message.
+        """
+        batch = self.message_queue.get_batch(max_items, timeout)
+        if batch:
+            self._record_dequeue(batch)
+        return batch
+
+    def _record_dequeue(self, batch):
+        """Stempel waktu dequeue dan catat latency tahap network & queue
+
+        Tahap network (timestamp device -> on_message) hanya dihitung untuk
+        payload yang sudah berupa dict, agar LazyPayload tidak ikut di-parse.
+        """
+        now = time.time()
+        queued = []
+        network = []
+        for message in batch:
+            received = message['timestamp']
+            message['dequeued'] = now
+            queued.append(now - received)
+            data = message.get('data')
+            if type(data) is dict:
+                sent = device_epoch(data.get('timestamp'))
+                if sent is not None:
+                    delay = network_latency(received, sent)
+                    if delay is None:
+                        self.clock_skew_samples += 1
+                    else:
+                        network.append(delay)
+        self.latency.record_many('queue', queued)
+        if network:
+            self.latency.record_many('network', network)
+
+    def get_latency_stats(self):
+        """p50/p95/p99/max (ms) per tahap pipeline, jendela bergulir"""
+        return self.latency.snapshot()
+
+    def get_queue_stats(self):
+        """Counter queue ingest (depth, dropped, coalesced, ...)"""
+        return self.message_queue.stats()
+
+    def _subscribe_filter(self, topic_filter):
+        """Subscribe ke filter MQTT jika belum"""
+        if topic_filter in self.subscribed_topics:
+            return
+        self.client.subscribe(topic_filter)
+        self.subscribed_topics.append(topic_filter)
+        print(f"[MQTT] Subscribed to: {topic_filter}")
+
+    def subscribe(self, pattern, handler=None):
+        """Subscribe ke pattern wildcard dan daftarkan handler
+
+        Handler dipanggil di thread network paho dengan (message, params);
+        message tetap masuk ke queue seperti biasa.
+        """
+        topic_filter = self.router.add(pattern, handler)
+        if self.is_connected:
+            self._subscribe_filter(topic_filter)
+        return topic_filter
+
+    def set_decoder(self, topic, decoder):
+        """Atur decoder payload untuk topic (nama topic di config atau path)"""
+        self.decoders.register(self.topics.get(topic, topic), decoder)
+
     def check_connection(self):
         """Cek status koneksi"""
         return self.is_connected
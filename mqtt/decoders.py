@@ -0,0 +1,166 @@
+# mqtt/decoders.py - Payload decoder per topic
+from collections.abc import Mapping
+from mqtt.frames import decode_frame
+from mqtt.router import TopicRouter
+
+# Pilih backend JSON tercepat yang tersedia, fallback ke stdlib
+try:
+    import orjson as _json_backend
+    JSON_BACKEND = 'orjson'
+except ImportError:
+    try:
+        import ujson as _json_backend
+        JSON_BACKEND = 'ujson'
+    except ImportError:
+        import json as _json_backend
+        JSON_BACKEND = 'json'
+
+json_loads = _json_backend.loads
+
+
+def decode_json(payload):
+    """Parse payload sebagai JSON, fallback ke string jika bukan JSON"""
+    try:
+        return json_loads(payload)
+    except ValueError:
+        return payload.decode(errors='replace')
+
+
+def decode_text(payload):
+    """Decode payload sebagai string UTF-8"""
+    return payload.decode(errors='replace')
+
+
+def decode_raw(payload):
+    """Passthrough: kembalikan bytes apa adanya"""
+    return payload
+
+
+def decode_lazy(payload):
+    """Simpan bytes, parse JSON hanya saat field dibaca"""
+    return LazyPayload(payload)
+
+
+class LazyPayload(Mapping):
+    """Payload JSON yang baru di-parse saat pertama kali diakses"""
+
+    __slots__ = ('_payload', '_value', '_parsed')
+
+    def __init__(self, payload):
+        self._payload = payload
+        self._value = None
+        self._parsed = False
+
+    @property
+    def raw(self):
+        """Bytes asli dari broker"""
+        return self._payload
+
+    @property
+    def value(self):
+        """Hasil parse lengkap (dict, list, angka, atau string)"""
+        if not self._parsed:
+            self._value = decode_json(self._payload)
+            self._parsed = True
+        return self._value
+
+    def _mapping(self):
+        value = self.value
+        return value if isinstance(value, dict) else {}
+
+    def __getitem__(self, key):
+        return self._mapping()[key]
+
+    def __iter__(self):
+        return iter(self._mapping())
+
+    def __len__(self):
+        return len(self._mapping())
+
+    def __contains__(self, key):
+        return key in self._mapping()
+
+    def to_dict(self):
+        """Salinan dict biasa (untuk logging/serialisasi)"""
+        return dict(self._mapping())
+
+    def __repr__(self):
+        if self._parsed:
+            return f"LazyPayload({self._value!r})"
+        return f"LazyPayload(<{len(self._payload)} bytes, unparsed>)"
+
+
+class DecoderRegistry:
+    """Registry decoder payload berdasarkan topic MQTT"""
+
+    BUILTIN = {
+        'json': decode_json,
+        'lazy': decode_lazy,
+        'raw': decode_raw,
+        'text': decode_text,
+        'frame': decode_frame,
+    }
+
+    def __init__(self, default='json'):
+        self.default = self.resolve(default)
+        self.decoders = {}
+        # Decoder untuk pattern wildcard (sensor/+/+/temperature, ...)
+        self.patterns = TopicRouter()
+        # Jumlah payload yang gagal di-decode (jatuh ke teks)
+        self.errors = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """Registry dari section `decoding` config.json (key topic boleh nama di `topics`)"""
+        decoding = config.get('decoding', {})
+        topics = config.get('topics', {})
+        registry = cls(decoding.get('default', 'json'))
+        for topic, decoder in decoding.get('topics', {}).items():
+            registry.register(topics.get(topic, topic), decoder)
+        return registry
+
+    def resolve(self, decoder):
+        """Ubah nama decoder ('json', 'lazy', ...) menjadi callable"""
+        if callable(decoder):
+            return decoder
+        try:
+            return self.BUILTIN[decoder]
+        except KeyError:
+            raise ValueError(f"Unknown decoder '{decoder}'")
+
+    def register(self, topic, decoder):
+        """Daftarkan decoder (nama atau callable) untuk topic atau pattern"""
+        decoder = self.resolve(decoder)
+        if '+' in topic or '#' in topic:
+            self.patterns.remove(topic)
+            self.patterns.add(topic, decoder)
+        else:
+            self.decoders[topic] = decoder
+
+    def unregister(self, topic):
+        """Hapus decoder khusus untuk topic atau pattern"""
+        self.decoders.pop(topic, None)
+        self.patterns.remove(topic)
+
+    def get(self, topic):
+        """Dapatkan decoder untuk topic (exact, lalu wildcard, lalu default)"""
+        decoder = self.decoders.get(topic)
+        if decoder is not None:
+            return decoder
+        matches = self.patterns.match(topic)
+        return matches[0][0] if matches else self.default
+
+    def decode(self, topic, payload):
+        """Decode payload bytes memakai decoder topic
+
+        Payload yang gagal di-decode dihitung di `errors` dan dikembalikan
+        sebagai teks (sama seperti fallback decode_json).
+        """
+        decoder = self.get(topic)
+        try:
+            if decoder is decode_json:
+                return json_loads(payload)
+            return decoder(payload)
+        except Exception:
+            self.errors += 1
+            return decode_text(payload)
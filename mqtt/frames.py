@@ -0,0 +1,130 @@
+# mqtt/frames.py - Frame biner ringkas untuk data sensor (satu frame per siklus)
+#
+# Layout (little-endian, 13 byte), sama dengan encoder MicroPython di esp32-sensor.py:
+#   B  version       FRAME_VERSION
+#   B  flags         0 (bit cadangan untuk ekstensi)
+#   I  timestamp     detik (epoch device: MicroPython 2000-01-01 atau Unix)
+#   h  temperature   °C x 100       (-32768 = tidak ada)
+#   H  humidity      % x 100        (65535 = tidak ada)
+#   H  pressure      hPa x 10       (65535 = tidak ada)
+#   B  led           LED_STATES     (255 = tidak ada)
+import struct
+from utils.latency import MICROPYTHON_EPOCH_OFFSET
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FRAME_FORMAT = '<BBIhHHB'
+FRAME_VERSION = 1
+FRAME = struct.Struct(FRAME_FORMAT)
+FRAME_SIZE = FRAME.size
+
+LED_STATES = ('OFF', 'GREEN', 'YELLOW', 'RED')
+LED_CODES = {state: code for code, state in enumerate(LED_STATES)}
+
+MISSING_TEMPERATURE = -32768
+MISSING_UNSIGNED = 0xFFFF
+MISSING_LED = 0xFF
+
+# Faktor skala nilai -> integer di frame
+SCALES = {'temperature': 100, 'humidity': 100, 'pressure': 10}
+
+if np is not None:
+    FRAME_DTYPE = np.dtype([
+        ('version', 'u1'), ('flags', 'u1'), ('timestamp', '<u4'),
+        ('temperature', '<i2'), ('humidity', '<u2'), ('pressure', '<u2'), ('led', 'u1'),
+    ])
+else:
+    FRAME_DTYPE = None
+
+_unpack = FRAME.unpack_from
+
+
+def _scaled(value, scale, missing):
+    return missing if value is None else int(round(value * scale))
+
+
+def frame_epoch(timestamp):
+    """Timestamp frame -> epoch Unix (detik); skalar atau array NumPy
+
+    Timestamp MicroPython (sejak 2000-01-01) digeser ke epoch Unix,
+    timestamp yang sudah Unix tidak diubah.
+    """
+    if np is not None and isinstance(timestamp, np.ndarray):
+        timestamp = timestamp.astype(np.float64)
+        timestamp[timestamp < MICROPYTHON_EPOCH_OFFSET] += MICROPYTHON_EPOCH_OFFSET
+        return timestamp
+    if timestamp < MICROPYTHON_EPOCH_OFFSET:
+        timestamp += MICROPYTHON_EPOCH_OFFSET
+    return float(timestamp)
+
+
+def encode_frame(timestamp, temperature=None, humidity=None, pressure=None, led=None, flags=0):
+    """Satu frame bytes dari nilai sensor (None = tidak ada)"""
+    return FRAME.pack(
+        FRAME_VERSION, flags, int(timestamp),
+        _scaled(temperature, SCALES['temperature'], MISSING_TEMPERATURE),
+        _scaled(humidity, SCALES['humidity'], MISSING_UNSIGNED),
+        _scaled(pressure, SCALES['pressure'], MISSING_UNSIGNED),
+        MISSING_LED if led is None else LED_CODES[led],
+    )
+
+
+def decode_frame(payload):
+    """Frame bytes -> dict seperti payload JSON (field kosong tidak disertakan)
+
+    Key sama dengan payload JSON ESP32: temperature, humidity, pressure,
+    led (warna indikator) dan timestamp (epoch Unix, lihat frame_epoch).
+    """
+    if len(payload) != FRAME_SIZE:
+        raise ValueError(f"Frame must be {FRAME_SIZE} bytes, got {len(payload)}")
+    version, flags, timestamp, temperature, humidity, pressure, led = _unpack(payload)
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported frame version {version}")
+
+    data = {'timestamp': frame_epoch(timestamp)}
+    if temperature != MISSING_TEMPERATURE:
+        data['temperature'] = temperature / 100
+    if humidity != MISSING_UNSIGNED:
+        data['humidity'] = humidity / 100
+    if pressure != MISSING_UNSIGNED:
+        data['pressure'] = pressure / 10
+    if led != MISSING_LED:
+        data['led'] = LED_STATES[led] if led < len(LED_STATES) else str(led)
+    if flags:
+        data['flags'] = flags
+    return data
+
+
+def decode_frames(frames):
+    """Decode banyak frame sekaligus (NumPy frombuffer, tanpa loop Python)
+
+    frames: bytes/bytearray berisi frame yang disambung, atau iterable bytes
+    per frame. Kembalikan dict kolom: timestamp (epoch Unix, float64),
+    temperature/humidity/pressure (float64, NaN = tidak ada), led (kode
+    LED_STATES, 255 = tidak ada) dan flags.
+    """
+    if np is None:
+        raise RuntimeError("NumPy is required for bulk frame decoding")
+    if not isinstance(frames, (bytes, bytearray, memoryview)):
+        frames = b''.join(frames)
+    if len(frames) % FRAME_SIZE:
+        raise ValueError(f"Buffer length {len(frames)} is not a multiple of {FRAME_SIZE}")
+
+    records = np.frombuffer(frames, dtype=FRAME_DTYPE)
+    if len(records) and (records['version'] != FRAME_VERSION).any():
+        raise ValueError("Unsupported frame version in buffer")
+
+    columns = {'timestamp': frame_epoch(records['timestamp'])}
+    for name, missing in (('temperature', MISSING_TEMPERATURE),
+                          ('humidity', MISSING_UNSIGNED),
+                          ('pressure', MISSING_UNSIGNED)):
+        raw = records[name]
+        values = raw / float(SCALES[name])
+        values[raw == missing] = np.nan
+        columns[name] = values
+    columns['led'] = records['led'].copy()
+    columns['flags'] = records['flags'].copy()
+    return columns
@@ -0,0 +1,166 @@
+# mqtt/ingest_queue.py - Queue message dengan kapasitas dan kebijakan backpressure
+import threading
+from collections import OrderedDict, deque
+from queue import Empty
+
+
+class BoundedMessageQueue:
+    """Queue thread-safe dengan kapasitas terbatas
+
+    Kebijakan saat queue penuh:
+    - 'block'            : tunggu sampai ada ruang (maks `block_timeout`,
+                           lalu message baru dibuang)
+    - 'drop_oldest'      : buang message paling lama
+    - 'drop_newest'      : buang message yang baru masuk
+    - 'latest_per_topic' : simpan hanya message terakhir per topic,
+                           message lama untuk topic yang sama digabung
+    Kapasitas 0 berarti tanpa batas.
+    """
+
+    POLICIES = ('block', 'drop_oldest', 'drop_newest', 'latest_per_topic')
+
+    def __init__(self, capacity=0, policy='drop_oldest', block_timeout=None, key=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown queue policy '{policy}'")
+
+        self.capacity = capacity
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.key = key or (lambda message: message.get('topic'))
+
+        self._coalesce = policy == 'latest_per_topic'
+        self._items = OrderedDict() if self._coalesce else deque()
+
+        self.mutex = threading.Lock()
+        self.not_empty = threading.Condition(self.mutex)
+        self.not_full = threading.Condition(self.mutex)
+
+        # Counter untuk monitoring
+        self.enqueued = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.high_watermark = 0
+
+    def _full(self):
+        return self.capacity > 0 and len(self._items) >= self.capacity
+
+    def _append(self, item):
+        """Tambah satu item (mutex sudah dipegang), return False jika dibuang"""
+        if self._coalesce:
+            key = self.key(item)
+            if key in self._items:
+                # Ganti message lama, posisi di queue tetap
+                self._items[key] = item
+                self.coalesced += 1
+                return True
+            if self._full():
+                self._items.popitem(last=False)
+                self.dropped += 1
+            self._items[key] = item
+        elif self._full():
+            if self.policy == 'drop_newest':
+                self.dropped += 1
+                return False
+            if self.policy == 'drop_oldest':
+                self._items.popleft()
+                self.dropped += 1
+            else:
+                # block: bangunkan consumer lalu tunggu ruang kosong
+                self.not_empty.notify_all()
+                if not self.not_full.wait_for(lambda: not self._full(), self.block_timeout):
+                    self.dropped += 1
+                    return False
+            self._items.append(item)
+        else:
+            self._items.append(item)
+
+        self.enqueued += 1
+        if len(self._items) > self.high_watermark:
+            self.high_watermark = len(self._items)
+        return True
+
+    def put(self, item):
+        """Masukkan satu message, return False jika message dibuang"""
+        with self.mutex:
+            added = self._append(item)
+            if added:
+                self.not_empty.notify()
+            return added
+
+    def put_many(self, items):
+        """Masukkan banyak message dengan satu kali lock"""
+        added = 0
+        with self.mutex:
+            for item in items:
+                if self._append(item):
+                    added += 1
+            if added:
+                self.not_empty.notify_all()
+        return added
+
+    def _pop(self):
+        if self._coalesce:
+            return self._items.popitem(last=False)[1]
+        return self._items.popleft()
+
+    def get(self, block=True, timeout=None):
+        """Ambil satu message, raise queue.Empty jika kosong"""
+        with self.not_empty:
+            if block:
+                if not self.not_empty.wait_for(lambda: self._items, timeout):
+                    raise Empty
+            elif not self._items:
+                raise Empty
+            item = self._pop()
+            self.not_full.notify()
+            return item
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def get_batch(self, max_items=100, timeout=None):
+        """Tunggu message pertama (maks `timeout`), lalu kuras sampai `max_items`"""
+        with self.not_empty:
+            if timeout is None or timeout > 0:
+                if not self.not_empty.wait_for(lambda: self._items, timeout):
+                    return []
+            batch = []
+            while self._items and len(batch) < max_items:
+                batch.append(self._pop())
+            if batch:
+                self.not_full.notify_all()
+            return batch
+
+    def drain(self):
+        """Ambil semua message yang ada tanpa menunggu"""
+        with self.mutex:
+            if self._coalesce:
+                batch = list(self._items.values())
+            else:
+                batch = list(self._items)
+            self._items.clear()
+            if batch:
+                self.not_full.notify_all()
+            return batch
+
+    def qsize(self):
+        return len(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def empty(self):
+        return not self._items
+
+    def stats(self):
+        """Counter queue: depth, capacity, enqueued, dropped, coalesced"""
+        with self.mutex:
+            return {
+                'depth': len(self._items),
+                'capacity': self.capacity,
+                'policy': self.policy,
+                'enqueued': self.enqueued,
+                'dropped': self.dropped,
+                'coalesced': self.coalesced,
+                'high_watermark': self.high_watermark,
+            }
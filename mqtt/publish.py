@@ -0,0 +1,45 @@
+# mqtt/publish.py - Template payload untuk publish message berbentuk tetap
+import json
+
+
+class PayloadTemplate:
+    """Payload dengan bentuk tetap; hanya nilai yang diformat ke string
+
+    Untuk message yang field-nya selalu sama (data sensor, perintah LED),
+    format string jauh lebih murah daripada `json.dumps` per message:
+
+        template = PayloadTemplate('{{"temperature": {temperature:.1f}, "timestamp": {timestamp}}}')
+        template.render({'temperature': 24.5, 'timestamp': 1700000000})
+
+    Nilai string tidak di-escape; gunakan hanya untuk angka atau teks yang
+    sudah diketahui aman.
+    """
+
+    __slots__ = ('template', '_format')
+
+    def __init__(self, template):
+        self.template = template
+        self._format = template.format
+
+    def render(self, values=None, **fields):
+        """Payload bytes dari dict `values` dan/atau keyword"""
+        if values:
+            fields = {**values, **fields} if fields else values
+        return self._format(**fields).encode()
+
+    @classmethod
+    def from_fields(cls, fields, formats=None):
+        """Template JSON object dari daftar nama field
+
+        formats: dict nama field -> format spec (mis. {'temperature': '.1f'})
+        """
+        formats = formats or {}
+        parts = []
+        for name in fields:
+            spec = formats.get(name, '')
+            key = json.dumps(name).replace('{', '{{').replace('}', '}}')
+            parts.append(f'{key}: {{{name}{":" + spec if spec else ""}}}')
+        return cls('{{' + ', '.join(parts) + '}}')
+
+    def __repr__(self):
+        return f"PayloadTemplate({self.template!r})"
@@ -0,0 +1,148 @@
+# mqtt/router.py - Routing topic MQTT (wildcard + dan #) berbasis trie
+class _Node:
+    """Satu level topic di dalam trie"""
+
+    __slots__ = ('children', 'routes')
+
+    def __init__(self):
+        self.children = {}
+        self.routes = []
+
+
+class TopicRouter:
+    """Router topic MQTT dengan trie, mendukung wildcard `+` dan `#`
+
+    Pattern memakai sintaks filter MQTT. Level `+` boleh diberi nama,
+    misalnya `sensor/+/+device_id/temperature`; nama hanya dipakai untuk
+    parameter dan dibuang saat subscribe ke broker.
+    """
+
+    def __init__(self, cache_size=4096):
+        self.root = _Node()
+        self.cache_size = cache_size
+        self._cache = {}
+
+    @staticmethod
+    def compile_pattern(pattern):
+        """Pecah pattern menjadi (filter MQTT, list level, list nama parameter)"""
+        levels = pattern.split('/')
+        names = []
+        for i, level in enumerate(levels):
+            if level.startswith('+'):
+                names.append(level[1:] or None)
+                levels[i] = '+'
+            elif level == '#':
+                if i != len(levels) - 1:
+                    raise ValueError(f"'#' must be the last level: {pattern}")
+            elif '+' in level or '#' in level:
+                raise ValueError(f"Invalid topic pattern: {pattern}")
+        return '/'.join(levels), levels, names
+
+    def add(self, pattern, handler=None):
+        """Daftarkan handler untuk pattern, kembalikan filter MQTT-nya"""
+        topic_filter, levels, names = self.compile_pattern(pattern)
+        node = self.root
+        for level in levels:
+            child = node.children.get(level)
+            if child is None:
+                child = node.children[level] = _Node()
+            node = child
+        node.routes.append((handler, names, pattern))
+        self._cache.clear()
+        return topic_filter
+
+    def remove(self, pattern, handler=None):
+        """Hapus route untuk pattern (semua handler jika handler=None)"""
+        _, levels, _ = self.compile_pattern(pattern)
+        node = self.root
+        for level in levels:
+            node = node.children.get(level)
+            if node is None:
+                return False
+        before = len(node.routes)
+        node.routes = [
+            route for route in node.routes
+            if route[2] != pattern or (handler is not None and route[0] is not handler)
+        ]
+        self._cache.clear()
+        return len(node.routes) != before
+
+    def filters(self):
+        """List filter MQTT unik dari semua route terdaftar"""
+        result = []
+        stack = [(self.root, [])]
+        while stack:
+            node, path = stack.pop()
+            if node.routes:
+                topic_filter = '/'.join(path)
+                if topic_filter not in result:
+                    result.append(topic_filter)
+            for level, child in node.children.items():
+                stack.append((child, path + [level]))
+        return sorted(result)
+
+    def match(self, topic):
+        """Cari semua route yang cocok: list (handler, params)"""
+        matches = self._cache.get(topic)
+        if matches is not None:
+            return matches
+
+        levels = topic.split('/')
+        matches = []
+        # Topic sistem ($SYS/...) tidak cocok dengan wildcard di level pertama
+        self._walk(self.root, levels, 0, [], matches, not topic.startswith('$'))
+
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[topic] = matches
+        return matches
+
+    def _walk(self, node, levels, depth, captured, matches, allow_wildcard):
+        multi = node.children.get('#')
+        if multi is not None and allow_wildcard:
+            self._collect(multi, captured, matches, '/'.join(levels[depth:]))
+
+        if depth == len(levels):
+            self._collect(node, captured, matches)
+            return
+
+        level = levels[depth]
+        child = node.children.get(level)
+        if child is not None:
+            self._walk(child, levels, depth + 1, captured, matches, True)
+
+        single = node.children.get('+')
+        if single is not None and allow_wildcard:
+            self._walk(single, levels, depth + 1, captured + [level], matches, True)
+
+    @staticmethod
+    def _collect(node, captured, matches, rest=None):
+        for handler, names, pattern in node.routes:
+            params = {'wildcards': captured}
+            if rest is not None:
+                params['rest'] = rest
+            for name, value in zip(names, captured):
+                if name:
+                    params[name] = value
+            matches.append((handler, params))
+
+    def dispatch(self, topic, message):
+        """Panggil semua handler yang cocok, kembalikan jumlah handler"""
+        count = 0
+        for handler, params in self.match(topic):
+            if handler is not None:
+                handler(message, params)
+                count += 1
+        return count
+
+
+def device_id_from_params(params):
+    """Ambil device id dari parameter route
+
+    Memakai parameter bernama `device_id` jika ada, jika tidak gabungan
+    level wildcard `+` (misalnya `esp32/2` untuk `sensor/+/+/temperature`).
+    """
+    if 'device_id' in params:
+        return params['device_id']
+    wildcards = params.get('wildcards')
+    return '/'.join(wildcards) if wildcards else None
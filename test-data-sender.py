@@ -1,9 +1,17 @@
 # test_data_sender.py - Send test data untuk dashboard
+import argparse
 import json
+import multiprocessing
 import random
 import time
 import os
 from mqtt.client import MqttClient
+from mqtt.frames import encode_frame
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 class StableSensorSimulator:
@@ -34,6 +42,45 @@ class StableSensorSimulator:
         return self.value
 
 
+class SensorArraySimulator:
+    """Vectorized version of StableSensorSimulator for N devices at once.
+
+    Every metric is a NumPy array with one entry per device, so a single
+    `step()` advances all devices with the same pull-to-baseline + noise
+    model. The generator is seeded, making runs reproducible.
+    """
+
+    # metric: (sigma, inertia, clamp) - same parameters as send_test_data
+    PARAMS = {
+        'temperature': (0.15, 0.08, (10.0, 40.0)),
+        'humidity': (0.6, 0.06, (10.0, 100.0)),
+        'pressure': (0.4, 0.02, (950.0, 1050.0)),
+    }
+
+    def __init__(self, n_devices, baselines, seed=None, spread=1.0):
+        if np is None:
+            raise RuntimeError("NumPy is required for the load generator")
+        self.n_devices = n_devices
+        self.rng = np.random.default_rng(seed)
+        self.metrics = list(self.PARAMS)
+        # Baseline tiap device sedikit berbeda agar data tidak identik
+        self.baseline = np.array([
+            baselines[metric] + self.rng.normal(0, spread, n_devices) for metric in self.metrics
+        ])
+        self.value = self.baseline.copy()
+        self.sigma = np.array([self.PARAMS[m][0] for m in self.metrics])[:, None]
+        self.inertia = np.array([self.PARAMS[m][1] for m in self.metrics])[:, None]
+        self.low = np.array([self.PARAMS[m][2][0] for m in self.metrics])[:, None]
+        self.high = np.array([self.PARAMS[m][2][1] for m in self.metrics])[:, None]
+
+    def step(self):
+        """Advance all devices; returns array (metric, device)"""
+        noise = self.rng.normal(0.0, 1.0, self.value.shape) * self.sigma
+        self.value += (self.baseline - self.value) * self.inertia + noise
+        np.clip(self.value, self.low, self.high, out=self.value)
+        return self.value
+
+
 def load_baselines(config_path='config.json'):
     # default comfortable indoor values
     defaults = {
@@ -57,10 +104,11 @@ def load_baselines(config_path='config.json'):
     return defaults
 
 
-def send_test_data(interval=2.0, config_path='config.json'):
+def send_test_data(interval=2.0, config_path='config.json', binary=False):
     """Send simulated stable sensor data to the MQTT broker at a regular interval.
 
     interval: seconds between publishes (default 2)
+    binary: publish one binary frame (mqtt/frames.py) to `sensor_frame` instead of JSON
     """
     print("=== Test Data Sender (stable simulator) ===\n")
 
@@ -98,7 +146,11 @@ def send_test_data(interval=2.0, config_path='config.json'):
             }
 
             # Publish
-            mqtt_client.publish('sensor_temp', data)
+            if binary:
+                mqtt_client.publish('sensor_frame', encode_frame(
+                    data['timestamp'], data['temperature'], data['humidity'], data['pressure']))
+            else:
+                mqtt_client.publish('sensor_temp', data)
 
             print(f"[{counter}] Temp: {data['temperature']:.1f}°C, "
                   f"Humidity: {data['humidity']:.0f}%, "
@@ -113,5 +165,207 @@ def send_test_data(interval=2.0, config_path='config.json'):
         mqtt_client.disconnect()
 
 
+# Payload load generator: field sama dengan send_test_data + device_id
+PAYLOAD_TEMPLATE = ('{{"device_id": "{device}", "temperature": {0:.1f}, '
+                    '"humidity": {1:.1f}, "pressure": {2:.1f}, "timestamp": {ts}}}')
+
+
+def load_settings(config_path='config.json'):
+    """Broker config and `simulator` section (topic_template, ...)"""
+    with open(config_path, 'r') as f:
+        cfg = json.load(f)
+    return cfg['broker'], cfg.get('simulator', {})
+
+
+def default_topic_template(config_path='config.json'):
+    """Topic load generator yang pasti di-subscribe MqttClient/ingest
+
+    Filter pertama di `subscriptions` dengan level `+` (level `+device_id`,
+    atau `+` pertama, menjadi device; sisanya `0`); tanpa itu semua device
+    publish ke topic `sensor_temp` dan device id hanya ada di payload.
+    """
+    with open(config_path, 'r') as f:
+        cfg = json.load(f)
+    for pattern in cfg.get('subscriptions', []):
+        levels = pattern.split('/')
+        wildcards = [i for i, level in enumerate(levels) if level.startswith('+')]
+        if not wildcards or '#' in levels:
+            continue
+        device_level = levels.index('+device_id') if '+device_id' in levels else wildcards[0]
+        levels = ['0' if level.startswith('+') else level.replace('{', '{{').replace('}', '}}')
+                  for level in levels]
+        levels[device_level] = '{device}'
+        return '/'.join(levels)
+    return cfg['topics']['sensor_temp'].replace('{', '{{').replace('}', '}}')
+
+
+def _load_worker(worker, devices, rate, duration, connections, seed, topic_template,
+                 qos, config_path, dry_run, results):
+    """Entry point of a load process; always reports back, even on failure"""
+    try:
+        report = _publish_load(worker, devices, rate, duration, connections, seed,
+                               topic_template, qos, config_path, dry_run)
+    except Exception as e:
+        print(f"[Load] Worker {worker} failed: {e}")
+        report = {'worker': worker, 'devices': len(devices), 'connections': 0, 'sent': 0,
+                  'errors': 1, 'steps': 0, 'elapsed': 0.0, 'rate': 0.0, 'target_rate': rate,
+                  'error': str(e)}
+    results.put(report)
+
+
+def _publish_load(worker, devices, rate, duration, connections, seed, topic_template,
+                  qos, config_path, dry_run):
+    """Simulate `devices` and publish over `connections` clients at `rate` msg/s"""
+    import paho.mqtt.client as mqtt
+
+    broker, _ = load_settings(config_path)
+    simulator = SensorArraySimulator(len(devices), load_baselines(config_path), seed=[seed, worker])
+    topics = [topic_template.format(device=device) for device in devices]
+
+    clients = []
+    if not dry_run:
+        for i in range(connections):
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id=f"load-{seed}-{worker}-{i}")
+            if broker.get('username'):
+                client.username_pw_set(broker['username'], broker.get('password'))
+            client.max_queued_messages_set(0)
+            client.max_inflight_messages_set(1000)
+            client.connect(broker['host'], broker['port'], broker.get('keepalive', 60))
+            client.loop_start()
+            clients.append(client)
+
+    sent = 0
+    errors = 0
+    steps = 0
+    values = None
+    cursor = len(devices)
+    start = time.perf_counter()
+    deadline = start + duration
+    try:
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            # Kirim sebanyak yang seharusnya sudah terkirim sampai saat ini
+            due = int((now - start) * rate) - sent
+            if due <= 0:
+                time.sleep(min(0.005, deadline - now, (sent + 1) / rate - (now - start)))
+                continue
+            ts = int(time.time())
+            # Batch dibatasi agar deadline tetap dicek saat generator tertinggal
+            for _ in range(min(due, 1000)):
+                if cursor == len(devices):
+                    values = simulator.step().T.tolist()
+                    steps += 1
+                    cursor = 0
+                payload = PAYLOAD_TEMPLATE.format(*values[cursor], device=devices[cursor], ts=ts)
+                if clients:
+                    info = clients[sent % len(clients)].publish(topics[cursor], payload, qos=qos)
+                    if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                        errors += 1
+                cursor += 1
+                sent += 1
+        elapsed = time.perf_counter() - start
+    finally:
+        for client in clients:
+            client.loop_stop()
+            client.disconnect()
+
+    return {
+        'worker': worker,
+        'devices': len(devices),
+        'connections': len(clients),
+        'sent': sent,
+        'errors': errors,
+        'steps': steps,
+        'elapsed': elapsed,
+        'rate': sent / elapsed if elapsed else 0.0,
+        'target_rate': rate,
+    }
+
+
+def run_load(devices=100, rate=1000.0, duration=10.0, connections=1, processes=1, seed=0,
+             topic_template=None, qos=0, config_path='config.json', dry_run=False):
+    """Simulate `devices` devices publishing at an aggregate `rate` msg/s.
+
+    Devices are split round-robin over `processes` worker processes, each
+    publishing over `connections` MQTT connections. Seeds are derived from
+    `seed` and the worker index, so the same arguments give the same data.
+    Returns a report comparing the achieved rate with the target.
+    """
+    _, sim = load_settings(config_path)
+    if topic_template is None:
+        topic_template = sim.get('topic_template') or default_topic_template(config_path)
+    device_ids = [f"sim{i:05d}" for i in range(devices)]
+    processes = max(1, min(processes, devices))
+
+    print(f"=== Load generator: {devices} devices, target {rate:.0f} msg/s, "
+          f"{processes} process(es) x {connections} connection(s), seed {seed} ===")
+    print(f"Topic: {topic_template}")
+
+    results = multiprocessing.Queue()
+    workers = []
+    for worker in range(processes):
+        args = (worker, device_ids[worker::processes], rate / processes, duration, connections,
+                seed, topic_template, qos, config_path, dry_run, results)
+        if processes == 1:
+            _load_worker(*args)
+            break
+        process = multiprocessing.Process(target=_load_worker, args=args, daemon=True)
+        process.start()
+        workers.append(process)
+
+    reports = [results.get() for _ in range(processes)]
+    for process in workers:
+        process.join()
+    reports.sort(key=lambda report: report['worker'])
+
+    sent = sum(report['sent'] for report in reports)
+    elapsed = max(report['elapsed'] for report in reports) or duration
+    achieved = sent / elapsed if elapsed else 0.0
+    summary = {
+        'devices': devices,
+        'target_rate': rate,
+        'achieved_rate': achieved,
+        'ratio': achieved / rate if rate else 0.0,
+        'sent': sent,
+        'errors': sum(report['errors'] for report in reports),
+        'elapsed': elapsed,
+        'seed': seed,
+        'workers': reports,
+    }
+    print(f"Target {rate:.0f} msg/s, achieved {achieved:.0f} msg/s "
+          f"({summary['ratio'] * 100:.1f}%), sent {sent}, errors {summary['errors']}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send simulated sensor data to the MQTT broker")
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--interval', type=float, default=2.0, help="seconds between publishes (single device)")
+    parser.add_argument('--binary', action='store_true', help="send binary frames to sensor_frame (single device)")
+    parser.add_argument('--load', action='store_true', help="multi-device load generator mode")
+    parser.add_argument('--devices', type=int, default=100)
+    parser.add_argument('--rate', type=float, default=1000.0, help="target aggregate messages per second")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds")
+    parser.add_argument('--connections', type=int, default=1, help="MQTT connections per process")
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--topic', default=None, help="topic template with {device}")
+    parser.add_argument('--qos', type=int, default=0, choices=(0, 1))
+    parser.add_argument('--dry-run', action='store_true', help="generate payloads without publishing")
+    parser.add_argument('--json', action='store_true', help="print the load report as JSON")
+    args = parser.parse_args()
+
+    if not args.load:
+        send_test_data(args.interval, args.config, args.binary)
+        return
+
+    report = run_load(args.devices, args.rate, args.duration, args.connections, args.processes,
+                      args.seed, args.topic, args.qos, args.config, args.dry_run)
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+
 if __name__ == "__main__":
-    send_test_data()
\ No newline at end of file
+    main()
\ No newline at end of file
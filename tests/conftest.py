@@ -0,0 +1,25 @@
+# tests/conftest.py - Jalankan test dari root repo: python -m pytest
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    """Salinan config.json di tmp_path; `config_file(**sections)` menimpa section"""
+    with open(os.path.join(ROOT, 'config.json')) as f:
+        base = json.load(f)
+
+    def write(**sections):
+        config = dict(base, **sections)
+        config['logging'] = dict(base['logging'], log_dir=str(tmp_path / 'logs'))
+        path = tmp_path / 'config.json'
+        path.write_text(json.dumps(config))
+        return str(path)
+
+    return write
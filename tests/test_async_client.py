@@ -0,0 +1,55 @@
+# tests/test_async_client.py - AsyncMqttClient terhadap broker in-process
+import asyncio
+
+from benchmarks.broker import BenchmarkBroker
+from mqtt.async_client import AsyncMqttClient
+
+
+def broker_config(port):
+    return {'host': '127.0.0.1', 'port': port, 'username': None, 'password': None, 'keepalive': 60}
+
+
+def test_connect_publish_receive_disconnect(config_file):
+    with BenchmarkBroker() as broker:
+        path = config_file(broker=broker_config(broker.port))
+
+        async def scenario():
+            client = AsyncMqttClient(path)
+            assert await client.connect(timeout=5)
+
+            # SUBSCRIBE dari on_connect diproses broker sebelum PUBLISH ini
+            assert await client.publish('sensor_temp', {'temperature': 21.5}, wait=True)
+            message = await client.get_message(timeout=5)
+            assert message['topic'] == 'sensor/esp32/2/temperature'
+            assert message['data'] == {'temperature': 21.5}
+
+            fd = client.client.socket().fileno()
+            await client.disconnect()
+            assert not client.is_connected
+            # Socket sudah ditutup paho dan dilepas dari event loop
+            assert client.client.socket() is None
+            assert not client.loop.remove_reader(fd)
+            assert not client.loop.remove_writer(fd)
+
+        asyncio.run(scenario())
+
+
+def test_message_stream_filters_topics(config_file):
+    with BenchmarkBroker() as broker:
+        path = config_file(broker=broker_config(broker.port))
+
+        async def scenario():
+            async with AsyncMqttClient(path) as client:
+                stream = client.messages('sensor/+/+/humidity')
+                receive = asyncio.ensure_future(stream.__anext__())
+                await asyncio.sleep(0)
+                await client.publish('sensor_temp', {'temperature': 20}, wait=True)
+                await client.publish('sensor_humidity', {'humidity': 55}, wait=True)
+                message = await asyncio.wait_for(receive, 5)
+                assert message['data'] == {'humidity': 55}
+                # Topic lain tetap masuk queue biasa
+                other = await client.get_message(timeout=5)
+                assert other['topic'] == 'sensor/esp32/2/temperature'
+                await stream.aclose()
+
+        asyncio.run(scenario())
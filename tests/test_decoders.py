@@ -0,0 +1,60 @@
+# tests/test_decoders.py - Registry decoder payload per topic
+import pytest
+
+from mqtt.decoders import DecoderRegistry, LazyPayload, decode_json, decode_raw
+
+
+def test_decode_json_falls_back_to_text():
+    assert decode_json(b'{"temperature": 21.5}') == {'temperature': 21.5}
+    assert decode_json(b'ON') == 'ON'
+
+
+def test_lazy_payload_parses_on_first_access():
+    payload = LazyPayload(b'{"temperature": 21.5, "unit": "C"}')
+    assert 'unparsed' in repr(payload)
+    assert payload['temperature'] == 21.5
+    assert set(payload) == {'temperature', 'unit'}
+    assert payload.to_dict() == {'temperature': 21.5, 'unit': 'C'}
+    assert payload.raw == b'{"temperature": 21.5, "unit": "C"}'
+
+
+def test_lazy_payload_non_object_is_empty_mapping():
+    payload = LazyPayload(b'[1, 2]')
+    assert len(payload) == 0
+    assert payload.value == [1, 2]
+
+
+def test_registry_prefers_exact_then_wildcard_then_default():
+    registry = DecoderRegistry()
+    registry.register('sensor/+/+/raw', 'raw')
+    registry.register('sensor/esp32/2/raw', 'text')
+    assert registry.decode('sensor/esp32/2/raw', b'abc') == 'abc'
+    assert registry.decode('sensor/esp32/3/raw', b'abc') == b'abc'
+    assert registry.decode('sensor/esp32/3/json', b'{"a": 1}') == {'a': 1}
+    registry.unregister('sensor/+/+/raw')
+    assert registry.get('sensor/esp32/3/raw') is registry.default
+
+
+def test_registry_from_config_resolves_topic_names():
+    config = {
+        'topics': {'sensor_temp': 'sensor/esp32/2/temperature'},
+        'decoding': {'default': 'lazy', 'topics': {'sensor_temp': 'raw'}},
+    }
+    registry = DecoderRegistry.from_config(config)
+    assert registry.get('sensor/esp32/2/temperature') is decode_raw
+    assert isinstance(registry.decode('other', b'{}'), LazyPayload)
+
+
+def test_registry_counts_decoder_errors():
+    def broken(payload):
+        raise RuntimeError('boom')
+
+    registry = DecoderRegistry()
+    registry.register('x', broken)
+    assert registry.decode('x', b'data') == 'data'
+    assert registry.errors == 1
+
+
+def test_unknown_decoder_name():
+    with pytest.raises(ValueError):
+        DecoderRegistry('msgpack')
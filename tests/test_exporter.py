@@ -0,0 +1,79 @@
+# tests/test_exporter.py - Export CSV streaming dan kolom device
+import csv
+import tempfile
+
+import pytest
+
+from mqtt.decoders import LazyPayload
+from utils.exporter import DataExporter, columns_from_entries
+from utils.logger import MessageLogger
+
+
+def entries(count, late_field_at=None):
+    for i in range(count):
+        data = {'temperature': 20.0 + i % 5}
+        if i == late_field_at:
+            data['pressure'] = 1013.0
+        yield {'timestamp': 1700000000 + i, 'topic': 'sensor/t', 'data': data}
+
+
+def read_csv(path):
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def test_one_shot_iterator_keeps_late_fields(tmp_path):
+    path = str(tmp_path / 'out.csv')
+    count = DataExporter.export_stream(entries(120, late_field_at=110), path, chunk_size=10)
+    rows = read_csv(path)
+    assert count == len(rows) == 120
+    assert rows[110]['pressure'] == '1013.0'
+    assert rows[0]['pressure'] == ''
+
+
+def test_spill_keeps_lazy_and_binary_payloads(tmp_path):
+    source = iter([
+        {'timestamp': 1, 'topic': 'a', 'data': LazyPayload(b'{"temperature": 21.5}')},
+        {'timestamp': 2, 'topic': 'b', 'data': b'raw'},
+    ])
+    path = str(tmp_path / 'out.csv')
+    assert DataExporter.export_stream(source, path) == 2
+    rows = read_csv(path)
+    assert rows[0]['temperature'] == '21.5'
+    assert rows[1]['value'] == 'raw'
+
+
+def test_explicit_schema_does_not_spill(tmp_path, monkeypatch):
+    def no_spill(*args, **kwargs):
+        raise AssertionError("spill file created")
+
+    monkeypatch.setattr(tempfile, 'TemporaryFile', no_spill)
+    path = str(tmp_path / 'out.csv')
+    schema = ['timestamp', 'topic', 'temperature']
+    assert DataExporter.export_stream(entries(5, late_field_at=3), path, schema=schema) == 5
+    assert list(read_csv(path)[0]) == schema
+
+
+def test_empty_sources_behave_the_same(tmp_path):
+    for name, source in (('list', []), ('iter', iter([])), ('gen', entries(0))):
+        path = tmp_path / f"{name}.csv"
+        assert DataExporter.export_to_csv(source, str(path)) is False
+        assert not path.exists()
+
+
+def test_device_column_matches_between_storages(tmp_path):
+    pytest.importorskip('numpy')
+    logger = MessageLogger(str(tmp_path), storage='both')
+    for i in range(3):
+        logger.log_message('sensor/t', {'temperature': 20.0 + i, 'device_id': f"d{i}"}, device_id='x')
+    logger.log_message('sensor/t', {'temperature': 30.0, 'device_id': 'd9'})
+    logger.flush()
+
+    segment = logger.read_columns('sensor/t')
+    jsonl = columns_from_entries(logger.iter_logs('sensor/t'))
+    logger.close()
+
+    def devices(columns):
+        return [columns['device_names'][i] for i in columns['device']]
+
+    assert devices(segment) == devices(jsonl) == ['x', 'x', 'x', 'd9']
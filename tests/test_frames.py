@@ -0,0 +1,67 @@
+# tests/test_frames.py - Encode/decode frame biner sensor
+import pytest
+
+from mqtt.frames import FRAME_SIZE, decode_frame, decode_frames, encode_frame, frame_epoch
+from utils.latency import MICROPYTHON_EPOCH_OFFSET
+
+
+def test_round_trip():
+    frame = encode_frame(1700000000, temperature=23.45, humidity=55.5, pressure=1013.2, led='YELLOW')
+    assert len(frame) == FRAME_SIZE
+    assert decode_frame(frame) == {
+        'timestamp': 1700000000.0,
+        'temperature': 23.45,
+        'humidity': 55.5,
+        'pressure': 1013.2,
+        'led': 'YELLOW',
+    }
+
+
+def test_missing_fields_are_omitted():
+    data = decode_frame(encode_frame(1700000000, humidity=40.0))
+    assert data == {'timestamp': 1700000000.0, 'humidity': 40.0}
+
+
+def test_led_colour_does_not_touch_led_status():
+    # led_status adalah status toggle ON/OFF di dashboard, bukan warna LED
+    data = decode_frame(encode_frame(1700000000, temperature=31.0, led='RED'))
+    assert data['led'] == 'RED'
+    assert 'led_status' not in data
+
+
+def test_micropython_epoch_is_normalized():
+    device_time = 800000000
+    assert device_time < MICROPYTHON_EPOCH_OFFSET
+    assert decode_frame(encode_frame(device_time))['timestamp'] == device_time + MICROPYTHON_EPOCH_OFFSET
+    assert frame_epoch(1700000000) == 1700000000.0
+
+
+
+def test_bulk_decode_matches_single_decode():
+    np = pytest.importorskip('numpy')
+    frames = [
+        encode_frame(800000000, temperature=-12.5, humidity=80.0, led='GREEN'),
+        encode_frame(1700000000, pressure=990.0),
+        encode_frame(1700000060, temperature=30.25, humidity=0.0, pressure=1100.0, led='OFF'),
+    ]
+    columns = decode_frames(b''.join(frames))
+    for i, frame in enumerate(frames):
+        single = decode_frame(frame)
+        assert columns['timestamp'][i] == single['timestamp']
+        for name in ('temperature', 'humidity', 'pressure'):
+            if name in single:
+                assert columns[name][i] == pytest.approx(single[name])
+            else:
+                assert np.isnan(columns[name][i])
+    assert list(columns['led']) == [1, 255, 0]
+    # Iterable bytes per frame sama dengan buffer yang disambung
+    assert np.array_equal(decode_frames(frames)['timestamp'], columns['timestamp'])
+
+
+def test_invalid_frames_are_rejected():
+    with pytest.raises(ValueError):
+        decode_frame(b'\x01' * (FRAME_SIZE - 1))
+    with pytest.raises(ValueError):
+        decode_frame(b'\x02' + encode_frame(0)[1:])
+    with pytest.raises(ValueError):
+        decode_frames(encode_frame(0) + b'\x00')
@@ -0,0 +1,60 @@
+# tests/test_history.py - Ring buffer typed-array per device
+import pytest
+
+from utils import history
+from utils.history import HistoryStore, RingBuffer
+
+
+@pytest.fixture(params=['numpy', 'array'])
+def backend(request, monkeypatch):
+    """Jalankan test dengan NumPy (jika ada) dan fallback array('d')"""
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(history, 'np', None)
+    return request.param
+
+
+def test_keeps_last_capacity_samples(backend):
+    buffer = RingBuffer(5, slack=2)
+    for i in range(23):
+        buffer.append(float(i), timestamp=1000.0 + i)
+    assert len(buffer) == 5
+    assert list(buffer.values()) == [18.0, 19.0, 20.0, 21.0, 22.0]
+    assert list(buffer.times()) == [1018.0, 1019.0, 1020.0, 1021.0, 1022.0]
+    assert buffer.last() == (1022.0, 22.0)
+    assert buffer.total == 23
+
+
+def test_stats(backend):
+    buffer = RingBuffer(3)
+    assert buffer.stats()['count'] == 0
+    for value in (4.0, 1.0, 7.0, 2.0):
+        buffer.append(value, timestamp=0)
+    assert buffer.stats() == {'count': 3, 'min': 1.0, 'max': 7.0, 'mean': 10.0 / 3, 'last': 2.0}
+
+
+def test_clear():
+    buffer = RingBuffer(3)
+    buffer.append(1.0)
+    buffer.clear()
+    assert len(buffer) == 0
+    assert buffer.last() is None
+
+
+def test_invalid_capacity():
+    with pytest.raises(ValueError):
+        RingBuffer(0)
+
+
+def test_history_store_per_device(backend):
+    store = HistoryStore(capacity=4)
+    store.append('dev1', 'temperature', 20.0, timestamp=1)
+    store.append('dev2', 'temperature', 30.0, timestamp=1)
+    store.append('dev1', 'humidity', 50.0, timestamp=1)
+    assert store.devices() == ['dev1', 'dev2']
+    assert store.metrics('dev1') == ['humidity', 'temperature']
+    assert list(store.values('dev2', 'temperature')) == [30.0]
+    assert len(store.values('dev3', 'temperature')) == 0
+    assert store.version('dev1', 'temperature') == 1
+    assert store.version('dev3', 'temperature') == 0
@@ -0,0 +1,106 @@
+# tests/test_ingest.py - Validasi message dan pembagian shard ingest multi-proses
+import math
+import multiprocessing
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+
+from utils.ingest import ShardingMqttClient, validate_message
+
+RANGES = {'temperature': [-40, 85], 'humidity': [0, 100]}
+
+
+def test_validate_message():
+    assert validate_message({'temperature': 21.5, 'humidity': 40}, RANGES)
+    assert not validate_message({'temperature': 999}, RANGES)
+    assert not validate_message({'humidity': -1}, RANGES)
+    assert not validate_message({'temperature': math.nan}, RANGES)
+    assert not validate_message({'pressure': math.inf}, RANGES)
+    # Field tanpa range, bool dan non-numerik tidak dibatasi
+    assert validate_message({'pressure': 5000, 'ok': True, 'led': 'RED'}, RANGES)
+    assert validate_message('raw text', RANGES)
+
+
+def make_client(config_file, workers=4, shard_by='device', subscriptions=()):
+    path = config_file(subscriptions=list(subscriptions))
+    return ShardingMqttClient(path, [None] * workers, shard_by=shard_by)
+
+
+def test_config_topics_of_one_device_share_a_shard(config_file):
+    # Default config: `subscriptions` kosong, semua topik sensor milik satu device
+    client = make_client(config_file)
+    shards = {client.shard_for(topic) for topic in client.sensor_topics()}
+    assert len(client.sensor_topics()) > 1
+    assert len(shards) == 1
+
+
+def test_wildcard_device_shard(config_file):
+    client = make_client(config_file, subscriptions=['fleet/+/+device_id/+'])
+    expected = zlib.crc32(b'dev7') % 4
+    assert client.shard_for('fleet/site1/dev7/temperature') == expected
+    assert client.shard_for('fleet/site2/dev7/humidity') == expected
+
+
+def test_shards_are_stable_and_spread(config_file):
+    client = make_client(config_file, subscriptions=['fleet/+/data'])
+    topics = [f"fleet/dev{i}/data" for i in range(200)]
+    shards = [client.shard_for(topic) for topic in topics]
+    assert shards == [make_client(config_file, subscriptions=['fleet/+/data']).shard_for(t) for t in topics]
+    assert set(shards) == {0, 1, 2, 3}
+
+
+def test_shard_by_topic(config_file):
+    client = make_client(config_file, shard_by='topic', subscriptions=['fleet/+/+'])
+    topic = 'fleet/dev1/temperature'
+    assert client.shard_for(topic) == zlib.crc32(topic.encode()) % 4
+
+
+
+def message(topic, payload=b'{}'):
+    return SimpleNamespace(topic=topic, payload=payload)
+
+
+def test_full_queue_waits_for_live_worker(config_file):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue(1)
+    worker = context.Process(target=time.sleep, args=(60,), daemon=True)
+    worker.start()
+    try:
+        client = ShardingMqttClient(config_file(), [queue], batch_size=1, processes=[worker],
+                                    put_timeout=0.05)
+        topic = client.sensor_topics()[0]
+        client.on_message(None, None, message(topic))
+        # Queue penuh, worker hidup: pengirim menunggu sampai ada ruang
+        sender = threading.Thread(target=client.on_message, args=(None, None, message(topic)))
+        sender.start()
+        time.sleep(0.2)
+        assert sender.is_alive()
+        assert len(queue.get(timeout=5)) == 1
+        sender.join(5)
+        assert not sender.is_alive()
+        assert client.forwarded == [2]
+        assert client.dropped == [0]
+    finally:
+        worker.kill()
+        worker.join()
+
+
+def test_batches_for_dead_worker_are_dropped(config_file):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue(1)
+    worker = context.Process(target=time.sleep, args=(60,), daemon=True)
+    worker.start()
+    client = ShardingMqttClient(config_file(), [queue], batch_size=2, processes=[worker],
+                                put_timeout=0.05)
+    topic = client.sensor_topics()[0]
+    for _ in range(2):
+        client.on_message(None, None, message(topic))
+    worker.kill()
+    worker.join()
+
+    for _ in range(3):
+        client.on_message(None, None, message(topic))
+    client.flush_batches()
+    assert client.forwarded == [2]
+    assert client.dropped == [3]
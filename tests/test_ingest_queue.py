@@ -0,0 +1,78 @@
+# tests/test_ingest_queue.py - Kebijakan backpressure BoundedMessageQueue
+import threading
+from queue import Empty
+
+import pytest
+
+from mqtt.ingest_queue import BoundedMessageQueue
+
+
+def msg(topic, value):
+    return {'topic': topic, 'data': value}
+
+
+def values(batch):
+    return [m['data'] for m in batch]
+
+
+def test_drop_oldest_keeps_newest():
+    queue = BoundedMessageQueue(3, 'drop_oldest')
+    assert queue.put_many(msg('t', i) for i in range(5)) == 5
+    assert values(queue.drain()) == [2, 3, 4]
+    stats = queue.stats()
+    assert stats['dropped'] == 2
+    assert stats['high_watermark'] == 3
+
+
+def test_drop_newest_rejects_new_messages():
+    queue = BoundedMessageQueue(3, 'drop_newest')
+    results = [queue.put(msg('t', i)) for i in range(5)]
+    assert results == [True, True, True, False, False]
+    assert values(queue.drain()) == [0, 1, 2]
+    assert queue.stats()['dropped'] == 2
+
+
+def test_latest_per_topic_coalesces():
+    queue = BoundedMessageQueue(2, 'latest_per_topic')
+    queue.put(msg('a', 1))
+    queue.put(msg('b', 1))
+    queue.put(msg('a', 2))
+    assert queue.stats()['coalesced'] == 1
+    queue.put(msg('c', 1))
+    batch = queue.drain()
+    # 'a' dibuang karena paling lama, 'b' tetap di posisi awal
+    assert [(m['topic'], m['data']) for m in batch] == [('b', 1), ('c', 1)]
+    assert queue.stats()['dropped'] == 1
+
+
+def test_block_times_out_and_counts_drop():
+    queue = BoundedMessageQueue(1, 'block', block_timeout=0.01)
+    assert queue.put(msg('t', 0))
+    assert not queue.put(msg('t', 1))
+    assert queue.stats()['dropped'] == 1
+
+
+def test_block_waits_for_consumer():
+    queue = BoundedMessageQueue(1, 'block', block_timeout=5)
+    queue.put(msg('t', 0))
+    consumer = threading.Timer(0.05, queue.get)
+    consumer.start()
+    assert queue.put(msg('t', 1))
+    consumer.join()
+    assert values(queue.drain()) == [1]
+    assert queue.stats()['dropped'] == 0
+
+
+def test_get_batch_and_empty():
+    queue = BoundedMessageQueue()
+    assert queue.get_batch(timeout=0) == []
+    with pytest.raises(Empty):
+        queue.get_nowait()
+    queue.put_many(msg('t', i) for i in range(5))
+    assert values(queue.get_batch(max_items=3, timeout=0)) == [0, 1, 2]
+    assert len(queue) == 2
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        BoundedMessageQueue(policy='drop_all')
@@ -0,0 +1,76 @@
+# tests/test_latency.py - Histogram latency dan timestamp device
+import time
+
+import pytest
+
+from mqtt.client import MqttClient
+from utils import latency
+from utils.latency import (LatencyHistogram, LatencyTracker, MICROPYTHON_EPOCH_OFFSET,
+                           device_epoch, network_latency)
+
+
+def test_histogram_relative_error_is_bounded():
+    histogram = LatencyHistogram(sub_bits=7)
+    for value in (0, 1, 127, 128, 1000, 123456, 10 ** 9):
+        bucket = histogram.value_at(histogram.index(value))
+        assert abs(bucket - value) <= max(1, value / 64)
+
+
+def test_histogram_clamps_and_ignores_negative():
+    histogram = LatencyHistogram(max_seconds=1.0)
+    histogram.record(-0.5)
+    histogram.record(5.0)
+    assert histogram.total == 1
+    assert histogram.max == histogram.max_value
+
+
+def test_tracker_percentiles_in_milliseconds():
+    tracker = LatencyTracker(stages=('queue',))
+    tracker.record_many('queue', [i / 1000.0 for i in range(1, 101)])
+    stats = tracker.stage_stats('queue')
+    assert stats['count'] == 100
+    assert stats['p50'] == pytest.approx(50, rel=0.02)
+    assert stats['p99'] == pytest.approx(99, rel=0.02)
+    assert stats['max'] == pytest.approx(100, rel=0.001)
+    assert tracker.stage_stats('missing') is None
+
+
+def test_tracker_window_expires_old_samples(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(latency.time, 'monotonic', lambda: clock[0])
+    tracker = LatencyTracker(stages=('queue',), window=60.0, slots=6)
+    tracker.record('queue', 0.01)
+    clock[0] += 30
+    tracker.record('queue', 0.02)
+    assert tracker.stage_stats('queue')['count'] == 2
+    clock[0] += 45
+    assert tracker.stage_stats('queue')['count'] == 1
+    clock[0] += 60
+    assert tracker.stage_stats('queue')['count'] == 0
+
+
+def test_device_epoch_formats():
+    assert device_epoch(1700000000) == 1700000000.0
+    assert device_epoch(1700000000123) == pytest.approx(1700000000.123)
+    assert device_epoch(10) == 10 + MICROPYTHON_EPOCH_OFFSET
+    assert device_epoch(True) is None
+    assert device_epoch('1700000000') is None
+
+
+def test_network_latency_rejects_clock_skew():
+    assert network_latency(100.5, 100.0) == 0.5
+    assert network_latency(100.0, 100.9) == 0.0
+    assert network_latency(100.0, 110.0) is None
+    assert network_latency(1700000000.0, device_epoch(5)) is None
+
+
+def test_client_counts_skewed_device_timestamps(config_file):
+    client = MqttClient(config_file())
+    now = time.time()
+    client._record_dequeue([
+        {'topic': 't', 'timestamp': now, 'data': {'timestamp': now - 0.2}},
+        # RTC device belum disinkron: masih di sekitar tahun 2000
+        {'topic': 't', 'timestamp': now, 'data': {'timestamp': 60}},
+    ])
+    assert client.clock_skew_samples == 1
+    assert client.latency.stage_stats('network')['count'] == 1
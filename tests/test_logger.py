@@ -0,0 +1,88 @@
+# tests/test_logger.py - MessageLogger: writer buffered dan query rentang waktu
+import atexit
+import json
+from datetime import datetime
+
+import pytest
+
+from utils.logger import MessageLogger
+
+
+class Unencodable:
+    pass
+
+
+@pytest.mark.parametrize('background', [False, True])
+def test_close_writes_buffer_and_rejects_new_entries(tmp_path, background):
+    logger = MessageLogger(str(tmp_path), background=background, flush_interval=60)
+    logger.log_message('sensor/a', {'temperature': 21.5}, timestamp=1700000000.0)
+    logger.close()
+    with open(logger.get_log_filename('sensor/a')) as f:
+        assert [json.loads(line)['data'] for line in f] == [{'temperature': 21.5}]
+    with pytest.raises(RuntimeError):
+        logger.log_message('sensor/a', {'temperature': 22.0})
+    logger.close()
+
+
+def test_bad_entry_does_not_drop_background_queue(tmp_path):
+    logger = MessageLogger(str(tmp_path), background=True, flush_interval=60)
+    logger.log_message('sensor/a', {'temperature': 1}, timestamp=1700000000.0)
+    logger.log_message('sensor/a', {'temperature': Unencodable()}, timestamp=1700000001.0)
+    logger.log_message('sensor/a', {'temperature': 3}, timestamp=1700000002.0)
+    logger.close()
+    entries = [json.loads(line) for line in open(logger.get_log_filename('sensor/a'))]
+    assert [entry['data']['temperature'] for entry in entries] == [1, 3]
+    assert logger.write_errors == 1
+
+
+def test_close_unregisters_atexit_hook(tmp_path, monkeypatch):
+    unregistered = []
+    monkeypatch.setattr(atexit, 'unregister', unregistered.append)
+    logger = MessageLogger(str(tmp_path))
+    logger.close()
+    assert unregistered == [logger.close]
+
+
+@pytest.fixture
+def logger(tmp_path):
+    # index_interval kecil agar sparse index berisi banyak titik
+    logger = MessageLogger(str(tmp_path), index_interval=256)
+    yield logger
+    logger.close()
+
+
+def log_day(logger, count=500):
+    midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    base = midnight + 60
+    for i in range(count):
+        logger.log_message('sensor/t', {'seq': i}, timestamp=base + i)
+    logger.flush()
+    return base
+
+
+def seqs(entries):
+    return [entry['data']['seq'] for entry in entries]
+
+
+def test_iter_range_bounds_are_inclusive(logger):
+    base = log_day(logger)
+    assert seqs(logger.iter_range('sensor/t', base + 100, base + 200)) == list(range(100, 201))
+
+
+def test_iter_range_edges(logger):
+    base = log_day(logger)
+    assert seqs(logger.iter_range('sensor/t', base - 30, base + 2)) == [0, 1, 2]
+    assert seqs(logger.iter_range('sensor/t', base + 497, base + 1000)) == [497, 498, 499]
+    assert seqs(logger.iter_range('sensor/t', base + 10.5, base + 10.9)) == []
+    assert seqs(logger.iter_range('sensor/t', base + 42, base + 42)) == [42]
+
+
+def test_iter_range_accepts_datetime(logger):
+    base = log_day(logger, count=50)
+    start = datetime.fromtimestamp(base + 40)
+    assert seqs(logger.read_range('sensor/t', start)) == list(range(40, 50))
+
+
+def test_iter_range_missing_topic(logger):
+    base = log_day(logger, count=5)
+    assert list(logger.iter_range('sensor/none', base)) == []
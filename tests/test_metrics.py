@@ -0,0 +1,96 @@
+# tests/test_metrics.py - Exposition format Prometheus dan endpoint /metrics
+import urllib.error
+import urllib.request
+
+import pytest
+
+from mqtt.client import MqttClient
+from mqtt.ingest_queue import BoundedMessageQueue
+from utils.metrics import MetricsRegistry, MetricsServer, start_metrics_server
+
+
+def test_render_help_type_and_labels():
+    registry = MetricsRegistry('test')
+    registry.register(lambda: [
+        registry.metric('messages_total', 'counter', "Messages")
+            .add(3, {'topic': 'a"b\\c\nd'})
+            .add(1.5, {'topic': 'x'}),
+        registry.metric('connected', 'gauge', "Connected").add(True),
+    ])
+    assert registry.render().splitlines() == [
+        '# HELP test_messages_total Messages',
+        '# TYPE test_messages_total counter',
+        'test_messages_total{topic="a\\"b\\\\c\\nd"} 3',
+        'test_messages_total{topic="x"} 1.5',
+        '# HELP test_connected Connected',
+        '# TYPE test_connected gauge',
+        'test_connected 1',
+    ]
+
+
+def test_special_values():
+    registry = MetricsRegistry('test')
+    registry.register(lambda: [
+        registry.metric('latency', 'summary', "Latency")
+            .add(None, {'quantile': '0.5'})
+            .add(float('nan'), {'quantile': '0.9'})
+            .add(float('inf'), {'quantile': '0.99'})
+            .add(4, suffix='_count'),
+    ])
+    lines = registry.render().splitlines()
+    assert lines[2:] == [
+        'test_latency{quantile="0.5"} NaN',
+        'test_latency{quantile="0.9"} NaN',
+        'test_latency{quantile="0.99"} +Inf',
+        'test_latency_count 4',
+    ]
+
+
+def test_same_name_merged_and_failing_collector_skipped():
+    registry = MetricsRegistry('test')
+    registry.register(lambda: [registry.metric('depth', 'gauge', "Depth").add(1, {'queue': 'a'})])
+
+    def broken():
+        raise RuntimeError('boom')
+
+    registry.register(broken)
+    registry.register(lambda: [registry.metric('depth', 'gauge', "Depth").add(2, {'queue': 'b'})])
+    text = registry.render()
+    assert text.count('# TYPE test_depth gauge') == 1
+    assert 'test_depth{queue="a"} 1' in text
+    assert 'test_depth{queue="b"} 2' in text
+
+
+def test_component_collectors(config_file):
+    registry = MetricsRegistry()
+    queue = BoundedMessageQueue(2, 'drop_newest')
+    for i in range(3):
+        queue.put({'topic': 't', 'data': i})
+    registry.add_queue('mqtt', queue)
+    client = MqttClient(config_file())
+    client.messages_received['sensor/a'] = 5
+    registry.add_mqtt_client(client)
+
+    text = registry.render()
+    assert 'iot_queue_dropped_total{queue="mqtt"} 1' in text
+    assert 'iot_messages_received_total{topic="sensor/a"} 5' in text
+    assert 'iot_mqtt_connected 0' in text
+
+
+def test_server_serves_metrics_only():
+    registry = MetricsRegistry('test')
+    registry.register(lambda: [registry.metric('up', 'gauge', "Up").add(1)])
+    server = MetricsServer(registry, port=0)
+    port = server.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+            assert 'test_up 1' in response.read().decode()
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/")
+    finally:
+        server.stop()
+
+
+def test_disabled_by_default():
+    assert start_metrics_server({}) is None
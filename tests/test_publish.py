@@ -0,0 +1,119 @@
+# tests/test_publish.py - Template payload, slot in-flight dan wait publish
+import asyncio
+import json
+
+import paho.mqtt.client as mqtt
+import pytest
+
+from benchmarks.broker import BenchmarkBroker
+from mqtt.async_client import AsyncMqttClient
+from mqtt.client import MqttClient
+from mqtt.publish import PayloadTemplate
+
+
+def publish_config(max_inflight, block_timeout=5.0):
+    return {'qos': 1, 'topics': {}, 'max_inflight': max_inflight,
+            'block_timeout': block_timeout, 'templates': {}}
+
+
+def free_slots(client):
+    count = 0
+    while client.publish_slots.acquire(blocking=False):
+        count += 1
+    for _ in range(count):
+        client.publish_slots.release()
+    return count
+
+
+def lost_info(mid):
+    """MQTTMessageInfo QoS 0 yang dibuang paho saat reconnect"""
+    info = mqtt.MQTTMessageInfo(mid)
+    info.rc = mqtt.MQTT_ERR_CONN_LOST
+    info._set_as_published()
+    return info
+
+
+def test_template_renders_json():
+    template = PayloadTemplate.from_fields(['temperature', 'timestamp'], {'temperature': '.1f'})
+    payload = template.render({'temperature': 24.56}, timestamp=1700000000)
+    assert json.loads(payload) == {'temperature': 24.6, 'timestamp': 1700000000}
+
+
+def test_prepare_uses_template_and_passes_bytes(config_file):
+    client = MqttClient(config_file())
+    client.add_template('sensor_temp', '{{"t": {temperature}}}')
+    assert client._prepare_publish('sensor_temp', {'temperature': 21}) == ('sensor/esp32/2/temperature', b'{"t": 21}')
+    assert client._prepare_publish('sensor_humidity', b'\x01\x02')[1] == b'\x01\x02'
+    assert client._prepare_publish('missing', {}) is None
+
+
+def test_slots_held_for_queued_qos1_and_released_for_dropped_qos0(config_file):
+    client = MqttClient(config_file(publish=publish_config(2)))
+    # Tanpa koneksi: QoS 1 tetap diantre paho (slot dipegang), QoS 0 dibuang
+    assert client._publish_prepared('t', b'x', qos=1) is not None
+    assert free_slots(client) == 1
+    assert client._publish_prepared('t', b'x', qos=0) is None
+    assert free_slots(client) == 1
+    assert client.publish_errors == 1
+
+
+def test_non_blocking_publish_fails_fast_when_slots_are_full(config_file):
+    client = MqttClient(config_file(publish=publish_config(1, block_timeout=30)))
+    assert client._publish_prepared('t', b'x', qos=1) is not None
+    assert client._publish_prepared('t', b'x', qos=1, block=False) is None
+    assert client.publish_errors == 1
+
+
+def test_reclaim_releases_slots_of_lost_qos0_messages(config_file):
+    client = MqttClient(config_file(publish=publish_config(2)))
+    client.publish_slots.acquire()
+    info = mqtt.MQTTMessageInfo(1)
+    assert client._track_publish(info, 0) is info
+    client._reclaim_lost_slots()
+    assert free_slots(client) == 1
+
+    info.rc = mqtt.MQTT_ERR_CONN_LOST
+    info._set_as_published()
+    client._reclaim_lost_slots()
+    assert free_slots(client) == 2
+    assert client.publish_errors == 1
+
+
+def test_async_wait_resolves_lost_and_timed_out_messages(config_file):
+    async def scenario():
+        client = AsyncMqttClient(config_file(publish=publish_config(10, block_timeout=0.05)))
+        client.loop = asyncio.get_running_loop()
+
+        # Sudah dibuang sebelum ditunggu
+        assert await client._wait_published([lost_info(1)]) == 0
+
+        # Dibuang saat reconnect ketika sedang ditunggu: diselesaikan di _reclaim_lost_slots
+        client.publish_timeout = 30
+        pending = mqtt.MQTTMessageInfo(2)
+        waiter = asyncio.ensure_future(client._wait_published([pending]))
+        await asyncio.sleep(0)
+        pending.rc = mqtt.MQTT_ERR_CONN_LOST
+        client._reclaim_lost_slots()
+        assert await asyncio.wait_for(waiter, 1) == 0
+
+        # Tidak pernah di-ACK: berhenti setelah publish_timeout
+        client.publish_timeout = 0.05
+        assert await client._wait_published([mqtt.MQTTMessageInfo(3)]) == 0
+        assert client._pending_publish == {}
+
+    asyncio.run(scenario())
+
+
+def test_async_publish_many_waits_for_acks(config_file):
+    with BenchmarkBroker() as broker:
+        path = config_file(broker={'host': '127.0.0.1', 'port': broker.port, 'username': None,
+                                   'password': None, 'keepalive': 60})
+
+        async def scenario():
+            async with AsyncMqttClient(path) as client:
+                messages = [('sensor_temp', {'temperature': i}) for i in range(20)]
+                assert await client.publish_many(messages, wait=True) == 20
+                assert await client.publish_many(messages, qos=0, wait=True) == 20
+                assert client._pending_publish == {}
+
+        asyncio.run(scenario())
@@ -0,0 +1,45 @@
+# tests/test_render.py - RenderModel: hanya widget yang berubah dikirim ke Tk
+from dashboard.render import RenderModel, led_view, temperature_view
+
+
+def test_first_view_applies_everything():
+    model = RenderModel()
+    view = temperature_view(22.04)
+    assert model.diff(view) == view
+    assert model.applied == len(view)
+
+
+def test_identical_view_is_skipped():
+    model = RenderModel()
+    model.diff(temperature_view(22.04))
+    # Nilai berbeda tapi tampilan sama (dibulatkan ke 0.1)
+    assert model.diff(temperature_view(22.01)) == {}
+    assert model.skipped == len(temperature_view(22.0))
+
+
+def test_only_changed_options_are_returned():
+    model = RenderModel()
+    model.diff(temperature_view(22.0))
+    changes = model.diff(temperature_view(22.5))
+    assert changes == {
+        'temp_value': {'text': "22.5°C"},
+        'temp_progress': {'value': 22.5},
+    }
+
+
+def test_band_change_updates_colours():
+    model = RenderModel()
+    model.diff(temperature_view(24.0))
+    changes = model.diff(temperature_view(31.0))
+    assert changes['led_indicator'] == {'text': "Indikator: Merah", 'foreground': '#ff3b3f'}
+    assert 'style:Temp.Horizontal.TProgressbar' in changes
+
+
+def test_forget_forces_repaint():
+    model = RenderModel()
+    model.diff(led_view('ON'))
+    assert model.diff(led_view('ON')) == {}
+    model.forget('led_status')
+    assert list(model.diff(led_view('ON'))) == ['led_status']
+    model.forget()
+    assert model.diff(led_view('ON')) == led_view('ON')
@@ -0,0 +1,73 @@
+# tests/test_rollup.py - Bucket rollup dan pengisian nilai yang ditahan (deadband)
+import time
+
+import pytest
+
+from utils.rollup import RollupAggregator, fill_held
+from utils.segment import DEVICE_COLUMN, TIMESTAMP_COLUMN
+
+
+def test_aggregator_buckets_per_device(tmp_path):
+    aggregator = RollupAggregator(str(tmp_path), resolutions=(60,))
+    base = 1700000040.0
+    for offset, value in ((0, 20.0), (10, 22.0), (20, 24.0)):
+        aggregator.add('dev1', 'temperature', value, base + offset)
+    aggregator.add('dev2', 'temperature', 10.0, base)
+    aggregator.close()
+
+    date = time.strftime('%Y%m%d', time.localtime(base))
+    columns = aggregator.read(60, date)
+    names = columns['device_names']
+    by_device = {names[d]: i for i, d in enumerate(columns[DEVICE_COLUMN])}
+    dev1 = by_device['dev1']
+    assert columns['temperature_count'][dev1] == 3
+    assert columns['temperature_min'][dev1] == 20.0
+    assert columns['temperature_max'][dev1] == 24.0
+    assert columns['temperature_mean'][dev1] == pytest.approx(22.0)
+    assert columns['temperature_last'][by_device['dev2']] == 10.0
+
+
+def test_aggregator_ignores_non_numeric_fields(tmp_path):
+    aggregator = RollupAggregator(str(tmp_path), resolutions=(60,))
+    base = 1700000040.0
+    aggregator.add_message({'topic': 't', 'device_id': 'dev1', 'timestamp': base,
+                            'data': {'temperature': 20.0, 'led': True, 'unit': 'C'}})
+    aggregator.close()
+
+    columns = aggregator.read(60, time.strftime('%Y%m%d', time.localtime(base)))
+    assert 'temperature_mean' in columns
+    assert not any(name.startswith(('led_', 'unit_')) for name in columns)
+
+
+def rows(timestamps, devices, last):
+    np = pytest.importorskip('numpy')
+    return {
+        TIMESTAMP_COLUMN: np.array(timestamps, dtype=np.float64),
+        DEVICE_COLUMN: np.array(devices, dtype=np.int32),
+        'temperature_last': np.array(last, dtype=np.float64),
+        'temperature_mean': np.array(last, dtype=np.float64) + 0.5,
+        'temperature_count': np.ones(len(timestamps)),
+        'device_names': ['a', 'b'],
+    }
+
+
+def test_fill_held_fills_gaps_up_to_max_hold():
+    columns = fill_held(rows([0, 300], [0, 0], [20.0, 21.0]), resolution=60, max_hold=120)
+    assert list(columns[TIMESTAMP_COLUMN]) == [0, 60, 120, 300]
+    assert list(columns['temperature_mean']) == [20.5, 20.0, 20.0, 21.5]
+    assert list(columns['temperature_count']) == [1, 0, 0, 1]
+    assert columns['device_names'] == ['a', 'b']
+
+
+def test_fill_held_does_not_cross_devices():
+    columns = fill_held(rows([0, 180, 60], [0, 0, 1], [20.0, 22.0, 30.0]), resolution=60, max_hold=600)
+    devices = columns[DEVICE_COLUMN]
+    timestamps = columns[TIMESTAMP_COLUMN]
+    assert sorted(timestamps[devices == 0]) == [0, 60, 120, 180]
+    assert list(timestamps[devices == 1]) == [60]
+    assert all(timestamps[1:] >= timestamps[:-1])
+
+
+def test_fill_held_without_max_hold_is_a_no_op():
+    columns = rows([0, 300], [0, 0], [20.0, 21.0])
+    assert fill_held(columns, resolution=60, max_hold=0) is columns
@@ -0,0 +1,84 @@
+# tests/test_router.py - Router topic MQTT berbasis trie
+import pytest
+
+from mqtt.router import TopicRouter, device_id_from_params
+
+
+def matched(router, topic):
+    return [handler for handler, _ in router.match(topic)]
+
+
+def test_exact_and_wildcard_matches():
+    router = TopicRouter()
+    router.add('sensor/esp32/2/temperature', 'exact')
+    router.add('sensor/+/+/temperature', 'plus')
+    router.add('sensor/#', 'multi')
+    assert sorted(matched(router, 'sensor/esp32/2/temperature')) == ['exact', 'multi', 'plus']
+    assert sorted(matched(router, 'sensor/esp32/3/temperature')) == ['multi', 'plus']
+    assert matched(router, 'sensor/esp32/temperature') == ['multi']
+    assert matched(router, 'other/esp32/2/temperature') == []
+
+
+def test_multi_level_wildcard_matches_parent_level():
+    router = TopicRouter()
+    router.add('sensor/#', 'multi')
+    (handler, params), = router.match('sensor')
+    assert handler == 'multi'
+    assert params['rest'] == ''
+    (_, params), = router.match('sensor/a/b')
+    assert params['rest'] == 'a/b'
+
+
+def test_system_topics_skip_leading_wildcards():
+    router = TopicRouter()
+    router.add('#', 'all')
+    router.add('+/broker/uptime', 'plus')
+    router.add('$SYS/broker/uptime', 'sys')
+    assert matched(router, '$SYS/broker/uptime') == ['sys']
+
+
+def test_named_parameters_and_device_id():
+    router = TopicRouter()
+    router.add('sensor/+/+/temperature')
+    router.add('fleet/+site/+device_id/#')
+    (_, params), = router.match('sensor/esp32/2/temperature')
+    assert params['wildcards'] == ['esp32', '2']
+    assert device_id_from_params(params) == 'esp32/2'
+    (_, params), = router.match('fleet/a/dev9/x/y')
+    assert params['site'] == 'a'
+    assert device_id_from_params(params) == 'dev9'
+    assert device_id_from_params({'wildcards': []}) is None
+
+
+def test_filters_drop_parameter_names():
+    router = TopicRouter()
+    assert router.add('fleet/+site/+device_id/#') == 'fleet/+/+/#'
+    router.add('fleet/+/+/#', 'second')
+    router.add('sensor/esp32/2/temperature')
+    assert router.filters() == ['fleet/+/+/#', 'sensor/esp32/2/temperature']
+
+
+def test_remove_and_cache_invalidation():
+    router = TopicRouter()
+    router.add('sensor/+/temperature', 'a')
+    router.add('sensor/+/temperature', 'b')
+    assert sorted(matched(router, 'sensor/x/temperature')) == ['a', 'b']
+    assert router.remove('sensor/+/temperature', 'a')
+    assert matched(router, 'sensor/x/temperature') == ['b']
+    assert router.remove('sensor/+/temperature')
+    assert matched(router, 'sensor/x/temperature') == []
+    assert not router.remove('missing/topic')
+
+
+def test_dispatch_calls_handlers():
+    router = TopicRouter()
+    seen = []
+    router.add('sensor/+device_id/data', lambda message, params: seen.append((message, params['device_id'])))
+    assert router.dispatch('sensor/d1/data', 'm') == 1
+    assert seen == [('m', 'd1')]
+
+
+@pytest.mark.parametrize('pattern', ['sensor/#/x', 'sensor/a+/b', 'sensor/#a'])
+def test_invalid_patterns(pattern):
+    with pytest.raises(ValueError):
+        TopicRouter().add(pattern)
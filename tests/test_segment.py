@@ -0,0 +1,73 @@
+# tests/test_segment.py - Segment biner kolumnar
+import math
+import os
+
+import pytest
+
+from utils import segment
+from utils.segment import SegmentStore, SegmentWriter, numeric_fields
+
+
+@pytest.fixture(params=['numpy', 'array'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(segment, 'np', None)
+    return request.param
+
+
+def test_numeric_fields_skip_bool_and_ids():
+    data = {'temperature': 21, 'led': True, 'device_id': 7, 'unit': 'C', 'humidity': 55.5}
+    assert numeric_fields(data) == {'temperature': 21.0, 'humidity': 55.5}
+    assert numeric_fields('ON') == {}
+
+
+def test_round_trip_with_late_metric(tmp_path, backend):
+    store = SegmentStore(str(tmp_path), buffer_rows=2)
+    store.append('sensor/a', '20240101', 1.0, 'dev1', {'temperature': 20.0})
+    store.append('sensor/a', '20240101', 2.0, 'dev2', {'temperature': 21.0, 'humidity': 50.0})
+    store.append('sensor/a', '20240101', 3.0, 'dev1', {'humidity': 51.0})
+    store.close()
+
+    columns = store.read('sensor/a', '20240101')
+    assert list(columns['timestamp']) == [1.0, 2.0, 3.0]
+    assert columns['device_names'] == ['dev1', 'dev2']
+    assert list(columns['device']) == [0, 1, 0]
+    assert list(columns['temperature'])[:2] == [20.0, 21.0]
+    assert math.isnan(columns['temperature'][2])
+    assert math.isnan(columns['humidity'][0])
+    assert store.read('sensor/a', '20240102') is None
+
+
+def test_metric_names_never_become_paths(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    names = {'../escape': 1.0, 'a/b': 2.0, 'device.i4': 3.0, 'timestamp.f8': 4.0}
+    store.append('sensor/a', '20240101', 1.0, 'dev1', names)
+    store.close()
+
+    path = store.segment_path('sensor/a', '20240101')
+    assert sorted(os.listdir(path)) == ['columns.json', 'device.i4', 'devices.json',
+                                        'm0.f8', 'm1.f8', 'm2.f8', 'm3.f8', 'timestamp.f8']
+    assert not os.path.exists(os.path.join(str(tmp_path), 'escape.f8'))
+    columns = store.read('sensor/a', '20240101')
+    assert {name: list(columns[name]) for name in names} == {name: [value] for name, value in names.items()}
+
+
+def test_writer_resumes_and_drops_partial_rows(tmp_path):
+    path = str(tmp_path / 'seg')
+    writer = SegmentWriter(path)
+    writer.append(1.0, 'dev1', {'temperature': 20.0})
+    writer.append(2.0, 'dev1', {'temperature': 21.0})
+    writer.close()
+    # Simulasi crash: baris ketiga hanya sempat ditulis di kolom timestamp
+    with open(os.path.join(path, 'timestamp.f8'), 'ab') as f:
+        f.write(b'\0' * 8)
+
+    writer = SegmentWriter(path)
+    assert writer.rows == 2
+    writer.append(3.0, 'dev2', {'temperature': 22.0})
+    writer.close()
+    with segment.SegmentReader(path) as reader:
+        assert list(reader.read()['temperature']) == [20.0, 21.0, 22.0]
+        assert reader.devices == ['dev1', 'dev2']
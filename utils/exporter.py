@@ -1,53 +1,449 @@
-# utils/exporter.py - Export data ke CSV
+# utils/exporter.py - Export data ke CSV dan format kolumnar (.npz / Feather / Parquet)
 import csv
-from datetime import datetime
+import gzip
+import heapq
 import json
+import os
+import tempfile
+from array import array
+from collections.abc import Mapping
+from datetime import datetime
+from utils.logger import _json_default, _to_epoch
+from utils.segment import DEVICE_COLUMN, TIMESTAMP_COLUMN, numeric_fields
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow
+    import pyarrow.feather
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Kolom dasar setiap baris; field data dengan nama sama diberi prefix 'data_'
+BASE_FIELDS = ('timestamp', 'topic')
+
+
+def flatten_entry(entry):
+    """Ratakan log entry menjadi dict kolom -> nilai"""
+    row = {'timestamp': entry.get('timestamp'), 'topic': entry.get('topic')}
+    data = entry.get('data')
+    if isinstance(data, Mapping):
+        for key, value in data.items():
+            if key in BASE_FIELDS:
+                key = f"data_{key}"
+            row[key] = value
+    else:
+        row['value'] = data
+    if entry.get('device_id') is not None:
+        row['device_id'] = entry['device_id']
+    return row
+
+
+def _cell(value):
+    """Nilai sel CSV; struktur bersarang ditulis sebagai JSON"""
+    if value is None:
+        return ''
+    if isinstance(value, (Mapping, list, tuple)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def _spill(entries, handle):
+    """Teruskan entry sambil menyimpannya (JSON lines) ke file sementara"""
+    for entry in entries:
+        handle.write(json.dumps(entry, default=_json_default) + '\n')
+        yield entry
+
+
+def _unspill(handle):
+    """Baca ulang entry yang disimpan `_spill`"""
+    for line in handle:
+        yield json.loads(line)
+
+
+def _entry_device(entry):
+    """Device id entry: dari logger (router), lalu dari payload; sama dengan segment"""
+    if entry.get('device_id') is not None:
+        return str(entry['device_id'])
+    data = entry.get('data')
+    if isinstance(data, Mapping) and data.get('device_id') is not None:
+        return str(data['device_id'])
+    return ''
+
+
+def columns_from_entries(entries):
+    """Kumpulkan entry log ke kolom typed-array tanpa dict per baris
+
+    Hasil sama dengan format segment: `timestamp` (float64 epoch),
+    `device` (int32 indeks ke `device_names`) dan satu kolom float64
+    per metric; metric yang tidak ada di suatu baris diisi NaN.
+    """
+    nan = float('nan')
+    timestamps = array('d')
+    device_ids = array('i')
+    device_names = []
+    device_index = {}
+    metrics = {}
+
+    for entry in entries:
+        values = numeric_fields(entry.get('data'))
+        if not values:
+            continue
+        try:
+            timestamp = _to_epoch(entry['timestamp'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        rows = len(timestamps)
+        for metric, value in values.items():
+            column = metrics.get(metric)
+            if column is None:
+                column = metrics[metric] = array('d', [nan]) * rows
+            column.append(value)
+        for column in metrics.values():
+            if len(column) == rows:
+                column.append(nan)
+
+        device = _entry_device(entry)
+        index = device_index.get(device)
+        if index is None:
+            index = device_index[device] = len(device_names)
+            device_names.append(device)
+        timestamps.append(timestamp)
+        device_ids.append(index)
+
+    columns = {
+        TIMESTAMP_COLUMN: np.frombuffer(timestamps, dtype=np.float64),
+        DEVICE_COLUMN: np.frombuffer(device_ids, dtype=np.int32),
+    }
+    for metric, column in metrics.items():
+        columns[metric] = np.frombuffer(column, dtype=np.float64)
+    columns['device_names'] = device_names
+    return columns
+
+
+def columns_from_history(history, devices=None):
+    """Kolom dari HistoryStore: satu baris per (device, timestamp) unik"""
+    if devices is None:
+        devices = history.devices()
+    device_names = list(devices)
+    metrics = sorted({metric for device in device_names for metric in history.metrics(device)})
+    blocks = {name: [] for name in [TIMESTAMP_COLUMN, DEVICE_COLUMN] + metrics}
+
+    for index, device in enumerate(device_names):
+        series = {metric: (np.asarray(history.times(device, metric)),
+                           np.asarray(history.values(device, metric)))
+                  for metric in history.metrics(device)}
+        if not series:
+            continue
+        # Metric dari message yang sama berbagi timestamp
+        stamps = np.unique(np.concatenate([times for times, _ in series.values()]))
+        blocks[TIMESTAMP_COLUMN].append(stamps)
+        blocks[DEVICE_COLUMN].append(np.full(len(stamps), index, dtype=np.int32))
+        for metric in metrics:
+            column = np.full(len(stamps), np.nan)
+            if metric in series:
+                times, values = series[metric]
+                column[np.searchsorted(stamps, times)] = values
+            blocks[metric].append(column)
+
+    columns = {}
+    for name, parts in blocks.items():
+        dtype = np.int32 if name == DEVICE_COLUMN else np.float64
+        columns[name] = np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+    columns['device_names'] = device_names
+    return columns
+
+
+def merge_columns(tables):
+    """Gabungkan beberapa tabel kolom {topic: columns} urut timestamp
+
+    Indeks device dipetakan ulang ke `device_names` gabungan dan kolom
+    `topic` (int32 indeks ke `topic_names`) ditambahkan.
+    """
+    device_names = []
+    device_index = {}
+    metrics = []
+    for columns in tables.values():
+        for name in columns:
+            if name not in (TIMESTAMP_COLUMN, DEVICE_COLUMN, 'device_names') and name not in metrics:
+                metrics.append(name)
+        for device in columns['device_names']:
+            if device not in device_index:
+                device_index[device] = len(device_names)
+                device_names.append(device)
+
+    blocks = {name: [] for name in [TIMESTAMP_COLUMN, DEVICE_COLUMN, 'topic'] + metrics}
+    for topic_id, columns in enumerate(tables.values()):
+        rows = len(columns[TIMESTAMP_COLUMN])
+        remap = np.array([device_index[d] for d in columns['device_names']], dtype=np.int32)
+        blocks[TIMESTAMP_COLUMN].append(np.asarray(columns[TIMESTAMP_COLUMN], dtype=np.float64))
+        blocks[DEVICE_COLUMN].append(remap[np.asarray(columns[DEVICE_COLUMN])] if rows else
+                                     np.zeros(0, dtype=np.int32))
+        blocks['topic'].append(np.full(rows, topic_id, dtype=np.int32))
+        for metric in metrics:
+            if metric in columns:
+                blocks[metric].append(np.asarray(columns[metric], dtype=np.float64))
+            else:
+                blocks[metric].append(np.full(rows, np.nan))
+
+    order = None
+    merged = {}
+    for name, parts in blocks.items():
+        dtype = np.float64 if name not in (DEVICE_COLUMN, 'topic') else np.int32
+        merged[name] = np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+        if name == TIMESTAMP_COLUMN:
+            order = np.argsort(merged[name], kind='stable')
+        merged[name] = merged[name][order]
+    merged['device_names'] = device_names
+    merged['topic_names'] = list(tables)
+    return merged
+
+
+COLUMNAR_FORMATS = ('npz', 'feather', 'parquet')
+
 
 class DataExporter:
     """Export MQTT data ke berbagai format"""
 
     @staticmethod
-    def export_to_csv(logs, filename=None):
-        """Export logs ke CSV file"""
+    def discover_schema(entries):
+        """Satu pass untuk mengumpulkan semua kolom (urut kemunculan pertama)"""
+        fields = dict.fromkeys(BASE_FIELDS)
+        for entry in entries:
+            for key in flatten_entry(entry):
+                fields.setdefault(key)
+        return list(fields)
+
+    @staticmethod
+    def export_stream(source, filename=None, schema=None, chunk_size=5000, compress=None):
+        """Export entry secara streaming ke CSV (opsional gzip)
+
+        `source` boleh berupa iterable apa saja, atau callable yang
+        mengembalikan iterator baru (mis. pembacaan file MessageLogger).
+        Tanpa `schema`, kolom dicari dengan satu pass terpisah: source yang
+        bisa dibaca ulang (list, callable) dibaca dua kali, iterator sekali
+        jalan disimpan dulu ke file sementara (JSON lines). Dengan `schema`
+        eksplisit tidak ada pass schema maupun file sementara; field di
+        luar schema diabaikan dengan peringatan. Baris ditulis per
+        `chunk_size`, sehingga memori tidak bergantung pada ukuran export.
+
+        `compress=None` berarti gzip jika nama file berakhiran `.gz`.
+        Mengembalikan jumlah baris yang ditulis; source kosong tidak
+        membuat file (0).
+        """
         if filename is None:
             filename = f"export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            if compress:
+                filename += '.gz'
+        if compress is None:
+            compress = filename.endswith('.gz')
+
+        def entries():
+            return iter(source()) if callable(source) else iter(source)
 
+        iterator = entries()
+        spill = None
         try:
-            with open(filename, 'w', newline='') as csvfile:
-                # Get headers dari first entry
-                if not logs:
-                    print("No logs to export")
-                    return False
-
-                first_entry = logs[0]
-
-                # Flatten data structure
-                fieldnames = ['timestamp', 'topic']
-                if isinstance(first_entry.get('data'), dict):
-                    fieldnames.extend(first_entry['data'].keys())
+            if schema is None:
+                if callable(source) or iterator is not source:
+                    schema = DataExporter.discover_schema(iterator)
+                    iterator = entries()
                 else:
-                    fieldnames.append('value')
+                    # Iterator sekali jalan: simpan ke file sementara selama pass schema
+                    spill = tempfile.TemporaryFile('w+', encoding='utf-8')
+                    schema = DataExporter.discover_schema(_spill(iterator, spill))
+                    spill.seek(0)
+                    iterator = _unspill(spill)
 
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
+            first = next(iterator, None)
+            if first is None:
+                print("No logs to export")
+                return 0
+            return DataExporter._write_csv(filename, compress, list(schema), first, iterator, chunk_size)
+        finally:
+            if spill is not None:
+                spill.close()
 
-                # Write rows
-                for entry in logs:
-                    row = {
-                        'timestamp': entry['timestamp'],
-                        'topic': entry['topic']
-                    }
+    @staticmethod
+    def _write_csv(filename, compress, fields, first, iterator, chunk_size):
+        """Tulis header `fields` lalu `first` dan sisa iterator per chunk"""
+        known = set(fields)
+        if compress:
+            csvfile = gzip.open(filename, 'wt', newline='', compresslevel=6)
+        else:
+            csvfile = open(filename, 'w', newline='')
+
+        count = 0
+        ignored = set()
+        with csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(fields)
+
+            chunk = []
+            for source_entries in ((first,), iterator):
+                for entry in source_entries:
+                    row = flatten_entry(entry)
+                    if len(row) > len(known) or not known.issuperset(row):
+                        ignored.update(key for key in row if key not in known)
+                    chunk.append([_cell(row.get(field)) for field in fields])
+                    if len(chunk) >= chunk_size:
+                        writer.writerows(chunk)
+                        count += len(chunk)
+                        chunk = []
+            if chunk:
+                writer.writerows(chunk)
+                count += len(chunk)
+
+        if ignored:
+            print(f"[Exporter] Fields not in schema were skipped: {', '.join(sorted(ignored))}")
+        print(f"[Exporter] Exported {count} records to {filename}")
+        return count
+
+    @staticmethod
+    def logger_source(logger, topics, date=None, start=None, end=None):
+        """Callable source yang membaca langsung file MessageLogger
+
+        Dengan `start` entry diambil lewat `iter_range` (memakai sparse
+        index), selain itu seluruh file `date`. Beberapa topic digabung
+        berurutan timestamp tanpa memuat file ke memori.
+        """
+        if isinstance(topics, str):
+            topics = [topics]
+
+        def read():
+            if start is not None:
+                streams = [logger.iter_range(topic, start, end) for topic in topics]
+            else:
+                streams = [logger.iter_logs(topic, date) for topic in topics]
+            if len(streams) == 1:
+                return streams[0]
+            return heapq.merge(*streams, key=lambda entry: _to_epoch(entry['timestamp']))
+
+        return read
+
+    @staticmethod
+    def export_logs(logger, topics, filename=None, date=None, start=None, end=None, **options):
+        """Export log topic dari MessageLogger ke CSV (lihat export_stream)"""
+        try:
+            source = DataExporter.logger_source(logger, topics, date, start, end)
+            return DataExporter.export_stream(source, filename, **options) > 0
+        except Exception as e:
+            print(f"[Exporter] Export failed: {e}")
+            return False
+
+    @staticmethod
+    def export_to_csv(logs, filename=None, schema=None, compress=None):
+        """Export logs ke CSV file; False jika gagal atau tidak ada log"""
+        try:
+            return DataExporter.export_stream(logs, filename, schema=schema, compress=compress) > 0
+
+        except Exception as e:
+            print(f"[Exporter] Export failed: {e}")
+            return False
+
+    @staticmethod
+    def read_log_columns(logger, topics, date=None, start=None, end=None):
+        """Kolom data log satu/lebih topic
+
+        Jika logger menyimpan segment biner dan yang diminta satu hari
+        penuh, kolom diambil langsung dari segment (mmap, tanpa parsing).
+        Selain itu file JSON-lines dibaca streaming ke typed array.
+        Beberapa topic digabung dengan `merge_columns`.
+        """
+        if np is None:
+            raise RuntimeError("NumPy is required for columnar export")
+        if isinstance(topics, str):
+            topics = [topics]
+
+        tables = {}
+        for topic in topics:
+            columns = None
+            if logger.segments is not None and start is None:
+                columns = logger.read_columns(topic, date) or None
+            if columns is None:
+                if start is not None:
+                    entries = logger.iter_range(topic, start, end)
+                else:
+                    entries = logger.iter_logs(topic, date)
+                columns = columns_from_entries(entries)
+            tables[topic] = columns
+
+        if len(tables) == 1:
+            return tables[topics[0]]
+        return merge_columns(tables)
 
-                    if isinstance(entry['data'], dict):
-                        row.update(entry['data'])
-                    else:
-                        row['value'] = entry['data']
+    @staticmethod
+    def export_columns(columns, filename, format=None, compress=True):
+        """Tulis dict kolom ke .npz, Feather (.feather/.arrow) atau Parquet
 
-                    writer.writerow(row)
+        Format dipilih dari `format` atau ekstensi file. Feather/Parquet
+        butuh pyarrow; kolom device/topic ditulis sebagai dictionary
+        (categorical di pandas). Di .npz nama device/topic disimpan di
+        array `device_names`/`topic_names`.
+        """
+        if np is None:
+            raise RuntimeError("NumPy is required for columnar export")
+        if format is None:
+            extension = os.path.splitext(filename)[1].lstrip('.').lower()
+            format = 'feather' if extension == 'arrow' else extension
+        if format not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unknown columnar format '{format}'")
 
-            print(f"[Exporter] Exported {len(logs)} records to {filename}")
+        names = {key: columns[key] for key in ('device_names', 'topic_names') if key in columns}
+        arrays = {key: value for key, value in columns.items() if key not in names}
+        rows = len(arrays.get(TIMESTAMP_COLUMN, ()))
+
+        if format == 'npz':
+            for key, value in names.items():
+                arrays[key] = np.array(value, dtype=str)
+            save = np.savez_compressed if compress else np.savez
+            with open(filename, 'wb') as f:
+                save(f, **arrays)
+        else:
+            if pyarrow is None:
+                raise RuntimeError(f"pyarrow is required for {format} export")
+            fields = {}
+            for key, value in arrays.items():
+                labels = names.get(f"{key}_names")
+                if labels is not None:
+                    fields[key] = pyarrow.DictionaryArray.from_arrays(
+                        pyarrow.array(value, type=pyarrow.int32()),
+                        pyarrow.array(labels, type=pyarrow.string())
+                    )
+                else:
+                    fields[key] = pyarrow.array(value)
+            table = pyarrow.table(fields)
+            if format == 'feather':
+                pyarrow.feather.write_feather(table, filename, compression='zstd' if compress else 'uncompressed')
+            else:
+                pyarrow.parquet.write_table(table, filename, compression='zstd' if compress else 'none')
+
+        print(f"[Exporter] Exported {rows} rows x {len(arrays)} columns to {filename}")
+        return rows
+
+    @staticmethod
+    def export_logs_columnar(logger, topics, filename, date=None, start=None, end=None, **options):
+        """Export log topic dari MessageLogger ke format kolumnar"""
+        try:
+            columns = DataExporter.read_log_columns(logger, topics, date, start, end)
+            DataExporter.export_columns(columns, filename, **options)
             return True
+        except Exception as e:
+            print(f"[Exporter] Export failed: {e}")
+            return False
 
+    @staticmethod
+    def export_history(history, filename, devices=None, **options):
+        """Export isi ring buffer HistoryStore ke format kolumnar"""
+        try:
+            if np is None:
+                raise RuntimeError("NumPy is required for columnar export")
+            DataExporter.export_columns(columns_from_history(history, devices), filename, **options)
+            return True
         except Exception as e:
             print(f"[Exporter] Export failed: {e}")
-            return False
\ No newline at end of file
+            return False
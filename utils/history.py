@@ -0,0 +1,148 @@
+# utils/history.py - Ring buffer typed-array untuk histori data sensor
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _zeros(size):
+    """Buffer float64 kosong (NumPy jika ada, fallback array('d'))"""
+    if np is not None:
+        return np.zeros(size, dtype=np.float64)
+    return array('d', bytes(8 * size))
+
+
+class RingBuffer:
+    """Ring buffer (timestamp, value) berkapasitas tetap
+
+    Data disimpan berurutan di buffer dengan ruang cadangan (`slack`). Saat
+    buffer habis, `capacity` data terakhir digeser ke depan sekali saja,
+    sehingga `values()`/`times()` selalu berupa view kontigu tanpa copy.
+    """
+
+    def __init__(self, capacity, slack=None):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.slack = slack if slack is not None else max(16, capacity // 4)
+        size = capacity + self.slack
+        self._times = _zeros(size)
+        self._values = _zeros(size)
+        self._end = 0
+        self.total = 0
+
+    def append(self, value, timestamp=None):
+        """Tambah satu sampel"""
+        if self._end == len(self._values):
+            self._compact()
+        if timestamp is None:
+            timestamp = time.time()
+        self._times[self._end] = timestamp
+        self._values[self._end] = value
+        self._end += 1
+        self.total += 1
+
+    def _compact(self):
+        """Geser `capacity - 1` sampel terakhir ke awal buffer"""
+        keep = self.capacity - 1
+        start = self._end - keep
+        self._times[:keep] = self._times[start:self._end]
+        self._values[:keep] = self._values[start:self._end]
+        self._end = keep
+
+    def __len__(self):
+        return min(self._end, self.capacity)
+
+    def _view(self, buffer):
+        start = max(0, self._end - self.capacity)
+        if np is not None:
+            return buffer[start:self._end]
+        return memoryview(buffer)[start:self._end]
+
+    def values(self):
+        """View nilai (urut waktu, zero-copy)"""
+        return self._view(self._values)
+
+    def times(self):
+        """View timestamp epoch float (urut waktu, zero-copy)"""
+        return self._view(self._times)
+
+    def last(self):
+        """(timestamp, value) terakhir atau None"""
+        if not self._end:
+            return None
+        return self._times[self._end - 1], self._values[self._end - 1]
+
+    def clear(self):
+        self._end = 0
+
+    def stats(self):
+        """min/max/mean/last/count dari isi buffer"""
+        count = len(self)
+        if not count:
+            return {'count': 0, 'min': None, 'max': None, 'mean': None, 'last': None}
+        values = self.values()
+        if np is not None:
+            return {
+                'count': count,
+                'min': float(values.min()),
+                'max': float(values.max()),
+                'mean': float(values.mean()),
+                'last': float(values[-1]),
+            }
+        return {
+            'count': count,
+            'min': min(values),
+            'max': max(values),
+            'mean': sum(values) / count,
+            'last': values[-1],
+        }
+
+
+class HistoryStore:
+    """Kumpulan RingBuffer per (device, metric)"""
+
+    def __init__(self, capacity=60, slack=None):
+        self.capacity = capacity
+        self.slack = slack
+        self.buffers = {}
+
+    def series(self, device, metric):
+        """RingBuffer untuk device dan metric (dibuat jika belum ada)"""
+        key = (device, metric)
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            buffer = self.buffers[key] = RingBuffer(self.capacity, self.slack)
+        return buffer
+
+    def append(self, device, metric, value, timestamp=None):
+        self.series(device, metric).append(value, timestamp)
+
+    def values(self, device, metric):
+        buffer = self.buffers.get((device, metric))
+        return buffer.values() if buffer is not None else _zeros(0)
+
+    def times(self, device, metric):
+        buffer = self.buffers.get((device, metric))
+        return buffer.times() if buffer is not None else _zeros(0)
+
+    def stats(self, device, metric):
+        return self.series(device, metric).stats()
+
+    def version(self, device, metric):
+        """Jumlah total sampel yang pernah masuk (untuk deteksi perubahan)"""
+        buffer = self.buffers.get((device, metric))
+        return buffer.total if buffer is not None else 0
+
+    def devices(self):
+        return sorted({device for device, _ in self.buffers})
+
+    def metrics(self, device):
+        return sorted(metric for dev, metric in self.buffers if dev == device)
+
+    def memory_bytes(self):
+        """Perkiraan memori buffer (byte)"""
+        return sum(16 * (b.capacity + b.slack) for b in self.buffers.values())
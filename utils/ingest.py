@@ -0,0 +1,457 @@
+# utils/ingest.py - Pipeline ingest tanpa GUI: MqttClient -> logger, rollup, metrics
+import json
+import math
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import zlib
+from collections.abc import Mapping
+from queue import Empty, Full
+from mqtt.client import MqttClient
+from mqtt.decoders import DecoderRegistry
+from mqtt.router import TopicRouter, device_id_from_params
+from utils.latency import LatencyTracker
+from utils.logger import MessageLogger
+from utils.metrics import start_metrics_server
+from utils.rollup import RollupAggregator
+
+
+def validate_message(data, ranges):
+    """True jika semua field numerik finite dan di dalam `ranges`
+
+    ranges: dict field -> [min, max] dari `ingest.ranges` di config.json.
+    Payload non-dict (teks, bytes) tidak diperiksa.
+    """
+    if not isinstance(data, Mapping):
+        return True
+    for key, value in data.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if not math.isfinite(value):
+            return False
+        limits = ranges.get(key)
+        if limits is not None and not limits[0] <= value <= limits[1]:
+            return False
+    return True
+
+
+class IngestService:
+    """Jalankan ingest MQTT tanpa Tk/matplotlib
+
+    Message dari MqttClient diambil per batch; message yang lolos validasi
+    ditulis MessageLogger dan diteruskan ke RollupAggregator (segment di
+    `<log_dir>/rollups`). Konfigurasi dibaca dari section `logging`,
+    `rollup` dan `metrics` di config.json.
+    """
+
+    def __init__(self, config_file='config.json'):
+        with open(config_file, 'r') as f:
+            self.config = json.load(f)
+        self.config_file = config_file
+
+        logging_config = self.config.get('logging', {})
+        self.log_dir = logging_config.get('log_dir', 'logs')
+        self.batch_size = logging_config.get('batch_size', 500)
+
+        self.ranges = self.config.get('ingest', {}).get('ranges', {})
+
+        self.client = None
+        self.logger = None
+        self.aggregator = None
+        self.metrics_server = None
+        self.stop_event = threading.Event()
+        self.processed = 0
+        self.invalid = 0
+
+    def start(self):
+        """Buat komponen dan hubungkan ke broker; False jika gagal connect"""
+        logging_config = self.config.get('logging', {})
+        self.client = MqttClient(self.config_file)
+        self.logger = MessageLogger(
+            self.log_dir,
+            background=logging_config.get('background', True),
+            storage=logging_config.get('storage', 'jsonl')
+        )
+
+        rollup_config = self.config.get('rollup', {})
+        if rollup_config.get('enabled', True):
+            self.aggregator = RollupAggregator(
+                os.path.join(self.log_dir, 'rollups'),
+                resolutions=rollup_config.get('resolutions', (1, 60, 3600)),
+                max_hold=self.config.get('reporting', {}).get('max_hold', 0)
+            )
+
+        self.metrics_server = start_metrics_server(self.config, self.client, logger=self.logger)
+        return self.client.connect()
+
+    def run(self):
+        """Loop utama sampai `stop()` dipanggil (mis. dari handler SIGTERM)"""
+        last_rollup_flush = time.monotonic()
+        while not self.stop_event.is_set():
+            for message in self.client.get_messages(self.batch_size, timeout=0.5):
+                self._store(message)
+
+            # Tutup bucket rollup device yang diam
+            if self.aggregator is not None and time.monotonic() - last_rollup_flush >= 1.0:
+                self.aggregator.flush_expired()
+                last_rollup_flush = time.monotonic()
+
+    def _store(self, message):
+        """Validasi lalu tulis message ke log dan rollup"""
+        if not validate_message(message['data'], self.ranges):
+            self.invalid += 1
+            return
+        self.logger.log_message(message['topic'], message['data'], device_id=message.get('device_id'))
+        if self.aggregator is not None:
+            self.aggregator.add_message(message)
+        self.processed += 1
+
+    def stop(self):
+        """Minta loop berhenti (aman dipanggil dari signal handler)"""
+        self.stop_event.set()
+
+    def close(self):
+        """Disconnect, lalu tulis sisa message, rollup dan log ke disk"""
+        if self.client is not None:
+            try:
+                self.client.disconnect()
+            except Exception:
+                pass
+            # Message yang sudah diterima tetap ditulis
+            for message in self.client.message_queue.drain():
+                self._store(message)
+        if self.aggregator is not None:
+            self.aggregator.close()
+        if self.logger is not None:
+            self.logger.close()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        print(f"[Ingest] Stopped after {self.processed} messages ({self.invalid} invalid)")
+
+
+# --- Ingest multi-proses (shard per device/topic) ---
+
+def shard_dir(log_dir, shard):
+    """Direktori log satu shard: logs/shard-00, logs/shard-01, ..."""
+    return os.path.join(log_dir, f"shard-{shard:02d}")
+
+
+class ShardingMqttClient(MqttClient):
+    """MqttClient untuk koordinator: payload tidak di-decode di sini
+
+    Setiap message (topic, payload bytes, waktu terima) dimasukkan ke batch
+    shard-nya; shard dipilih dari hash stabil (crc32) device id atau topic,
+    sehingga semua message satu device selalu ke worker yang sama dan
+    urutannya terjaga.
+
+    Device id diambil dari level wildcard `subscriptions`; topik sensor di
+    `topics` (config.json) adalah satu device yang sama (CONFIG_DEVICE).
+
+    Jika queue shard penuh, pengirim menunggu (backpressure ke broker)
+    selama proses worker masih hidup; batch untuk worker yang sudah mati
+    dibuang dan dihitung di `dropped`.
+    """
+
+    CONFIG_DEVICE = 'default'
+
+    def __init__(self, config_file, queues, shard_by='device', batch_size=500, processes=None,
+                 put_timeout=1.0):
+        super().__init__(config_file)
+        self.queues = queues
+        self.processes = processes
+        self.shard_by = shard_by
+        self.batch_size = batch_size
+        self.put_timeout = put_timeout
+        self.forwarded = [0] * len(queues)
+        self.dropped = [0] * len(queues)
+        self._batches = [[] for _ in queues]
+        self._shards = {}
+        self._lock = threading.Lock()
+        # Satu pengirim per shard sekaligus: urutan batch per device tetap terjaga
+        self._send_locks = [threading.Lock() for _ in queues]
+        self.config_topics = set(self.sensor_topics())
+
+        if shard_by == 'device':
+            for topic_filter in self.router.filters():
+                if '+' not in topic_filter.split('/'):
+                    print(f"[Ingest] Warning: '{topic_filter}' has no '+' level for a device id, "
+                          f"sharding its messages by topic")
+
+    def shard_for(self, topic):
+        """Indeks shard untuk topic (di-cache per topic)"""
+        shard = self._shards.get(topic)
+        if shard is None:
+            key = topic
+            if self.shard_by == 'device':
+                device_id = None
+                for _, params in self.router.match(topic):
+                    device_id = device_id_from_params(params)
+                    if device_id is not None:
+                        break
+                if device_id is None and topic in self.config_topics:
+                    device_id = self.CONFIG_DEVICE
+                if device_id is not None:
+                    key = device_id
+            shard = self._shards[topic] = zlib.crc32(key.encode()) % len(self.queues)
+        return shard
+
+    def on_message(self, client, userdata, msg):
+        topic = msg.topic
+        self.messages_received[topic] = self.messages_received.get(topic, 0) + 1
+        shard = self.shard_for(topic)
+        with self._lock:
+            batch = self._batches[shard]
+            batch.append((topic, msg.payload, time.time()))
+            full = len(batch) >= self.batch_size
+        if full:
+            self._send(shard)
+
+    def _worker_alive(self, shard):
+        return self.processes is None or self.processes[shard].is_alive()
+
+    def _send(self, shard):
+        """Ambil batch shard lalu kirim ke worker (put di luar `_lock`)"""
+        with self._send_locks[shard]:
+            with self._lock:
+                batch = self._batches[shard]
+                if not batch:
+                    return
+                self._batches[shard] = []
+            while True:
+                try:
+                    self.queues[shard].put(batch, timeout=self.put_timeout)
+                    break
+                except Full:
+                    # Worker tertinggal: tunggu (backpressure) alih-alih menumpuk memori
+                    if self._worker_alive(shard):
+                        continue
+                    with self._lock:
+                        self.dropped[shard] += len(batch)
+                    print(f"[Ingest] Shard {shard} worker is not running, dropped {len(batch)} messages")
+                    return
+            with self._lock:
+                self.forwarded[shard] += len(batch)
+
+    def flush_batches(self):
+        """Kirim batch yang belum penuh ke worker"""
+        for shard in range(len(self.queues)):
+            self._send(shard)
+
+
+def _shard_worker(shard, config_file, inbox, outbox, stats_interval=1.0):
+    """Proses worker: decode, validasi, rollup dan tulis log shard sendiri"""
+    # SIGINT ditangani koordinator; worker berhenti lewat sentinel None
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    with open(config_file, 'r') as f:
+        config = json.load(f)
+    logging_config = config.get('logging', {})
+    decoding = config.get('decoding', {})
+    decoders = DecoderRegistry.from_config(config)
+    keep_raw_payload = decoding.get('keep_raw_payload', False)
+    ranges = config.get('ingest', {}).get('ranges', {})
+    router = TopicRouter()
+    for pattern in config.get('subscriptions', []):
+        router.add(pattern)
+
+    directory = shard_dir(logging_config.get('log_dir', 'logs'), shard)
+    logger = MessageLogger(
+        directory,
+        background=logging_config.get('background', True),
+        storage=logging_config.get('storage', 'jsonl')
+    )
+    aggregator = None
+    rollup_config = config.get('rollup', {})
+    if rollup_config.get('enabled', True):
+        aggregator = RollupAggregator(
+            os.path.join(directory, 'rollups'),
+            resolutions=rollup_config.get('resolutions', (1, 60, 3600)),
+            max_hold=config.get('reporting', {}).get('max_hold', 0)
+        )
+    latency = LatencyTracker(stages=('shard',))
+
+    stats = {'shard': shard, 'pid': os.getpid(), 'processed': 0, 'invalid': 0}
+
+    def report(final=False):
+        stats.update({
+            'decode_errors': decoders.errors,
+            'bytes_written': logger.bytes_written,
+            'flush_seconds': logger.flush_seconds,
+            'flush_count': logger.flush_count,
+            'rollup_buckets': aggregator.closed_buckets if aggregator is not None else 0,
+            'latency': latency.stage_stats('shard'),
+            'final': final,
+        })
+        outbox.put(dict(stats))
+
+    last_report = time.monotonic()
+    try:
+        while True:
+            try:
+                batch = inbox.get(timeout=stats_interval)
+            except Empty:
+                batch = ()
+            if batch is None:
+                break
+
+            for topic, payload, received in batch:
+                data = decoders.decode(topic, payload)
+                if not validate_message(data, ranges):
+                    stats['invalid'] += 1
+                    continue
+                message = {'topic': topic, 'data': data, 'timestamp': received}
+                if keep_raw_payload:
+                    message['raw_payload'] = payload.decode(errors='replace')
+                for _, params in router.match(topic):
+                    device_id = device_id_from_params(params)
+                    if device_id is not None:
+                        message['device_id'] = device_id
+                        break
+                logger.log_message(topic, data, device_id=message.get('device_id'))
+                if aggregator is not None:
+                    aggregator.add_message(message)
+                stats['processed'] += 1
+            if batch:
+                # Waktu terima di koordinator -> selesai diproses worker
+                latency.record('shard', time.time() - batch[-1][2])
+
+            if time.monotonic() - last_report >= stats_interval:
+                if aggregator is not None:
+                    aggregator.flush_expired()
+                report()
+                last_report = time.monotonic()
+    finally:
+        if aggregator is not None:
+            aggregator.close()
+        logger.close()
+        report(final=True)
+
+
+class ShardedIngestService:
+    """Ingest multi-proses: satu koordinator MQTT, `workers` proses worker
+
+    Koordinator hanya menerima payload dan membagi ke shard (tanpa decode);
+    setiap worker men-decode, memvalidasi, membuat rollup dan menulis log
+    ke `log_dir/shard-NN`. Statistik worker dikirim balik berkala dan
+    digabung koordinator (`stats()`, endpoint /metrics). API sama dengan
+    IngestService: start(), run(), stop(), close().
+    """
+
+    def __init__(self, config_file='config.json', workers=None):
+        with open(config_file, 'r') as f:
+            self.config = json.load(f)
+        self.config_file = config_file
+
+        ingest_config = self.config.get('ingest', {})
+        self.workers = workers or ingest_config.get('workers') or os.cpu_count() or 1
+        self.shard_by = ingest_config.get('shard_by', 'device')
+        self.batch_size = ingest_config.get('batch_size', 500)
+        self.flush_interval = ingest_config.get('flush_interval', 0.05)
+        self.queue_batches = ingest_config.get('queue_batches', 64)
+        self.log_dir = self.config.get('logging', {}).get('log_dir', 'logs')
+
+        self.client = None
+        self.queues = []
+        self.processes = []
+        self.outbox = None
+        self.metrics_server = None
+        self.worker_stats = {}
+        self.stop_event = threading.Event()
+
+    def start(self):
+        """Start worker lalu hubungkan koordinator ke broker; False jika gagal connect"""
+        # spawn: worker tidak mewarisi thread paho/lock dari proses koordinator
+        context = multiprocessing.get_context('spawn')
+        self.outbox = context.Queue()
+        for shard in range(self.workers):
+            inbox = context.Queue(self.queue_batches)
+            process = context.Process(
+                target=_shard_worker,
+                args=(shard, self.config_file, inbox, self.outbox),
+                name=f"ingest-shard-{shard}",
+                daemon=True
+            )
+            process.start()
+            self.queues.append(inbox)
+            self.processes.append(process)
+        print(f"[Ingest] Started {self.workers} shard workers (by {self.shard_by})")
+
+        self.client = ShardingMqttClient(self.config_file, self.queues, self.shard_by, self.batch_size,
+                                         processes=self.processes)
+        self.metrics_server = start_metrics_server(self.config, self.client, shards=self)
+        return self.client.connect()
+
+    def run(self):
+        """Loop koordinator: flush batch, kumpulkan statistik, awasi worker"""
+        while not self.stop_event.wait(self.flush_interval):
+            self.client.flush_batches()
+            self.collect_stats()
+            for process in self.processes:
+                if not process.is_alive():
+                    print(f"[Ingest] Worker {process.name} exited with code {process.exitcode}, stopping")
+                    self.stop_event.set()
+                    break
+
+    def stop(self):
+        """Minta loop berhenti (aman dipanggil dari signal handler)"""
+        self.stop_event.set()
+
+    def collect_stats(self, timeout=0):
+        """Ambil laporan statistik terbaru dari worker"""
+        while True:
+            try:
+                stats = self.outbox.get(timeout=timeout) if timeout else self.outbox.get_nowait()
+            except Empty:
+                return
+            self.worker_stats[stats['shard']] = stats
+
+    def stats(self):
+        """Statistik per shard dan totalnya"""
+        shards = {}
+        for shard in range(len(self.queues)):
+            stats = dict(self.worker_stats.get(shard, {}))
+            stats['forwarded'] = self.client.forwarded[shard] if self.client is not None else 0
+            stats['dropped'] = self.client.dropped[shard] if self.client is not None else 0
+            try:
+                stats['queue_batches'] = self.queues[shard].qsize()
+            except NotImplementedError:
+                stats['queue_batches'] = None
+            shards[shard] = stats
+        total = {}
+        for key in ('forwarded', 'dropped', 'processed', 'invalid', 'decode_errors', 'bytes_written',
+                    'rollup_buckets'):
+            total[key] = sum(stats.get(key) or 0 for stats in shards.values())
+        return {'shards': shards, 'total': total}
+
+    def close(self):
+        """Disconnect, kirim sisa batch, tunggu worker menulis semua shard"""
+        if self.client is not None:
+            try:
+                self.client.disconnect()
+            except Exception:
+                pass
+            self.client.flush_batches()
+        for inbox in self.queues:
+            try:
+                inbox.put(None, timeout=10)
+            except Full:
+                pass
+
+        # Laporan akhir tiap worker (setelah log & rollup ditutup)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if all(self.worker_stats.get(shard, {}).get('final') for shard in range(len(self.processes))):
+                break
+            self.collect_stats(timeout=0.1)
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        total = self.stats()['total']
+        print(f"[Ingest] Stopped after {total['processed']} messages in {len(self.processes)} shards "
+              f"({total['invalid']} invalid, {total['dropped']} dropped)")
@@ -0,0 +1,188 @@
+# utils/latency.py - Histogram latency bergulir (gaya HDR) per tahap pipeline
+import math
+import threading
+import time
+
+# Selisih epoch MicroPython (2000-01-01) ke epoch Unix
+MICROPYTHON_EPOCH_OFFSET = 946684800
+
+# Tahap pipeline, urut dari device ke layar
+STAGES = ('network', 'queue', 'ui_queue', 'render', 'total')
+
+# Selisih device -> host di luar rentang ini berarti jam device tidak sinkron
+# (timestamp detik bulat, jadi sedikit negatif masih wajar)
+MAX_CLOCK_SKEW = 2.0
+MAX_NETWORK_LATENCY = 300.0
+
+
+def device_epoch(timestamp):
+    """Timestamp payload device ke epoch Unix (detik), None jika tidak valid
+
+    ESP32/MicroPython mengirim detik sejak 2000-01-01; timestamp dalam
+    milidetik juga dikenali.
+    """
+    if isinstance(timestamp, bool) or not isinstance(timestamp, (int, float)):
+        return None
+    if timestamp > 1e11:
+        return timestamp / 1000.0
+    if timestamp < MICROPYTHON_EPOCH_OFFSET:
+        return timestamp + MICROPYTHON_EPOCH_OFFSET
+    return float(timestamp)
+
+
+def network_latency(received, sent):
+    """Latency device -> host (detik), None jika selisihnya tidak masuk akal"""
+    delta = received - sent
+    if delta < -MAX_CLOCK_SKEW or delta > MAX_NETWORK_LATENCY:
+        return None
+    return max(delta, 0.0)
+
+
+class LatencyHistogram:
+    """Histogram log-linear (seperti HdrHistogram) untuk latency dalam mikrodetik
+
+    Nilai < 2^sub_bits dicatat persis; di atasnya setiap rentang pangkat dua
+    dibagi 2^(sub_bits-1) bucket, sehingga error relatif maksimal
+    ~1/2^(sub_bits-1) (1.6% untuk sub_bits=7). Rentang 1 µs s/d ~1 jam
+    muat dalam ~1700 counter.
+    """
+
+    def __init__(self, sub_bits=7, max_seconds=3600.0):
+        self.sub_bits = sub_bits
+        self.sub_count = 1 << sub_bits
+        self.half_count = self.sub_count >> 1
+        self.max_value = int(max_seconds * 1e6)
+        self.counts = [0] * (self.index(self.max_value) + 1)
+        self.total = 0
+        self.max = 0
+
+    def index(self, value):
+        """Indeks bucket untuk nilai (mikrodetik, int >= 0)"""
+        if value < self.sub_count:
+            return value
+        shift = value.bit_length() - self.sub_bits
+        return self.sub_count + (shift - 1) * self.half_count + (value >> shift) - self.half_count
+
+    def value_at(self, index):
+        """Nilai tengah bucket (mikrodetik)"""
+        if index < self.sub_count:
+            return index
+        shift = (index - self.sub_count) // self.half_count + 1
+        sub = (index - self.sub_count) % self.half_count + self.half_count
+        low = sub << shift
+        return low + ((1 << shift) - 1) / 2
+
+    def record(self, seconds):
+        value = int(seconds * 1e6)
+        if value < 0:
+            return
+        if value > self.max_value:
+            value = self.max_value
+        self.counts[self.index(value)] += 1
+        self.total += 1
+        if value > self.max:
+            self.max = value
+
+    def clear(self):
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self.total = 0
+        self.max = 0
+
+
+def _percentiles(counts, total, quantiles):
+    """Nilai bucket (mikrodetik) untuk setiap quantile dari counter gabungan"""
+    targets = [max(1, math.ceil(q / 100.0 * total)) for q in quantiles]
+    results = [None] * len(targets)
+    order = sorted(range(len(targets)), key=lambda i: targets[i])
+    position = 0
+    seen = 0
+    for index, count in enumerate(counts):
+        if not count:
+            continue
+        seen += count
+        while position < len(order) and seen >= targets[order[position]]:
+            results[order[position]] = index
+            position += 1
+        if position == len(order):
+            break
+    return results
+
+
+class LatencyTracker:
+    """Histogram bergulir per tahap
+
+    Jendela `window` detik dibagi `slots` histogram; histogram tertua
+    dikosongkan saat waktunya lewat, sehingga persentil mencerminkan
+    `window` detik terakhir. `record()` O(1) dan aman dipanggil dari
+    beberapa thread.
+    """
+
+    def __init__(self, stages=STAGES, window=60.0, slots=6, sub_bits=7):
+        self.window = window
+        self.slots = slots
+        self.slot_seconds = window / slots
+        self.sub_bits = sub_bits
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._slot_epoch = int(time.monotonic() // self.slot_seconds)
+        for stage in stages:
+            self._add_stage(stage)
+
+    def _add_stage(self, stage):
+        histograms = [LatencyHistogram(self.sub_bits) for _ in range(self.slots)]
+        self._histograms[stage] = histograms
+        return histograms
+
+    def _rotate_locked(self):
+        epoch = int(time.monotonic() // self.slot_seconds)
+        if epoch == self._slot_epoch:
+            return
+        # Kosongkan slot yang sudah keluar dari jendela
+        for step in range(1, min(epoch - self._slot_epoch, self.slots) + 1):
+            slot = (self._slot_epoch + step) % self.slots
+            for histograms in self._histograms.values():
+                histograms[slot].clear()
+        self._slot_epoch = epoch
+
+    def record(self, stage, seconds):
+        """Catat satu latency (detik)"""
+        with self._lock:
+            self._rotate_locked()
+            histograms = self._histograms.get(stage) or self._add_stage(stage)
+            histograms[self._slot_epoch % self.slots].record(seconds)
+
+    def record_many(self, stage, values):
+        """Catat banyak latency (detik) dengan satu lock"""
+        with self._lock:
+            self._rotate_locked()
+            histograms = self._histograms.get(stage) or self._add_stage(stage)
+            histogram = histograms[self._slot_epoch % self.slots]
+            for seconds in values:
+                histogram.record(seconds)
+
+    def stage_stats(self, stage, quantiles=(50, 95, 99)):
+        """count, pXX dan max (milidetik) untuk satu tahap"""
+        with self._lock:
+            self._rotate_locked()
+            histograms = self._histograms.get(stage)
+            if not histograms:
+                return None
+            counts = [sum(column) for column in zip(*(h.counts for h in histograms))]
+            total = sum(h.total for h in histograms)
+            maximum = max(h.max for h in histograms)
+
+        stats = {'count': total}
+        if not total:
+            stats.update({f"p{q}": None for q in quantiles})
+            stats['max'] = None
+            return stats
+        reference = histograms[0]
+        for q, index in zip(quantiles, _percentiles(counts, total, quantiles)):
+            stats[f"p{q}"] = reference.value_at(index) / 1000.0
+        stats['max'] = maximum / 1000.0
+        return stats
+
+    def snapshot(self, quantiles=(50, 95, 99)):
+        """Dict tahap -> statistik (lihat stage_stats)"""
+        return {stage: self.stage_stats(stage, quantiles) for stage in list(self._histograms)}
@@ -1,37 +1,149 @@
 # utils/logger.py - Logging MQTT messages
+import atexit
+import bisect
 import json
-from datetime import datetime
+import struct
+import threading
+import time
+from collections.abc import Mapping
+from datetime import datetime, timedelta
 import os
+from utils.segment import SegmentStore, numeric_fields
+
+
+# Satu record sparse index: timestamp epoch (float64) dan byte offset (int64)
+INDEX_RECORD = struct.Struct('<dq')
+
+
+def _to_epoch(timestamp):
+    """Timestamp (epoch atau string ISO) ke epoch float"""
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    return datetime.fromisoformat(str(timestamp)).timestamp()
+
+
+def read_index(filename):
+    """Baca sparse index (epoch, byte offset) dari file .idx"""
+    try:
+        with open(filename, 'rb') as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return []
+    usable = len(raw) - len(raw) % INDEX_RECORD.size
+    return list(INDEX_RECORD.iter_unpack(raw[:usable]))
+
+
+def _json_default(obj):
+    """Serialisasi tipe non-JSON (LazyPayload, bytes)"""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return bytes(obj).decode(errors='replace')
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
 
 class MessageLogger:
-    """Logger untuk MQTT messages"""
+    """Logger untuk MQTT messages
+
+    Entry ditampung di memori dan ditulis per topic melalui file handle
+    yang tetap terbuka. Buffer di-flush saat mencapai `buffer_size` byte,
+    setelah `flush_interval` detik, saat ganti hari, dan saat `close()`.
+    Dengan `background=True` encoding dan penulisan dilakukan di thread
+    terpisah sehingga `log_message` tidak pernah menunggu disk.
+
+    `storage` memilih format: 'jsonl' (default), 'segment' (kolom biner
+    di `<log_dir>/segments`, lihat utils/segment.py) atau 'both'.
+
+    Setiap file JSON-lines punya sidecar `.idx` berisi pasangan
+    (timestamp, byte offset) kira-kira setiap `index_interval` byte,
+    dipakai `read_range` untuk langsung seek ke jendela waktu.
+
+    Setelah `close()`, `log_message` raise RuntimeError.
+    """
 
-    def __init__(self, log_dir='logs'):
+    STORAGE_FORMATS = ('jsonl', 'segment', 'both')
+
+    def __init__(self, log_dir='logs', buffer_size=64 * 1024, flush_interval=1.0, background=False,
+                 storage='jsonl', index_interval=64 * 1024):
         """Inisialisasi logger"""
+        if storage not in self.STORAGE_FORMATS:
+            raise ValueError(f"Unknown storage format '{storage}'")
+
         self.log_dir = log_dir
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.background = background
+        self.index_interval = index_interval
+        self.write_jsonl = storage in ('jsonl', 'both')
 
         # Create directory jika belum ada
         if not os.path.exists(log_dir):
             os.makedirs(log_dir)
 
-        # File untuk setiap topic
+        # File handle untuk setiap topic (hari ini)
         self.log_files = {}
+        # Sparse index: handle .idx, offset akhir file, offset terakhir yang diindeks
+        self.index_files = {}
+        self._offsets = {}
+        self._last_indexed = {}
+
+        # Segment kolom biner (opsional)
+        self.segments = None
+        if storage in ('segment', 'both'):
+            self.segments = SegmentStore(os.path.join(log_dir, 'segments'))
+
+        # Buffer per topic: (baris JSON, timestamp tiap baris)
+        self._buffers = {}
+        self._buffered_bytes = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self.bytes_written = 0
+        # Entry yang gagal di-encode/ditulis
+        self.write_errors = 0
+        # Statistik flush (untuk metrics)
+        self.flush_count = 0
+        self.flush_seconds = 0.0
+        self.flush_max_seconds = 0.0
+
+        # Tanggal aktif, dihitung ulang hanya saat lewat tengah malam
+        self._date = None
+        self._next_rotate = 0
+        self._roll_date()
+
+        # Thread writer/flusher (mode background: entry antre di _pending)
+        self._pending = []
+        self._pending_cond = threading.Condition()
+        self._stop = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
 
         print(f"[Logger] Initialized - log directory: {log_dir}")
 
-    def get_log_filename(self, topic):
+    def _roll_date(self):
+        """Set tanggal aktif dan waktu rotasi berikutnya (tengah malam)"""
+        now = datetime.now()
+        self._date = now.strftime("%Y%m%d")
+        midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        self._next_rotate = midnight.timestamp()
+
+    def get_log_filename(self, topic, date=None):
         """Get filename untuk topic"""
         # Sanitize topic name
         safe_topic = topic.replace('/', '_')
-        date = datetime.now().strftime("%Y%m%d")
+        if date is None:
+            date = self._date
 
         return os.path.join(self.log_dir, f"{safe_topic}_{date}.log")
 
-    def log_message(self, topic, data, timestamp=None):
-        """Log message ke file"""
+    def log_message(self, topic, data, timestamp=None, device_id=None):
+        """Log message ke file (buffered), RuntimeError jika logger sudah ditutup"""
         try:
+            epoch = None
             if timestamp is None:
-                timestamp = datetime.now().isoformat()
+                epoch = time.time()
+                timestamp = datetime.fromtimestamp(epoch).isoformat()
 
             # Create log entry
             log_entry = {
@@ -39,31 +151,278 @@ class MessageLogger:
                 'topic': topic,
                 'data': data
             }
+            # Device id dari router disimpan juga di JSONL (sama dengan kolom device segment)
+            if device_id is not None:
+                log_entry['device_id'] = device_id
+
+            if self.background:
+                with self._pending_cond:
+                    self._check_open()
+                    self._pending.append((log_entry, epoch, device_id))
+                    if len(self._pending) == 1:
+                        self._pending_cond.notify()
+                return
+
+            with self._lock:
+                self._check_open()
+                self._append(log_entry, epoch, device_id)
+                if self._buffered_bytes >= self.buffer_size:
+                    self._flush_locked()
+
+        except RuntimeError:
+            raise
+        except Exception as e:
+            self.write_errors += 1
+            print(f"[Logger] Error: {e}")
+
+    def _check_open(self):
+        # Dipanggil dengan lock: close() set _closed sebelum flush terakhir,
+        # jadi entry yang lolos cek ini pasti ikut ditulis
+        if self._closed:
+            raise RuntimeError("MessageLogger is closed")
+
+    def _append(self, log_entry, epoch=None, device_id=None):
+        """Encode entry ke buffer topic (lock sudah dipegang)"""
+        if time.time() >= self._next_rotate:
+            self._rotate_locked()
+
+        topic = log_entry['topic']
+        if self.write_jsonl:
+            line = json.dumps(log_entry, default=_json_default) + '\n'
+            buffer = self._buffers.get(topic)
+            if buffer is None:
+                buffer = self._buffers[topic] = ([], [])
+            buffer[0].append(line)
+            buffer[1].append(epoch if epoch is not None else log_entry['timestamp'])
+            self._buffered_bytes += len(line)
 
-            # Get or create file handle
+        if self.segments is not None:
+            data = log_entry['data']
+            values = numeric_fields(data)
+            if values:
+                if epoch is None:
+                    epoch = _to_epoch(log_entry['timestamp'])
+                if device_id is None and isinstance(data, Mapping):
+                    device_id = data.get('device_id')
+                self.segments.append(topic, self._date, epoch, device_id, values)
+
+    def _get_handle(self, topic):
+        """File handle topic untuk hari ini (dibuka sekali)"""
+        handle = self.log_files.get(topic)
+        if handle is None:
             filename = self.get_log_filename(topic)
+            handle = open(filename, 'a')
+            self.log_files[topic] = handle
+            self.index_files[topic] = open(filename + '.idx', 'ab')
+            self._offsets[topic] = os.path.getsize(filename)
+            index = read_index(filename + '.idx')
+            self._last_indexed[topic] = index[-1][1] if index else -self.index_interval
+        return handle
+
+    def _index_chunk(self, topic, lines, stamps):
+        """Tambah titik sparse index untuk baris yang akan ditulis"""
+        offset = self._offsets[topic]
+        last = self._last_indexed[topic]
+        records = []
+        for line, stamp in zip(lines, stamps):
+            if offset - last >= self.index_interval:
+                try:
+                    records.append(INDEX_RECORD.pack(_to_epoch(stamp), offset))
+                    last = offset
+                except (TypeError, ValueError):
+                    pass
+            # JSON di-encode ASCII, jadi panjang string = jumlah byte
+            offset += len(line)
+        self._offsets[topic] = offset
+        self._last_indexed[topic] = last
+        if records:
+            index_file = self.index_files[topic]
+            index_file.write(b''.join(records))
+            index_file.flush()
+
+    def _flush_locked(self):
+        """Tulis semua buffer ke file (lock sudah dipegang)"""
+        started = time.perf_counter()
+        wrote = bool(self._buffered_bytes)
+        for topic, (lines, stamps) in self._buffers.items():
+            if not lines:
+                continue
+            chunk = ''.join(lines)
+            handle = self._get_handle(topic)
+            self._index_chunk(topic, lines, stamps)
+            handle.write(chunk)
+            handle.flush()
+            self.bytes_written += len(chunk)
+        self._buffers.clear()
+        self._buffered_bytes = 0
+        if self.segments is not None:
+            self.segments.flush()
+        self._last_flush = time.monotonic()
+        if wrote:
+            elapsed = time.perf_counter() - started
+            self.flush_count += 1
+            self.flush_seconds += elapsed
+            self.flush_max_seconds = max(self.flush_max_seconds, elapsed)
 
-            # Append ke file
-            with open(filename, 'a') as f:
-                f.write(json.dumps(log_entry) + '\n')
+    def _rotate_locked(self):
+        """Ganti hari: flush ke file lama, tutup handle, pindah tanggal"""
+        self._flush_locked()
+        self._close_handles()
+        if self.segments is not None:
+            self.segments.close()
+        self._roll_date()
 
+    def _close_handles(self):
+        for handle in list(self.log_files.values()) + list(self.index_files.values()):
+            try:
+                handle.close()
+            except Exception:
+                pass
+        self.log_files.clear()
+        self.index_files.clear()
+
+    def _drain_pending_locked(self):
+        """Pindahkan entry antrean background ke buffer (lock sudah dipegang)"""
+        with self._pending_cond:
+            pending, self._pending = self._pending, []
+        # Satu entry rusak tidak boleh membuang sisa antrean
+        failed = 0
+        for entry, epoch, device_id in pending:
+            try:
+                self._append(entry, epoch, device_id)
+            except Exception as e:
+                failed += 1
+                error = e
+            if self._buffered_bytes >= self.buffer_size:
+                self._flush_locked()
+        if failed:
+            self.write_errors += failed
+            print(f"[Logger] Dropped {failed} entries: {error}")
+
+    def _run(self):
+        """Thread background: tulis entry (mode background) dan flush berkala"""
+        while not self._stop.is_set():
+            try:
+                if self.background:
+                    with self._pending_cond:
+                        self._pending_cond.wait_for(
+                            lambda: self._pending or self._stop.is_set(),
+                            self.flush_interval
+                        )
+                else:
+                    self._stop.wait(self.flush_interval)
+                with self._lock:
+                    if self.background:
+                        self._drain_pending_locked()
+                    if time.time() >= self._next_rotate:
+                        self._rotate_locked()
+                    elif time.monotonic() - self._last_flush >= self.flush_interval:
+                        self._flush_locked()
+            except Exception as e:
+                print(f"[Logger] Writer error: {e}")
+
+    def flush(self):
+        """Paksa tulis semua entry yang masih di buffer"""
+        with self._lock:
+            if self.background:
+                self._drain_pending_locked()
+            self._flush_locked()
+
+    def close(self):
+        """Flush buffer, hentikan thread writer, dan tutup semua file"""
+        # Urutan lock sama dengan _drain_pending_locked (_lock lalu _pending_cond)
+        with self._lock, self._pending_cond:
+            if self._closed:
+                return
+            self._closed = True
+        atexit.unregister(self.close)
+        self._stop.set()
+        with self._pending_cond:
+            self._pending_cond.notify()
+        self._thread.join(timeout=5)
+        try:
+            self.flush()
         except Exception as e:
             print(f"[Logger] Error: {e}")
+        with self._lock:
+            self._close_handles()
+            if self.segments is not None:
+                self.segments.close()
 
     def read_logs(self, topic, date=None):
         """Read logs untuk topic tertentu"""
+        return list(self.iter_logs(topic, date))
+
+    def iter_logs(self, topic, date=None):
+        """Iterasi entry log topic satu per satu (tanpa memuat seluruh file)"""
         if date is None:
             date = datetime.now().strftime("%Y%m%d")
 
-        safe_topic = topic.replace('/', '_')
-        filename = os.path.join(self.log_dir, f"{safe_topic}_{date}.log")
+        # Pastikan entry yang masih di buffer ikut terbaca
+        self.flush()
+        filename = self.get_log_filename(topic, date)
 
-        logs = []
         try:
-            with open(filename, 'r') as f:
-                for line in f:
-                    logs.append(json.loads(line))
+            f = open(filename, 'r')
         except FileNotFoundError:
             print(f"[Logger] Log file not found: {filename}")
+            return
+        with f:
+            for line in f:
+                yield json.loads(line)
+
+    def read_columns(self, topic, date=None):
+        """Baca segment biner topic sebagai dict kolom -> array (mmap, tanpa parsing)"""
+        if self.segments is None:
+            raise RuntimeError("Segment storage is not enabled for this logger")
+        if date is None:
+            date = datetime.now().strftime("%Y%m%d")
+
+        self.flush()
+        columns = self.segments.read(topic, date)
+        if columns is None:
+            print(f"[Logger] Segment not found: {self.segments.segment_path(topic, date)}")
+            return {}
+        return columns
+
+    def iter_range(self, topic, start, end=None):
+        """Iterasi entry topic dengan timestamp di [start, end]
+
+        `start`/`end` berupa datetime atau epoch float; boleh melewati
+        beberapa file harian. Sparse index dipakai untuk seek langsung
+        ke awal jendela waktu.
+        """
+        start = start.timestamp() if isinstance(start, datetime) else float(start)
+        if end is None:
+            end = time.time()
+        end = end.timestamp() if isinstance(end, datetime) else float(end)
+
+        self.flush()
+        day = datetime.fromtimestamp(start).date()
+        last_day = datetime.fromtimestamp(end).date()
+        while day <= last_day:
+            filename = self.get_log_filename(topic, day.strftime("%Y%m%d"))
+            day += timedelta(days=1)
+            if not os.path.exists(filename):
+                continue
+
+            index = read_index(filename + '.idx')
+            position = bisect.bisect_right(index, (start, float('inf'))) - 1
+            offset = index[position][1] if position >= 0 else 0
+
+            with open(filename, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        stamp = _to_epoch(entry['timestamp'])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    if stamp > end:
+                        break
+                    if stamp >= start:
+                        yield entry
 
-        return logs
\ No newline at end of file
+    def read_range(self, topic, start, end=None):
+        """Baca log topic antara `start` dan `end` (lihat iter_range)"""
+        return list(self.iter_range(topic, start, end))
@@ -0,0 +1,293 @@
+# utils/metrics.py - Endpoint /metrics format teks Prometheus
+#
+# Counter di hot path hanya berupa atribut int/dict biasa pada komponen
+# (MqttClient, DecoderRegistry, BoundedMessageQueue, MessageLogger, ...).
+# Registry membaca nilainya lewat collector hanya saat di-scrape, sehingga
+# biaya per message tetap satu operasi increment.
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value is None:
+        return 'NaN'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float):
+        # Ejaan Prometheus untuk nilai non-finite (repr Python: nan/inf)
+        if math.isnan(value):
+            return 'NaN'
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
+
+
+class Metric:
+    """Satu metric: nama, tipe, help, dan sampel (suffix, labels, nilai)"""
+
+    __slots__ = ('name', 'kind', 'help', 'samples')
+
+    def __init__(self, name, kind, help):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.samples = []
+
+    def add(self, value, labels=None, suffix=''):
+        self.samples.append((suffix, labels or {}, value))
+        return self
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples:
+            if labels:
+                label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                lines.append(f"{self.name}{suffix}{{{label_text}}} {_format_value(value)}")
+            else:
+                lines.append(f"{self.name}{suffix} {_format_value(value)}")
+        return '\n'.join(lines)
+
+
+class MetricsRegistry:
+    """Kumpulan collector; setiap collector mengembalikan list Metric"""
+
+    def __init__(self, prefix='iot'):
+        self.prefix = prefix
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, collector):
+        """Daftarkan callable() -> iterable Metric"""
+        with self._lock:
+            self.collectors.append(collector)
+        return collector
+
+    def metric(self, name, kind, help):
+        return Metric(f"{self.prefix}_{name}", kind, help)
+
+    def collect(self):
+        """Jalankan semua collector; metric bernama sama digabung jadi satu"""
+        with self._lock:
+            collectors = list(self.collectors)
+        metrics = {}
+        for collector in collectors:
+            try:
+                for metric in collector():
+                    existing = metrics.get(metric.name)
+                    if existing is None:
+                        metrics[metric.name] = metric
+                    else:
+                        existing.samples.extend(metric.samples)
+            except Exception as e:
+                print(f"[Metrics] Collector error: {e}")
+        return list(metrics.values())
+
+    def render(self):
+        """Teks exposition format Prometheus"""
+        return '\n'.join(metric.render() for metric in self.collect()) + '\n'
+
+    # --- Collector untuk komponen aplikasi ---
+
+    def add_mqtt_client(self, client):
+        """Message per topic, publish, decode error, status koneksi, reconnect, latency pipeline"""
+        def collect():
+            received = self.metric('messages_received_total', 'counter', "MQTT messages received per topic")
+            for topic, count in list(client.messages_received.items()):
+                received.add(count, {'topic': topic})
+            metrics = [
+                received,
+                self.metric('decode_errors_total', 'counter', "Payloads that failed to decode")
+                    .add(client.decoders.errors),
+                self.metric('mqtt_connected', 'gauge', "1 if connected to the broker")
+                    .add(client.is_connected),
+                self.metric('mqtt_reconnects_total', 'counter', "Successful reconnects after the first connect")
+                    .add(max(0, client.connect_count - 1)),
+                self.metric('mqtt_disconnects_total', 'counter', "Unexpected disconnects from the broker")
+                    .add(client.disconnect_count),
+                self.metric('messages_published_total', 'counter', "Messages delivered to the broker (PUBACK for QoS > 0)")
+                    .add(client.published_count),
+                self.metric('publish_errors_total', 'counter', "Publishes rejected, timed out or failed")
+                    .add(client.publish_errors),
+            ]
+            latency = getattr(client, 'latency', None)
+            if latency is not None:
+                metrics.append(self._latency_metric(latency))
+                metrics.append(
+                    self.metric('latency_clock_skew_samples_total', 'counter',
+                                "Device timestamps dropped from the network stage (clock out of sync)")
+                        .add(client.clock_skew_samples))
+            return metrics
+        return self.register(collect)
+
+    def _latency_metric(self, latency):
+        metric = self.metric('pipeline_latency_seconds', 'summary',
+                             f"Pipeline stage latency over the last {latency.window:.0f}s")
+        for stage, stats in latency.snapshot().items():
+            if not stats:
+                continue
+            for quantile in (50, 95, 99):
+                value = stats[f"p{quantile}"]
+                metric.add(value / 1000.0 if value is not None else None,
+                           {'stage': stage, 'quantile': f"{quantile / 100:g}"})
+            metric.add(stats['count'], {'stage': stage}, '_count')
+        return metric
+
+    def add_queue(self, name, queue):
+        """Depth, kapasitas, dropped dan coalesced untuk BoundedMessageQueue"""
+        def collect():
+            stats = queue.stats()
+            labels = {'queue': name}
+            return [
+                self.metric('queue_depth', 'gauge', "Messages waiting in the queue").add(stats['depth'], labels),
+                self.metric('queue_capacity', 'gauge', "Queue capacity (0 = unbounded)").add(stats['capacity'], labels),
+                self.metric('queue_high_watermark', 'gauge', "Highest observed queue depth")
+                    .add(stats['high_watermark'], labels),
+                self.metric('queue_enqueued_total', 'counter', "Messages put into the queue")
+                    .add(stats['enqueued'], labels),
+                self.metric('queue_dropped_total', 'counter', "Messages dropped by the overflow policy")
+                    .add(stats['dropped'], labels),
+                self.metric('queue_coalesced_total', 'counter', "Messages replaced by a newer one for the same key")
+                    .add(stats['coalesced'], labels),
+            ]
+        return self.register(collect)
+
+    def add_logger(self, logger):
+        """Byte yang ditulis dan durasi flush MessageLogger"""
+        def collect():
+            return [
+                self.metric('logger_bytes_written_total', 'counter', "Bytes written to JSON-lines logs")
+                    .add(logger.bytes_written),
+                self.metric('logger_write_errors_total', 'counter', "Log entries that failed to encode or write")
+                    .add(logger.write_errors),
+                self.metric('logger_flush_seconds', 'summary', "Time spent flushing log buffers")
+                    .add(logger.flush_seconds, suffix='_sum')
+                    .add(logger.flush_count, suffix='_count'),
+                self.metric('logger_flush_max_seconds', 'gauge', "Slowest flush so far")
+                    .add(logger.flush_max_seconds),
+            ]
+        return self.register(collect)
+
+    def add_dashboard(self, dashboard):
+        """Durasi redraw grafik dashboard dan queue UI"""
+        self.add_queue('dashboard', dashboard.msg_queue)
+
+        def collect():
+            return [
+                self.metric('dashboard_redraw_seconds', 'summary', "Time spent updating the graphs per frame")
+                    .add(dashboard.redraw_seconds, suffix='_sum')
+                    .add(dashboard.redraw_count, suffix='_count'),
+                self.metric('dashboard_redraw_max_seconds', 'gauge', "Slowest graph update so far")
+                    .add(dashboard.redraw_max_seconds),
+                self.metric('dashboard_full_redraws_total', 'counter', "Graph frames that needed a full canvas draw")
+                    .add(dashboard.full_redraws),
+                self.metric('dashboard_frames_total', 'counter', "UI frames run (only when data or status changed)")
+                    .add(dashboard.frame_count),
+            ]
+        return self.register(collect)
+
+    def add_shards(self, service):
+        """Statistik per worker ShardedIngestService (label shard)"""
+        def collect():
+            shards = service.stats()['shards']
+            metrics = {
+                'forwarded': self.metric('shard_forwarded_total', 'counter', "Messages handed to the shard worker"),
+                'dropped': self.metric('shard_dropped_total', 'counter',
+                                       "Messages dropped because the shard worker was not running"),
+                'processed': self.metric('shard_processed_total', 'counter', "Messages processed by the shard worker"),
+                'invalid': self.metric('shard_invalid_total', 'counter', "Messages rejected by validation"),
+                'decode_errors': self.metric('shard_decode_errors_total', 'counter',
+                                             "Payloads that failed to decode in the worker"),
+                'bytes_written': self.metric('shard_bytes_written_total', 'counter', "Bytes written to the shard logs"),
+                'queue_batches': self.metric('shard_queue_batches', 'gauge', "Batches waiting for the shard worker"),
+            }
+            latency = self.metric('shard_latency_seconds', 'summary',
+                                  "Receive-to-processed latency per shard (recent window)")
+            for shard, stats in shards.items():
+                labels = {'shard': shard}
+                for key, metric in metrics.items():
+                    metric.add(stats.get(key), labels)
+                window = stats.get('latency')
+                if window:
+                    for quantile in (50, 95, 99):
+                        value = window[f"p{quantile}"]
+                        latency.add(value / 1000.0 if value is not None else None,
+                                    {'shard': shard, 'quantile': f"{quantile / 100:g}"})
+            return list(metrics.values()) + [latency]
+        return self.register(collect)
+
+
+def start_metrics_server(config, client=None, dashboard=None, logger=None, shards=None):
+    """Start endpoint /metrics jika `metrics.enabled` di config, kembalikan server atau None"""
+    settings = config.get('metrics', {})
+    if not settings.get('enabled', False):
+        return None
+
+    registry = MetricsRegistry(settings.get('prefix', 'iot'))
+    if client is not None:
+        registry.add_mqtt_client(client)
+        registry.add_queue('mqtt', client.message_queue)
+    if dashboard is not None:
+        registry.add_dashboard(dashboard)
+    if logger is not None:
+        registry.add_logger(logger)
+    if shards is not None:
+        registry.add_shards(shards)
+
+    server = MetricsServer(registry, settings.get('host', '127.0.0.1'), settings.get('port', 9108))
+    try:
+        server.start()
+    except OSError as e:
+        print(f"[Metrics] Could not start metrics endpoint: {e}")
+        return None
+    return server
+
+
+class MetricsServer:
+    """HTTP server ringan (thread daemon) yang melayani GET /metrics"""
+
+    def __init__(self, registry, host='127.0.0.1', port=9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        print(f"[Metrics] Serving http://{self.host}:{self.port}/metrics")
+        return self.port
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
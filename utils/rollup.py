@@ -0,0 +1,311 @@
+# utils/rollup.py - Agregasi bertingkat (1s / 1m / 1h) untuk stream sensor
+import threading
+import time
+from collections.abc import Mapping
+from utils.segment import DEVICE_COLUMN, TIMESTAMP_COLUMN, SegmentStore, numeric_fields
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+STATS = ('min', 'max', 'mean', 'count', 'last')
+
+
+def resolution_label(seconds):
+    """Label resolusi: 1 -> '1s', 60 -> '1m', 3600 -> '1h'"""
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600}h"
+    if seconds % 60 == 0:
+        return f"{seconds // 60}m"
+    return f"{seconds}s"
+
+
+class Bucket:
+    """Statistik satu metric dalam satu bucket waktu"""
+
+    __slots__ = ('count', 'min', 'max', 'sum', 'last')
+
+    def __init__(self, value):
+        self.count = 1
+        self.min = value
+        self.max = value
+        self.sum = value
+        self.last = value
+
+    def add(self, value):
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.sum += value
+        self.last = value
+
+    def as_dict(self):
+        return {
+            'min': self.min,
+            'max': self.max,
+            'mean': self.sum / self.count,
+            'count': self.count,
+            'last': self.last,
+        }
+
+
+class HoldBucket(Bucket):
+    """Bucket untuk sinyal sample-and-hold (device dengan mode deadband)
+
+    Nilai berlaku sejak dilaporkan sampai laporan berikutnya (maks
+    `max_hold` detik), sehingga mean dihitung berbobot waktu. Bucket bisa
+    dibuka dengan nilai yang dibawa dari bucket sebelumnya (count 0).
+    """
+
+    __slots__ = ('since', 'sampled', 'area', 'covered', 'max_hold')
+
+    def __init__(self, value, timestamp, max_hold, since=None, carried=False):
+        super().__init__(value)
+        if carried:
+            self.count = 0
+            self.sum = 0.0
+        self.since = timestamp if since is None else since
+        self.sampled = timestamp
+        self.area = 0.0
+        self.covered = 0.0
+        self.max_hold = max_hold
+
+    def _integrate(self, until):
+        until = min(until, self.sampled + self.max_hold)
+        if until > self.since:
+            self.area += self.last * (until - self.since)
+            self.covered += until - self.since
+        self.since = max(self.since, until)
+
+    def add_at(self, value, timestamp):
+        self._integrate(timestamp)
+        self.sampled = max(self.sampled, timestamp)
+        self.add(value)
+
+    def finish(self, end):
+        """Hitung nilai terakhir sampai akhir bucket"""
+        self._integrate(end)
+
+    def as_dict(self):
+        return {
+            'min': self.min,
+            'max': self.max,
+            'mean': self.area / self.covered if self.covered else self.last,
+            'count': self.count,
+            'last': self.last,
+        }
+
+
+def fill_held(columns, resolution, max_hold):
+    """Sisipkan bucket kosong di antara laporan device deadband
+
+    Bucket tanpa sampel dalam `max_hold` detik setelah bucket terakhir
+    diisi nilai `last` (min = max = mean = last, count 0). Kolom dari
+    `RollupAggregator.read`; hasil diurutkan menurut timestamp.
+    """
+    if np is None or not max_hold or not len(columns.get(TIMESTAMP_COLUMN, ())):
+        return columns
+    timestamps = np.asarray(columns[TIMESTAMP_COLUMN])
+    devices = np.asarray(columns[DEVICE_COLUMN])
+    order = np.lexsort((timestamps, devices))
+    timestamps = timestamps[order]
+    devices = devices[order]
+
+    # Jumlah bucket kosong setelah setiap baris (dibatasi max_hold)
+    missing = np.zeros(len(order), dtype=np.int64)
+    same_device = devices[1:] == devices[:-1]
+    gaps = np.rint((timestamps[1:] - timestamps[:-1]) / resolution).astype(np.int64) - 1
+    missing[:-1] = np.where(same_device, np.clip(gaps, 0, int(max_hold // resolution)), 0)
+
+    repeats = missing + 1
+    source = np.repeat(np.arange(len(order)), repeats)
+    step = np.arange(len(source)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    filled = step > 0
+
+    result = {}
+    for name, values in columns.items():
+        if name == 'device_names':
+            continue
+        values = np.asarray(values)[order][source]
+        if name == TIMESTAMP_COLUMN:
+            values = values + step * resolution
+        elif name != DEVICE_COLUMN:
+            metric, _, stat = name.rpartition('_')
+            if stat == 'count':
+                values[filled] = 0.0
+            elif stat in STATS and f"{metric}_last" in columns:
+                values[filled] = np.asarray(columns[f"{metric}_last"])[order][source][filled]
+        result[name] = values
+
+    by_time = np.argsort(result[TIMESTAMP_COLUMN], kind='stable')
+    result = {name: values[by_time] for name, values in result.items()}
+    if 'device_names' in columns:
+        result['device_names'] = columns['device_names']
+    return result
+
+
+class RollupAggregator:
+    """Agregasi min/max/mean/count/last per device & metric di beberapa resolusi
+
+    Setiap sampel memperbarui bucket terbuka secara inkremental. Bucket
+    ditutup saat sampel untuk bucket berikutnya datang atau lewat
+    `flush_expired()`, lalu dikirim ke callback `on_close` dan (jika
+    `base_dir` diisi) disimpan sebagai segment kolom `rollup_<res>`:
+    satu baris per device per bucket, kolom `<metric>_<stat>`.
+
+    `max_hold` > 0 untuk device yang hanya melapor saat nilai berubah
+    (deadband + heartbeat): nilai terakhir dianggap berlaku maks `max_hold`
+    detik, dibawa ke bucket berikutnya dan mean dihitung berbobot waktu.
+    """
+
+    def __init__(self, base_dir=None, resolutions=(1, 60, 3600), on_close=None, buffer_rows=256,
+                 max_hold=0):
+        self.resolutions = tuple(resolutions)
+        self.on_close = on_close
+        self.store = SegmentStore(base_dir, buffer_rows) if base_dir else None
+        self.max_hold = max_hold
+        # device -> {metric: (nilai terakhir, timestamp)} untuk mode hold
+        self._held = {}
+
+        # (device, resolution) -> [bucket start, {metric: Bucket}]
+        self._open = {}
+        self._lock = threading.Lock()
+        self.closed_buckets = 0
+        self.late_samples = 0
+
+    def add(self, device, metric, value, timestamp=None):
+        """Tambah satu sampel"""
+        self.add_values(device, {metric: value}, timestamp)
+
+    def add_values(self, device, values, timestamp=None):
+        """Tambah beberapa metric dari satu sampel (dict metric -> float)"""
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            for resolution in self.resolutions:
+                start = timestamp - timestamp % resolution
+                key = (device, resolution)
+                state = self._open.get(key)
+                if state is None:
+                    state = self._open[key] = [start, self._carry(device, start)]
+                elif start > state[0]:
+                    self._close_locked(key, state)
+                    state = self._open[key] = [start, self._carry(device, start)]
+                elif start < state[0]:
+                    # Sampel terlambat digabung ke bucket yang masih terbuka
+                    self.late_samples += 1
+
+                buckets = state[1]
+                for metric, value in values.items():
+                    bucket = buckets.get(metric)
+                    if bucket is None:
+                        buckets[metric] = (HoldBucket(value, timestamp, self.max_hold)
+                                           if self.max_hold else Bucket(value))
+                    elif self.max_hold:
+                        bucket.add_at(value, timestamp)
+                    else:
+                        bucket.add(value)
+
+            if self.max_hold:
+                held = self._held.setdefault(device, {})
+                for metric, value in values.items():
+                    held[metric] = (value, timestamp)
+
+    def _carry(self, device, start):
+        """Bucket awal berisi nilai yang masih berlaku dari laporan sebelumnya"""
+        if not self.max_hold:
+            return {}
+        return {
+            metric: HoldBucket(value, timestamp, self.max_hold, since=start, carried=True)
+            for metric, (value, timestamp) in self._held.get(device, {}).items()
+            if start - timestamp < self.max_hold
+        }
+
+    def add_message(self, message):
+        """Tambah message ingest (dict topic/data/timestamp): ambil field numerik"""
+        data = message.get('data')
+        if not isinstance(data, Mapping):
+            return
+        values = numeric_fields(data)
+        if values:
+            device = message.get('device_id') or data.get('device_id') or message.get('topic')
+            self.add_values(device, values, message.get('timestamp'))
+
+    def _close_locked(self, key, state):
+        device, resolution = key
+        start, buckets = state
+        if not buckets:
+            return
+        if self.max_hold:
+            for bucket in buckets.values():
+                bucket.finish(start + resolution)
+        stats = {metric: bucket.as_dict() for metric, bucket in buckets.items()}
+        self.closed_buckets += 1
+
+        if self.store is not None:
+            row = {}
+            for metric, values in stats.items():
+                for stat in STATS:
+                    row[f"{metric}_{stat}"] = float(values[stat])
+            date = time.strftime("%Y%m%d", time.localtime(start))
+            self.store.append(f"rollup_{resolution_label(resolution)}", date, start, device, row)
+
+        if self.on_close is not None:
+            try:
+                self.on_close(resolution, device, start, stats)
+            except Exception as e:
+                print(f"[Rollup] on_close error: {e}")
+
+    def flush_expired(self, now=None):
+        """Tutup bucket yang waktunya sudah lewat (untuk device yang diam)"""
+        if now is None:
+            now = time.time()
+        with self._lock:
+            for key, state in list(self._open.items()):
+                if state[0] + key[1] <= now:
+                    self._close_locked(key, state)
+                    del self._open[key]
+            if self.store is not None:
+                self.store.flush()
+
+    def snapshot(self, device, metric, resolution=60):
+        """Statistik bucket terbuka saat ini, None jika belum ada"""
+        with self._lock:
+            state = self._open.get((device, resolution))
+            if state is None or metric not in state[1]:
+                return None
+            stats = state[1][metric].as_dict()
+            stats['start'] = state[0]
+            return stats
+
+    def read(self, resolution, date=None, fill=None):
+        """Baca bucket tersimpan (dict kolom -> array) untuk resolusi & tanggal
+
+        fill: isi bucket kosong dengan nilai yang ditahan (default: jika max_hold > 0)
+        """
+        if self.store is None:
+            return {}
+        if date is None:
+            date = time.strftime("%Y%m%d")
+        with self._lock:
+            self.store.flush()
+        columns = self.store.read(f"rollup_{resolution_label(resolution)}", date)
+        if columns is None:
+            return {}
+        if fill is None:
+            fill = self.max_hold > 0
+        if fill:
+            columns = fill_held(columns, resolution, self.max_hold)
+        return columns
+
+    def close(self):
+        """Tutup semua bucket terbuka dan simpan ke disk"""
+        with self._lock:
+            for key, state in self._open.items():
+                self._close_locked(key, state)
+            self._open.clear()
+            if self.store is not None:
+                self.store.close()
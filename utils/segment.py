@@ -0,0 +1,259 @@
+# utils/segment.py - Format segment biner kolumnar untuk data sensor
+import json
+import mmap
+import os
+from array import array
+from collections.abc import Mapping
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Kolom tetap: timestamp (float64 epoch) dan device (int32 indeks ke devices.json)
+TIMESTAMP_COLUMN = 'timestamp'
+DEVICE_COLUMN = 'device'
+SKIP_FIELDS = ('timestamp', 'device_id', 'device')
+# Manifest segment: nama device dan nama metric (urutan = indeks file kolom)
+DEVICES_FILE = 'devices.json'
+COLUMNS_FILE = 'columns.json'
+
+
+def numeric_fields(data):
+    """Ambil field numerik dari payload (dict/LazyPayload)"""
+    if not isinstance(data, Mapping):
+        return {}
+    values = {}
+    for key, value in data.items():
+        if key in SKIP_FIELDS or isinstance(value, bool):
+            continue
+        if isinstance(value, (int, float)):
+            values[key] = float(value)
+    return values
+
+
+class SegmentWriter:
+    """Writer append-only untuk satu segment (satu direktori, satu file per kolom)
+
+    Setiap kolom adalah file biner fixed-width little-endian:
+    `timestamp.f8`, `device.i4`, dan `m<N>.f8` untuk metric ke-N. Nama
+    metric (key payload, bisa berisi karakter apa saja) disimpan berurutan
+    di `columns.json`, bukan dipakai sebagai nama file. Metric baru yang
+    muncul belakangan diisi NaN untuk baris sebelumnya.
+    """
+
+    def __init__(self, path, buffer_rows=1024):
+        self.path = path
+        self.buffer_rows = buffer_rows
+        os.makedirs(path, exist_ok=True)
+
+        # Lanjutkan segment yang sudah ada (jumlah baris = kolom terpendek)
+        self.devices = _load_list(path, DEVICES_FILE)
+        self._device_index = {device: i for i, device in enumerate(self.devices)}
+        self.metrics = _load_list(path, COLUMNS_FILE)
+        self.rows = _row_count(path, self.metrics)
+        # Buang baris parsial (mis. setelah crash) agar semua kolom sejajar
+        for column in [TIMESTAMP_COLUMN, DEVICE_COLUMN] + self.metrics:
+            filename = _column_path(path, column, self.metrics)
+            width = 4 if column == DEVICE_COLUMN else 8
+            if os.path.exists(filename) and os.path.getsize(filename) != self.rows * width:
+                os.truncate(filename, self.rows * width)
+
+        self._buffers = self._new_buffers()
+        self._buffered = 0
+
+    def _new_buffers(self):
+        buffers = {TIMESTAMP_COLUMN: array('d'), DEVICE_COLUMN: array('i')}
+        for metric in self.metrics:
+            buffers[metric] = array('d')
+        return buffers
+
+    def _add_metric(self, metric):
+        """Kolom baru, isi NaN untuk semua baris sebelumnya"""
+        self.metrics.append(metric)
+        # File kolom dulu, baru manifest: sisa file tanpa manifest (crash) ditimpa
+        with open(_column_path(self.path, metric, self.metrics), 'wb') as f:
+            array('d', [float('nan')] * self.rows).tofile(f)
+        _save_list(self.path, COLUMNS_FILE, self.metrics)
+        self._buffers[metric] = array('d', [float('nan')] * self._buffered)
+
+    def _device_id(self, device):
+        index = self._device_index.get(device)
+        if index is None:
+            index = self._device_index[device] = len(self.devices)
+            self.devices.append(device)
+            _save_list(self.path, DEVICES_FILE, self.devices)
+        return index
+
+    def append(self, timestamp, device, values):
+        """Tambah satu baris: timestamp epoch, device id, dict metric -> float"""
+        for metric in values:
+            if metric not in self._buffers:
+                self._add_metric(metric)
+
+        self._buffers[TIMESTAMP_COLUMN].append(timestamp)
+        self._buffers[DEVICE_COLUMN].append(self._device_id(device or ''))
+        nan = float('nan')
+        for metric in self.metrics:
+            self._buffers[metric].append(values.get(metric, nan))
+
+        self._buffered += 1
+        if self._buffered >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        """Tulis buffer kolom ke file"""
+        if not self._buffered:
+            return
+        for column, buffer in self._buffers.items():
+            with open(_column_path(self.path, column, self.metrics), 'ab') as f:
+                buffer.tofile(f)
+        self.rows += self._buffered
+        self._buffers = self._new_buffers()
+        self._buffered = 0
+
+    def close(self):
+        self.flush()
+
+
+class SegmentReader:
+    """Reader segment: kolom dipetakan dengan mmap menjadi array NumPy tanpa parsing
+
+    Pakai sebagai context manager (`with store.open(...) as reader`) agar
+    mmap ditutup; array NumPy yang masih dipakai tetap valid.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.devices = _load_list(path, DEVICES_FILE)
+        self.metrics = _load_list(path, COLUMNS_FILE)
+        self.rows = _row_count(path, self.metrics)
+        self._maps = []
+
+    def _map(self, column):
+        """Peta file kolom ke array (view mmap jika NumPy tersedia)"""
+        typecode = 'i' if column == DEVICE_COLUMN else 'd'
+        filename = _column_path(self.path, column, self.metrics)
+        if not self.rows:
+            return np.zeros(0, dtype=_dtype(typecode)) if np is not None else array(typecode)
+
+        with open(filename, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        if np is not None:
+            return np.frombuffer(mapped, dtype=_dtype(typecode), count=self.rows)
+        values = array(typecode)
+        values.frombytes(mapped[:self.rows * values.itemsize])
+        return values
+
+    def column(self, name):
+        return self._map(name)
+
+    def read(self, columns=None):
+        """Dict nama kolom -> array; default semua kolom"""
+        if columns is None:
+            columns = [TIMESTAMP_COLUMN, DEVICE_COLUMN] + self.metrics
+        return {name: self._map(name) for name in columns}
+
+    def device_names(self, device_ids):
+        """Ubah indeks device menjadi nama"""
+        return [self.devices[i] for i in device_ids]
+
+    def close(self):
+        for mapped in self._maps:
+            try:
+                mapped.close()
+            except BufferError:
+                # Masih ada array yang memakai mmap; dilepas oleh GC
+                pass
+        self._maps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SegmentStore:
+    """Satu segment per topic per hari di bawah `base_dir`"""
+
+    def __init__(self, base_dir, buffer_rows=1024):
+        self.base_dir = base_dir
+        self.buffer_rows = buffer_rows
+        self.writers = {}
+        os.makedirs(base_dir, exist_ok=True)
+
+    def segment_path(self, topic, date):
+        return os.path.join(self.base_dir, f"{topic.replace('/', '_')}_{date}")
+
+    def append(self, topic, date, timestamp, device, values):
+        key = (topic, date)
+        writer = self.writers.get(key)
+        if writer is None:
+            writer = self.writers[key] = SegmentWriter(self.segment_path(topic, date), self.buffer_rows)
+        writer.append(timestamp, device, values)
+
+    def flush(self):
+        for writer in self.writers.values():
+            writer.flush()
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.writers.clear()
+
+    def open(self, topic, date):
+        """SegmentReader untuk topic dan tanggal, None jika tidak ada"""
+        path = self.segment_path(topic, date)
+        if not os.path.isdir(path):
+            return None
+        return SegmentReader(path)
+
+    def read(self, topic, date, columns=None):
+        """Kolom segment (lihat SegmentReader.read) plus `device_names`, None jika tidak ada"""
+        reader = self.open(topic, date)
+        if reader is None:
+            return None
+        with reader:
+            result = reader.read(columns)
+            result['device_names'] = reader.devices
+        return result
+
+
+def _dtype(typecode):
+    return np.dtype('<i4') if typecode == 'i' else np.dtype('<f8')
+
+
+def _column_path(path, column, metrics):
+    """File kolom: nama tetap untuk timestamp/device, indeks manifest untuk metric"""
+    if column == DEVICE_COLUMN:
+        return os.path.join(path, 'device.i4')
+    if column == TIMESTAMP_COLUMN:
+        return os.path.join(path, 'timestamp.f8')
+    return os.path.join(path, f"m{metrics.index(column)}.f8")
+
+
+def _row_count(path, metrics):
+    """Jumlah baris lengkap = panjang kolom terpendek"""
+    sizes = []
+    for column in [TIMESTAMP_COLUMN, DEVICE_COLUMN] + list(metrics):
+        filename = _column_path(path, column, metrics)
+        width = 4 if column == DEVICE_COLUMN else 8
+        sizes.append(os.path.getsize(filename) // width if os.path.exists(filename) else 0)
+    return min(sizes)
+
+
+def _load_list(path, name):
+    try:
+        with open(os.path.join(path, name), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def _save_list(path, name, values):
+    tmp = os.path.join(path, name + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(values, f)
+    os.replace(tmp, os.path.join(path, name))
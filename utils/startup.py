@@ -0,0 +1,30 @@
+# utils/startup.py - Pencatat durasi fase startup
+import time
+
+
+class StartupTimer:
+    """Catat waktu setiap fase startup relatif terhadap `start`
+
+    `start` sebaiknya diambil (time.perf_counter()) sebelum import berat,
+    agar waktu import ikut terukur.
+    """
+
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.last = self.start
+        self.phases = []
+
+    def mark(self, phase):
+        """Tutup fase `phase` dan cetak durasinya"""
+        now = time.perf_counter()
+        elapsed = now - self.last
+        self.phases.append((phase, elapsed))
+        self.last = now
+        print(f"[STARTUP] {phase}: +{elapsed * 1000:.0f} ms ({(now - self.start) * 1000:.0f} ms total)")
+        return elapsed
+
+    def report(self):
+        """Dict fase -> durasi (ms), plus total"""
+        report = {phase: elapsed * 1000 for phase, elapsed in self.phases}
+        report['total'] = (self.last - self.start) * 1000
+        return report